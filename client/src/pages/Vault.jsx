@@ -76,6 +76,8 @@ export default function Vault() {
   const [vaultInfo, setVaultInfo] = useState(null);
   const [members, setMembers] = useState([]);
   const [isLoading, setIsLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [isUploading, setIsUploading] = useState(false);
   const [uploadProgress, setUploadProgress] = useState(null);
   const [previewFile, setPreviewFile] = useState(null);
@@ -119,20 +121,46 @@ export default function Vault() {
     }
   }, [vaultId]);
 
-  const fetchFolderContents = useCallback(async () => {
-    setIsLoading(true);
-    try {
-      const res = await fetch(`${API_BASE}/vaults/${vaultId}/files`, {
+  // The file list is paginated: each page carries the cursor of the next one
+  const fetchFilesPage = useCallback(
+    async (cursor) => {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+      const res = await fetch(`${API_BASE}/vaults/${vaultId}/files${query}`, {
         credentials: "include",
       });
       const data = await res.json();
-      if (res.ok) setItems(data);
+      if (!res.ok) throw new Error(data.error || "Failed to fetch files");
+      return data;
+    },
+    [vaultId],
+  );
+
+  const fetchFolderContents = useCallback(async () => {
+    setIsLoading(true);
+    try {
+      const data = await fetchFilesPage(null);
+      setItems(data.files);
+      setNextCursor(data.next_cursor);
     } catch (err) {
       console.error("Failed to fetch contents:", err);
     } finally {
       setIsLoading(false);
     }
-  }, [vaultId]);
+  }, [fetchFilesPage]);
+
+  const loadMoreFiles = async () => {
+    if (!nextCursor || isLoadingMore) return;
+    setIsLoadingMore(true);
+    try {
+      const data = await fetchFilesPage(nextCursor);
+      setItems((prev) => [...prev, ...data.files]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      console.error("Failed to fetch more files:", err);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
 
   const handleFileUpload = async (event) => {
     const file = event.target.files?.[0];
@@ -243,6 +271,14 @@ export default function Vault() {
   const handleFilePreview = async (file) => {
     setPreviewFile(file);
 
+    // Stream video/audio straight from the server so the player can use
+    // range requests (seeking) instead of downloading the whole file first
+    const category = getFileCategory(file.ext);
+    if (category === "video" || category === "audio") {
+      setPreviewUrl(`${API_BASE}/files/${file.file_id}/download`);
+      return;
+    }
+
     try {
       const endpoints = [
         `${API_BASE}/files/${file.file_id}/view`,
@@ -295,7 +331,7 @@ export default function Vault() {
   };
 
   const closePreview = () => {
-    if (previewUrl) URL.revokeObjectURL(previewUrl);
+    if (previewUrl && previewUrl.startsWith("blob:")) URL.revokeObjectURL(previewUrl);
     setPreviewFile(null);
     setPreviewUrl(null);
   };
@@ -581,6 +617,18 @@ export default function Vault() {
                 })
               )}
             </div>
+
+            {!isLoading && nextCursor && (
+              <div className="loadMore">
+                <button
+                  className="upload-button"
+                  onClick={loadMoreFiles}
+                  disabled={isLoadingMore}
+                >
+                  {isLoadingMore ? "Loading..." : "Load more"}
+                </button>
+              </div>
+            )}
           </section>
 
           <aside className="vaultDetails">
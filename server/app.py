@@ -1,39 +1,39 @@
-from flask import Flask, request, jsonify, session, send_file
+from startup import startup_report
+from flask import Flask, Response, request, jsonify, session, send_file, stream_with_context
 from flask_cors import CORS
+import gc
 import os
+import base64
 import secrets
 from datetime import datetime, timedelta
 from functools import wraps
 from bson import ObjectId
 from dotenv import load_dotenv
-from database import Database, extract_pdf_metadata, calculate_metadata_score, calculate_access_risk_score
-import hashlib
+from json_provider import MongoJSONProvider
+from tracking import AccessTracker
+from rescore import RescoreScheduler
+from blob_gc import BlobGCScheduler
+from database import Database, JOB_QUEUED, JOB_RUNNING, JOB_STATUS_PROJECTION, mime_pool, preload_extractors
+from pdf_pool import pdf_pool
+from jobs import JOB_ANALYZE_FILE, ANALYSIS_PENDING, ANALYSIS_DONE, analyze_file
+from scoring import model_info, warm_up
+from storage import (
+    IngestRequest, IngestStream, BlobStore, ChunkHasher,
+    ingest_stream, chunk_span, preallocate_part, write_chunk, read_header, blob_key,
+)
 import uuid
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
 from werkzeug.utils import secure_filename
-import pickle
-import pandas as pd
-import magic
+import hashlib
+
+startup_report.mark("imports")
 
 load_dotenv()
 
 app = Flask(__name__)
 
-# ============================================================================
-# Load ML Model for Survivability Prediction
-# ============================================================================
-
-ML_MODEL = None
-MODEL_PATH = os.environ.get('MODEL_PATH', 'model.pkl')
-
-try:
-    if os.path.exists(MODEL_PATH):
-        with open(MODEL_PATH, 'rb') as f:
-            ML_MODEL = pickle.load(f)
-        print(f"✅ ML model loaded from {MODEL_PATH}")
-    else:
-        print(f"⚠️  ML model not found at {MODEL_PATH}. Survivability scores will use fallback calculation.")
-except Exception as e:
-    print(f"⚠️  Failed to load ML model: {e}. Using fallback calculation.")
+# ObjectId/datetime-aware JSON (uses orjson when installed)
+app.json = MongoJSONProvider(app)
 
 # ============================================================================
 # Configuration & CORS
@@ -53,7 +53,7 @@ RP_NAME = os.environ.get('RP_NAME', 'Domus Memoriae')
 CORS(app, 
      supports_credentials=True, 
      origins=[FRONTEND_URL],
-     allow_headers=['Content-Type', 'Authorization'],
+     allow_headers=['Content-Type', 'Authorization', 'X-Chunk-SHA256'],
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
 
 app.secret_key = os.environ.get('SECRET_KEY', secrets.token_hex(32))
@@ -82,6 +82,39 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 # Create upload directory if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Uploads are streamed into UPLOAD_FOLDER/.incoming while being hashed, then
+# renamed into place (same filesystem, so the rename never copies bytes)
+INCOMING_FOLDER = os.path.join(UPLOAD_FOLDER, '.incoming')
+
+class UploadRequest(IngestRequest):
+    ingest_dir = INCOMING_FOLDER
+
+app.request_class = UploadRequest
+
+# Content-addressed storage: identical bytes are stored once under UPLOAD_FOLDER/blobs
+blob_store = BlobStore(UPLOAD_FOLDER)
+
+# --- ANALYSIS CONFIGURATION ---
+# 'async': uploads return 202 and jobs.py workers score the file (run `python jobs.py`)
+# 'inline': score in the request thread and return 201 (handy for local dev without workers)
+ANALYSIS_MODE = os.environ.get('ANALYSIS_MODE', 'async').lower()
+
+# --- CHUNKED UPLOAD CONFIGURATION ---
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024   # 8MB
+MIN_CHUNK_SIZE = 256 * 1024            # 256KB
+MAX_CHUNK_SIZE = 64 * 1024 * 1024      # 64MB (each chunk is held in memory while verified)
+chunk_hasher = ChunkHasher()
+
+# --- DOWNLOAD CONFIGURATION ---
+# Downloads honour Range, If-None-Match and If-Modified-Since. Optionally hand the
+# byte transfer to the front proxy instead of streaming it through the worker:
+#   'x-accel'    nginx: X-Accel-Redirect to DOWNLOAD_ACCEL_PREFIX + path under UPLOAD_FOLDER
+#   'x-sendfile' Apache/lighttpd: X-Sendfile with the absolute path
+# The proxy then serves ranges itself; conditional requests are still answered here.
+DOWNLOAD_OFFLOAD = os.environ.get('DOWNLOAD_OFFLOAD', '').lower()
+DOWNLOAD_ACCEL_PREFIX = os.environ.get('DOWNLOAD_ACCEL_PREFIX', '/protected-files/')
+app.config['USE_X_SENDFILE'] = DOWNLOAD_OFFLOAD in ('x-accel', 'x-sendfile')
+
 # --- SESSION & COOKIE CONFIGURATION ---
 # In production: cookies must be Secure (HTTPS) and SameSite=None for cross-origin requests
 # In development: Secure=False, SameSite=Lax works fine over HTTP on localhost
@@ -105,167 +138,133 @@ else:
     )
 
 try:
-    db = Database()
+    with startup_report.phase("mongo"):
+        db = Database()
     print("✅ Database initialized successfully")
 except Exception as e:
     print(f"❌ Database initialization failed: {e}")
     db = None
 
+# Views/downloads are counted in memory and flushed in batches (see tracking.py)
+access_tracker = AccessTracker(db.files) if db is not None else None
+
+# Periodic re-scoring of stale survivability scores (off unless RESCORE_INTERVAL_HOURS is set)
+rescore_scheduler = RescoreScheduler(db) if db is not None else None
+
+# Periodic collection of unreferenced blobs and upload leftovers (off unless BLOB_GC_INTERVAL_HOURS is set)
+blob_gc_scheduler = BlobGCScheduler(db, UPLOAD_FOLDER) if db is not None else None
+
+@app.before_request
+def start_background_tasks():
+    startup_report.request_started()
+    if rescore_scheduler is not None:
+        rescore_scheduler.ensure_started()
+    if blob_gc_scheduler is not None:
+        blob_gc_scheduler.ensure_started()
+
 # ============================================================================
-# Helpers & Middleware
+# Process Lifecycle (gunicorn hooks, see gunicorn.conf.py)
 # ============================================================================
 
-def stringify_ids(obj):
-    """Recursively converts MongoDB ObjectIds to strings for JSON responses."""
-    if isinstance(obj, list):
-        return [stringify_ids(item) for item in obj]
-    if isinstance(obj, dict):
-        return {k: stringify_ids(v) for k, v in obj.items()}
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    return obj
-
-def calculate_sha256(file_path):
-    """Calculate SHA256 hash of a file."""
-    sha256_hash = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-    return sha256_hash.hexdigest()
-
-def detect_mime_type(file_path):
-    """Detect actual MIME type using python-magic."""
-    try:
-        mime = magic.Magic(mime=True)
-        return mime.from_file(file_path)
-    except:
-        return "application/octet-stream"
+def before_fork():
+    """
+    Runs once in the gunicorn master when the app is preloaded. Everything
+    imported and loaded so far (model, pandas/sklearn if the pickled pipeline is
+    used, libmagic, pypdf) is shared copy-on-write by the workers forked next.
+    """
+    startup_report.preloaded = True
+    print(f"[INFO] App preloaded in the gunicorn master (pid {os.getpid()}); workers share it copy-on-write")
+    # Workers get their own clients (after_fork); the master needs none
+    if db is not None:
+        db.close()
+    # Keep the preloaded objects out of future collections, so the workers'
+    # garbage collector doesn't write to (and un-share) their pages
+    gc.collect()
+    gc.freeze()
+
+def after_fork():
+    """Runs in each gunicorn worker right after fork, before it serves requests."""
+    startup_report.forked()
+    if db is not None:
+        db.reconnect()
+        access_tracker.collection = db.files
+
+def before_worker_exit():
+    """
+    Runs in a gunicorn worker as it shuts down. gunicorn does not reliably run
+    atexit handlers in workers, so buffered access counts are flushed here.
+    """
+    if access_tracker is not None:
+        access_tracker.flush()
+
+# ============================================================================
+# Helpers & Middleware
+# ============================================================================
 
 def allowed_file(filename):
     """Check if file extension is allowed."""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_ml_features(file_data):
-    """
-    Extract features from file_data that match the training data columns.
-    Returns a pandas DataFrame with a single row.
-    """
-    # Get file age in days
-    uploaded_at = file_data.get('uploaded_at', datetime.utcnow())
-    if isinstance(uploaded_at, str):
-        uploaded_at = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
-    file_age_days = (datetime.utcnow() - uploaded_at).days
-    
-    # Map file extension to category
-    ext = file_data.get('ext', '').lower()
-    
-    # Common format categories
-    image_formats = ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'tif', 'webp', 'heic', 'heif', 'svg']
-    video_formats = ['mp4', 'avi', 'mov', 'wmv', 'flv', 'mkv', 'webm', 'm4v', 'mpeg', 'mpg']
-    document_formats = ['pdf', 'doc', 'docx', 'txt', 'rtf', 'odt']
-    audio_formats = ['mp3', 'wav', 'ogg', 'flac', 'm4a', 'aac']
-    
-    if ext in image_formats:
-        file_type = 'image'
-    elif ext in video_formats:
-        file_type = 'video'
-    elif ext in document_formats:
-        file_type = 'document'
-    elif ext in audio_formats:
-        file_type = 'audio'
-    else:
-        file_type = 'other'
-    
-    # Format risk levels
-    high_risk_formats = ['wma', 'rm', 'ra', 'swf', 'fla', 'psd', 'ai', 'doc', 'bmp', 'tiff']
-    medium_risk_formats = ['avi', 'mov', 'wmv']
-    modern_formats = ['mp4', 'png', 'jpg', 'jpeg', 'pdf', 'mp3', 'webp']
-    
-    if ext in high_risk_formats:
-        format_risk = 'high'
-    elif ext in medium_risk_formats:
-        format_risk = 'medium'
-    elif ext in modern_formats:
-        format_risk = 'low'
-    else:
-        format_risk = 'medium'
-    
-    # Build feature dictionary matching training data
-    features = {
-        'ext': ext,
-        'file_type': file_type,
-        'format_risk': format_risk,
-        'size_bytes': file_data.get('size_bytes', 0),
-        'metadata_score': file_data.get('metadata_score', 0),
-        'access_risk_score': file_data.get('access_risk_score', 0),
-        'duplicate_count': file_data.get('duplicate_count', 0),
-        'access_count': file_data.get('access_count', 0),
-        'file_age_days': file_age_days,
-        'mime_mismatch': 1 if file_data.get('mime_claimed') != file_data.get('mime_detected') else 0,
-    }
-    
-    return pd.DataFrame([features])
+# --- FILE LISTING ---
+# Fields needed by list views; metadata_json and storage internals are only
+# returned by GET /api/files/<file_id> (or ?view=full)
+FILE_LIST_PROJECTION = {
+    "file_id": 1, "vault_id": 1, "folder_id": 1, "original_filename": 1, "ext": 1,
+    "size_bytes": 1, "mime_claimed": 1, "mime_detected": 1, "metadata_score": 1,
+    "access_risk_score": 1, "survivability_score": 1, "model_version": 1, "duplicate_count": 1,
+    "analysis_status": 1, "uploaded_at": 1, "access_count": 1
+}
+FILE_LIST_SORT = [("uploaded_at", -1), ("_id", -1)]
+FILE_PAGE_SIZE = 100
+FILE_PAGE_MAX = 500
+FILE_STREAM_BATCH = 200
+STREAM_FLUSH_BYTES = 64 * 1024
 
-def predict_survivability(file_data):
-    """
-    Predict survivability score (0-100) for a file.
-    Higher score = better chance of long-term survival.
-    Uses ML model if available, otherwise uses rule-based fallback.
-    """
-    if ML_MODEL is not None:
-        try:
-            # Extract features
-            features_df = extract_ml_features(file_data)
-            
-            # Predict using the model
-            prediction = ML_MODEL.predict(features_df)[0]
-            
-            # Ensure score is between 0-100
-            score = max(0, min(100, prediction))
-            
-            return round(score, 1)
-        except Exception as e:
-            print(f"[WARNING] ML prediction failed: {e}. Using fallback.")
-    
-    # Fallback: Rule-based scoring (inverse of access risk)
-    access_risk = file_data.get('access_risk_score', 50)
-    metadata_score = file_data.get('metadata_score', 0)
-    
-    # Start with inverse of access risk
-    base_score = 100 - access_risk
-    
-    # Bonus for good metadata
-    metadata_bonus = metadata_score * 0.2  # Up to +20 points
-    
-    # Bonus for duplicates (redundancy helps survival)
-    duplicate_bonus = min(file_data.get('duplicate_count', 0) * 5, 15)
-    
-    final_score = base_score + metadata_bonus + duplicate_bonus
-    return round(max(0, min(100, final_score)), 1)
-
-def calculate_vault_resiliency(vault_id):
-    """
-    Calculate the overall resiliency score for a vault.
-    This is the average survivability score across all files.
-    """
+def encode_file_cursor(doc):
+    raw = f"{doc['uploaded_at'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_file_cursor(cursor):
+    """Inverse of encode_file_cursor. Raises ValueError on malformed input."""
     try:
-        files = list(db.files.find({"vault_id": ObjectId(vault_id)}))
-        
-        if not files:
-            return 0
-        
-        # Get survivability scores
-        scores = [f.get('survivability_score', 0) for f in files if 'survivability_score' in f]
-        
-        if not scores:
-            return 0
-        
-        avg_score = sum(scores) / len(scores)
-        return round(avg_score, 1)
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        uploaded_at, last_id = raw.split('|', 1)
+        return datetime.fromisoformat(uploaded_at), ObjectId(last_id)
     except Exception as e:
-        print(f"[ERROR] Failed to calculate vault resiliency: {e}")
-        return 0
+        raise ValueError("Invalid cursor") from e
+
+def iter_json_items(docs):
+    """Serialize documents one at a time, yielding comma-joined ~STREAM_FLUSH_BYTES chunks."""
+    buf, size, sep = [], 0, b''
+    for doc in docs:
+        part = sep + app.json.dumps_bytes(doc)
+        sep = b','
+        buf.append(part)
+        size += len(part)
+        if size >= STREAM_FLUSH_BYTES:
+            yield b''.join(buf)
+            buf, size = [], 0
+    if buf:
+        yield b''.join(buf)
+
+def stream_file_page(docs, limit):
+    """Stream {"files": [...], "next_cursor": ...}; docs holds up to limit + 1 items."""
+    state = {"count": 0, "last": None, "has_more": False}
+    
+    def page_docs():
+        for doc in docs:
+            if state["count"] == limit:
+                state["has_more"] = True
+                break
+            state["count"] += 1
+            state["last"] = doc
+            yield doc
+    
+    yield b'{"files":['
+    yield from iter_json_items(page_docs())
+    next_cursor = encode_file_cursor(state["last"]) if state["has_more"] else None
+    yield b'],"next_cursor":' + app.json.dumps_bytes(next_cursor) + b'}'
 
 def login_required(f):
     """Protects routes by checking for user_id in session."""
@@ -414,12 +413,12 @@ def get_user_details(user_id):
         if not user:
             return jsonify({"error": "User not found"}), 404
         
-        return jsonify(stringify_ids({
+        return jsonify({
             "id": user['_id'],
             "first_name": user.get('first_name'),
             "last_name": user.get('last_name'),
             "email": user.get('email')
-        }))
+        })
     except Exception as e:
         print(f"[ERROR] Get user failed: {e}")
         return jsonify({"error": "Failed to retrieve user"}), 500
@@ -439,7 +438,7 @@ def create_vault():
         description=data.get('description')
     )
     if not ok: return jsonify({"error": msg}), 400
-    return jsonify(stringify_ids({"id": vault['_id'], "success": True}))
+    return jsonify({"id": vault['_id'], "success": True})
 
 @app.route('/api/vault/join', methods=['POST', 'OPTIONS'])
 @login_required
@@ -463,20 +462,20 @@ def join_vault():
     if not ok:
         return jsonify({"error": msg}), 400
 
-    return jsonify(stringify_ids({
+    return jsonify({
         "success": True,
         "vault": {
             "id": vault['_id'],
             "name": vault.get('name')
         }
-    }))
+    })
 
 @app.route('/api/vaults', methods=['GET', 'OPTIONS'])
 @login_required
 def get_my_vaults():
     if request.method == 'OPTIONS': return '', 204
     vaults = db.get_vaults_for_user(session['user_id'])
-    return jsonify(stringify_ids(vaults))
+    return jsonify(vaults)
 
 @app.route('/api/vaults/<vault_id>', methods=['GET', 'OPTIONS'])
 @login_required
@@ -490,22 +489,25 @@ def get_vault_details(vault_id):
         })
         if not vault: return jsonify({"error": "Vault not found"}), 404
         
-        # Calculate resiliency if not already set
-        resiliency_score = vault.get('resiliency_score')
-        if resiliency_score is None:
-            resiliency_score = calculate_vault_resiliency(vault_id)
-            db.vaults.update_one(
-                {"_id": ObjectId(vault_id)},
-                {"$set": {"resiliency_score": resiliency_score}}
-            )
+        # Resiliency comes from the vault's running aggregates (rebuilt once for older vaults)
+        if 'stats' in vault:
+            stats = vault['stats']
+        else:
+            db.rebuild_vault_stats(vault['_id'])
+            stats = db.vaults.find_one({"_id": vault['_id']}, {"stats": 1}).get('stats')
+        resiliency_score = db.resiliency_from_stats(stats)
         
-        return jsonify(stringify_ids({
+        return jsonify({
             "id": vault['_id'],
             "name": vault.get('name'),
             "joinCode": vault.get('join_code'),
             "resilienceScore": resiliency_score,
+            "resilienceByType": {
+                file_type: db.resiliency_from_stats(type_stats)
+                for file_type, type_stats in (stats or {}).get('by_type', {}).items()
+            },
             "members": vault.get('members', [])
-        }))
+        })
     except Exception as e:
         print(f"[ERROR] Get vault details failed: {e}")
         return jsonify({"error": "Invalid vault ID"}), 400
@@ -514,6 +516,109 @@ def get_vault_details(vault_id):
 # File Routes
 # ============================================================================
 
+def create_file_record(vault_id, user_id, *, original_filename, mime_claimed, metadata_json,
+                       sha256_hash, size_bytes, stored_key, blob_created):
+    """
+    Insert the file record for a stored blob. Shared by the single-request upload
+    and the chunked upload completion so both produce identical records. The
+    caller holds a reference to the blob (see acquire_and_store); it is given
+    back if the record cannot be inserted.
+    """
+    file_id = str(uuid.uuid4())
+    file_extension = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
+    
+    # Create file record (analysis fields are filled in by analyze_file)
+    file_record = {
+        "_id": ObjectId(),
+        "file_id": file_id,
+        "vault_id": ObjectId(vault_id),
+        "user_id": ObjectId(user_id),
+        "original_filename": original_filename,
+        "stored_key": stored_key,
+        "ext": file_extension,
+        "mime_claimed": mime_claimed,
+        "size_bytes": size_bytes,
+        "sha256": sha256_hash,
+        "metadata_json": metadata_json,
+        "analysis_status": ANALYSIS_PENDING,
+        "uploaded_at": datetime.utcnow(),
+        "last_accessed_at": datetime.utcnow(),
+        "access_count": 0
+    }
+    
+    # Insert into database (give back the blob reference if that fails)
+    try:
+        db.files.insert_one(file_record)
+    except Exception:
+        db.release_blobs([stored_key])
+        raise
+    db.record_file_added(vault_id, file_extension, size_bytes)
+    
+    print(f"[DEBUG] File uploaded: {original_filename} ({size_bytes} bytes) to vault {vault_id}"
+          f" ({'new blob' if blob_created else 'deduplicated'})")
+    return file_record
+
+def start_file_analysis(file_record, header):
+    """
+    Analyze a new file record and build the upload response.
+    
+    In async mode (default) the record stays pending and an analysis job is
+    queued for jobs.py workers: returns (body, 202). In inline mode the analysis
+    runs in the request thread: returns (body, 201).
+    """
+    body = {
+        "success": True,
+        "file": {
+            "id": file_record['_id'],
+            "file_id": file_record['file_id'],
+            "original_filename": file_record['original_filename'],
+            "size_bytes": file_record['size_bytes'],
+            "ext": file_record['ext'],
+            "analysis_status": ANALYSIS_PENDING,
+            "uploaded_at": file_record['uploaded_at'].isoformat()
+        }
+    }
+    
+    if ANALYSIS_MODE != 'inline':
+        job = db.enqueue_job(JOB_ANALYZE_FILE, file_id=file_record['_id'], vault_id=file_record['vault_id'],
+                             header=header)
+        body["job"] = {
+            "id": job['_id'],
+            "status": job['status'],
+            "status_url": f"/api/jobs/{job['_id']}"
+        }
+        return body, 202
+    
+    fields = analyze_file(db, file_record, blob_store.path_for_key(file_record['stored_key']), header=header)
+    db.files.update_one({"_id": file_record['_id']}, {"$set": fields})
+    db.record_files_scored([(file_record['vault_id'], file_record['ext'], None, fields['survivability_score'])])
+    vault_resiliency = db.calculate_vault_resiliency(file_record['vault_id'])
+    print(f"[DEBUG] Survivability score: {fields['survivability_score']}, Vault resiliency: {vault_resiliency}")
+    
+    body["file"].update({
+        "mime_type": fields['mime_detected'],
+        "metadata_score": fields['metadata_score'],
+        "access_risk_score": fields['access_risk_score'],
+        "survivability_score": fields['survivability_score'],
+        "model_version": fields['model_version'],
+        "duplicate_count": fields['duplicate_count'],
+        "analysis_status": fields['analysis_status']
+    })
+    return body, 201
+
+def acquire_and_store(sha256_hash, size_bytes, store):
+    """
+    Take a blob reference, then run ``store`` (blob_store.put / adopt). Reusing an
+    existing blob is only safe once the reference is held: until then the blob GC
+    may be collecting it. The reference is given back if storing fails.
+    """
+    db.acquire_blob(sha256_hash, size_bytes)
+    try:
+        return store()
+    except Exception:
+        db.release_blobs([blob_key(sha256_hash)])
+        raise
+
 @app.route('/api/vaults/<vault_id>/files', methods=['POST', 'OPTIONS'])
 @login_required
 def upload_file(vault_id):
@@ -522,11 +627,8 @@ def upload_file(vault_id):
     
     try:
         # Verify vault membership
-        vault = db.vaults.find_one({
-            "_id": ObjectId(vault_id),
-            "members.user_id": ObjectId(session['user_id'])
-        })
-        if not vault:
+        role = db.get_member_role(ObjectId(vault_id), session['user_id'])
+        if not role:
             return jsonify({"error": "Vault not found or access denied"}), 403
         
         # Check if file is in request
@@ -549,149 +651,296 @@ def upload_file(vault_id):
             except:
                 pass
         
-        # Generate unique file ID and secure filename
-        file_id = str(uuid.uuid4())
         original_filename = secure_filename(file.filename)
-        file_extension = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
+        mime_claimed = file.content_type or "application/octet-stream"
+        
+        # The body was already streamed to disk (hashed and sized) while parsing;
+        # store it by content hash, or drop it if identical bytes are already stored
+        ingest = file.stream
+        if not isinstance(ingest, IngestStream):
+            ingest = ingest_stream(ingest, INCOMING_FOLDER)
         
-        # Create storage path (organized by vault)
-        vault_storage_dir = os.path.join(app.config['UPLOAD_FOLDER'], vault_id)
-        os.makedirs(vault_storage_dir, exist_ok=True)
+        size_bytes = ingest.size
+        sha256_hash = ingest.hexdigest()
+        header = ingest.header
+        stored_key, blob_created = acquire_and_store(sha256_hash, size_bytes, lambda: blob_store.put(ingest))
         
-        stored_filename = f"{file_id}.{file_extension}"
-        file_path = os.path.join(vault_storage_dir, stored_filename)
-        stored_key = f"{vault_id}/{stored_filename}"
+        file_record = create_file_record(
+            vault_id, session['user_id'],
+            original_filename=original_filename,
+            mime_claimed=mime_claimed,
+            metadata_json=metadata_json,
+            sha256_hash=sha256_hash,
+            size_bytes=size_bytes,
+            stored_key=stored_key,
+            blob_created=blob_created,
+        )
+        body, status = start_file_analysis(file_record, header)
+        return jsonify(body), status
         
-        # Save file
-        file.save(file_path)
+    except Exception as e:
+        print(f"[ERROR] File upload failed: {e}")
+        return jsonify({"error": "File upload failed", "details": str(e)}), 500
+
+# ============================================================================
+# Chunked Upload Routes (resumable, parallel)
+# ============================================================================
+#   POST   /api/vaults/<vault_id>/uploads         begin  -> upload_id, chunk_size, chunk_count
+#   PUT    /api/uploads/<upload_id>/chunks/<n>    chunk n (X-Chunk-SHA256: hex digest of the body)
+#   GET    /api/uploads/<upload_id>               received chunks + contiguous offset (resume)
+#   POST   /api/uploads/<upload_id>/complete      create the file record (same as upload_file)
+#   DELETE /api/uploads/<upload_id>               abort
+
+def upload_part_path(upload_id):
+    return os.path.join(INCOMING_FOLDER, f"{upload_id}.upload")
+
+def remove_upload_files(part_path):
+    """Drop a finished or aborted session's part file and its saved hash state."""
+    chunk_hasher.discard(part_path)
+    try:
+        os.remove(part_path)
+    except FileNotFoundError:
+        pass
+
+def upload_status_body(upload):
+    """Resume info: which chunks are stored and how many leading bytes are contiguous."""
+    received = sorted(upload.get('received', []))
+    received_set = set(received)
+    missing = [i for i in range(upload['chunk_count']) if i not in received_set]
+    first_missing = missing[0] if missing else upload['chunk_count']
+    offset, _ = chunk_span(first_missing, upload['chunk_size'], upload['size_bytes'])
+    return {
+        "upload_id": upload['_id'],
+        "status": upload['status'],
+        "size_bytes": upload['size_bytes'],
+        "chunk_size": upload['chunk_size'],
+        "chunk_count": upload['chunk_count'],
+        "received": received,
+        "missing": missing,
+        "offset": min(offset, upload['size_bytes'])
+    }
+
+def get_owned_upload(upload_id):
+    """Fetch an upload session owned by the current user, or return (None, error response)."""
+    try:
+        upload = db.get_upload_session(upload_id)
+    except ValueError:
+        upload = None
+    if not upload or upload['user_id'] != ObjectId(session['user_id']):
+        return None, (jsonify({"error": "Upload not found"}), 404)
+    return upload, None
+
+@app.route('/api/vaults/<vault_id>/uploads', methods=['POST', 'OPTIONS'])
+@login_required
+def begin_chunked_upload(vault_id):
+    """Start a resumable upload session."""
+    if request.method == 'OPTIONS': return '', 204
+    
+    try:
+        data = request.json or {}
+        original_filename = secure_filename(data.get('filename', ''))
+        if not original_filename or not allowed_file(original_filename):
+            return jsonify({"error": "File type not allowed"}), 400
         
-        # Get file size
-        size_bytes = os.path.getsize(file_path)
+        size_bytes = int(data.get('size_bytes', 0))
+        if size_bytes <= 0 or size_bytes > MAX_FILE_SIZE:
+            return jsonify({"error": f"size_bytes must be between 1 and {MAX_FILE_SIZE}"}), 400
         
-        # Calculate SHA256 hash
-        sha256_hash = calculate_sha256(file_path)
+        chunk_size = int(data.get('chunk_size') or DEFAULT_CHUNK_SIZE)
+        chunk_size = max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, chunk_size))
         
-        # Detect actual MIME type
-        mime_detected = detect_mime_type(file_path)
-        mime_claimed = file.content_type or "application/octet-stream"
+        ok, msg, upload = db.create_upload_session(
+            acting_user_id=session['user_id'],
+            vault_id=vault_id,
+            filename=original_filename,
+            size_bytes=size_bytes,
+            chunk_size=chunk_size,
+            mime_claimed=data.get('content_type') or "application/octet-stream",
+            metadata=data.get('metadata') if isinstance(data.get('metadata'), dict) else {}
+        )
+        if not ok:
+            return jsonify({"error": msg}), 403
         
-        # Extract PDF metadata automatically if it's a PDF
-        if file_extension.lower() == 'pdf':
-            pdf_metadata = extract_pdf_metadata(file_path)
-            # Merge PDF metadata with user-provided metadata
-            if pdf_metadata:
-                metadata_json.update(pdf_metadata)
+        preallocate_part(upload_part_path(upload['_id']), size_bytes)
+        return jsonify(upload_status_body(upload)), 201
         
-        # Calculate metadata score with enhanced data
-        metadata_score = calculate_metadata_score(metadata_json)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": "Invalid upload request", "details": str(e)}), 400
+    except Exception as e:
+        print(f"[ERROR] Begin upload failed: {e}")
+        return jsonify({"error": "Failed to start upload"}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['GET', 'OPTIONS'])
+@login_required
+def get_chunked_upload(upload_id):
+    """Report upload progress so an interrupted client can resume."""
+    if request.method == 'OPTIONS': return '', 204
+    upload, error = get_owned_upload(upload_id)
+    if error: return error
+    return jsonify(upload_status_body(upload))
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT', 'OPTIONS'])
+@login_required
+def put_upload_chunk(upload_id, index):
+    """Store one chunk. Chunks may arrive in any order and in parallel."""
+    if request.method == 'OPTIONS': return '', 204
+    
+    try:
+        upload, error = get_owned_upload(upload_id)
+        if error: return error
+        if upload['status'] != 'open':
+            return jsonify({"error": f"Upload is {upload['status']}"}), 409
+        if index < 0 or index >= upload['chunk_count']:
+            return jsonify({"error": "Chunk index out of range"}), 400
         
-        # Check for duplicates in this vault
-        duplicate_count = db.files.count_documents({
-            "vault_id": ObjectId(vault_id),
-            "sha256": sha256_hash
-        })
+        # Re-sent chunks are acknowledged but never rewritten (they may already be hashed)
+        if index in upload.get('received', []):
+            return jsonify({
+                "index": index,
+                "received_count": len(upload['received']),
+                "chunk_count": upload['chunk_count']
+            })
         
-        # Calculate access risk using the new function from database.py
-        access_risk_score, access_risk_reason = calculate_access_risk_score(
-            mime_claimed, 
-            mime_detected, 
-            metadata_json
-        )
+        offset, length = chunk_span(index, upload['chunk_size'], upload['size_bytes'])
+        if request.content_length != length:
+            return jsonify({"error": f"Chunk {index} must be exactly {length} bytes"}), 400
         
-        # Prepare data for survivability prediction
-        temp_file_data = {
-            'ext': file_extension,
-            'mime_claimed': mime_claimed,
-            'mime_detected': mime_detected,
-            'metadata_score': metadata_score,
-            'uploaded_at': datetime.utcnow(),
-            'duplicate_count': duplicate_count,
-            'access_count': 0,
-            'access_risk_score': access_risk_score,
-            'size_bytes': size_bytes
-        }
+        expected_sha256 = (request.headers.get('X-Chunk-SHA256') or '').lower()
+        if not expected_sha256:
+            return jsonify({"error": "X-Chunk-SHA256 header is required"}), 400
         
-        # Predict survivability score using ML model
-        survivability_score = predict_survivability(temp_file_data)
+        data = request.get_data(cache=False)
+        if len(data) != length or hashlib.sha256(data).hexdigest() != expected_sha256:
+            return jsonify({"error": "Chunk verification failed"}), 422
         
-        # Create file record
-        file_record = {
-            "_id": ObjectId(),
-            "file_id": file_id,
-            "vault_id": ObjectId(vault_id),
-            "user_id": ObjectId(session['user_id']),
-            "original_filename": original_filename,
-            "stored_key": stored_key,
-            "ext": file_extension,
-            "mime_claimed": mime_claimed,
-            "mime_detected": mime_detected,
-            "size_bytes": size_bytes,
-            "sha256": sha256_hash,
-            "metadata_json": metadata_json,
-            "metadata_score": metadata_score,
-            "duplicate_count": duplicate_count,
-            "access_risk_score": access_risk_score,
-            "access_risk_reason": access_risk_reason,
-            "survivability_score": survivability_score,
-            "uploaded_at": datetime.utcnow(),
-            "last_accessed_at": datetime.utcnow(),
-            "access_count": 0
-        }
+        part_path = upload_part_path(upload['_id'])
+        write_chunk(part_path, offset, data)
         
-        # Insert into database
-        result = db.files.insert_one(file_record)
+        upload = db.mark_chunk_received(upload['_id'], index)
+        if not upload:
+            return jsonify({"error": "Upload is no longer open"}), 409
         
-        # Update vault resiliency score
-        vault_resiliency = calculate_vault_resiliency(vault_id)
-        db.vaults.update_one(
-            {"_id": ObjectId(vault_id)},
-            {"$set": {"resiliency_score": vault_resiliency}}
+        # Feed the whole-file hash while this chunk is still in memory
+        chunk_hasher.advance(
+            part_path, upload['chunk_size'], upload['size_bytes'],
+            set(upload['received']), index=index, data=data
         )
         
-        print(f"[DEBUG] File uploaded: {original_filename} ({size_bytes} bytes) to vault {vault_id}")
-        print(f"[DEBUG] Survivability score: {survivability_score}, Vault resiliency: {vault_resiliency}")
-        
-        return jsonify(stringify_ids({
-            "success": True,
-            "file": {
-                "id": result.inserted_id,
-                "file_id": file_id,
-                "original_filename": original_filename,
-                "size_bytes": size_bytes,
-                "ext": file_extension,
-                "mime_type": mime_detected,
-                "metadata_score": metadata_score,
-                "access_risk_score": access_risk_score,
-                "survivability_score": survivability_score,
-                "duplicate_count": duplicate_count,
-                "uploaded_at": file_record['uploaded_at'].isoformat()
-            }
-        })), 201
+        return jsonify({
+            "index": index,
+            "received_count": len(upload['received']),
+            "chunk_count": upload['chunk_count']
+        })
         
     except Exception as e:
-        print(f"[ERROR] File upload failed: {e}")
+        print(f"[ERROR] Chunk upload failed: {e}")
+        return jsonify({"error": "Chunk upload failed"}), 500
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST', 'OPTIONS'])
+@login_required
+def complete_chunked_upload(upload_id):
+    """Finish a chunked upload and create the file record (chunks were already written in place)."""
+    if request.method == 'OPTIONS': return '', 204
+    
+    upload, error = get_owned_upload(upload_id)
+    if error: return error
+    if len(upload.get('received', [])) != upload['chunk_count']:
+        return jsonify({"error": "Upload incomplete", **upload_status_body(upload)}), 409
+    
+    upload = db.claim_upload_session(upload['_id'])
+    if not upload:
+        return jsonify({"error": "Upload already completing or completed"}), 409
+    
+    part_path = upload_part_path(upload['_id'])
+    try:
+        sha256_hash = chunk_hasher.finish(
+            part_path, upload['chunk_size'], upload['size_bytes'], upload['chunk_count']
+        )
+        header = read_header(part_path)
+        stored_key, blob_created = acquire_and_store(
+            sha256_hash, upload['size_bytes'], lambda: blob_store.adopt(part_path, sha256_hash)
+        )
+        file_record = create_file_record(
+            upload['vault_id'], upload['user_id'],
+            original_filename=upload['original_filename'],
+            mime_claimed=upload['mime_claimed'],
+            metadata_json=upload.get('metadata_json') or {},
+            sha256_hash=sha256_hash,
+            size_bytes=upload['size_bytes'],
+            stored_key=stored_key,
+            blob_created=blob_created,
+        )
+    except Exception as e:
+        # No file record and no blob reference were kept, and the part file is
+        # still in place (adopt links it): the client may retry completion
+        print(f"[ERROR] Upload completion failed: {e}")
+        db.set_upload_status(upload['_id'], 'open')
+        return jsonify({"error": "Upload completion failed", "details": str(e)}), 500
+    
+    # The file record now owns the blob: the session and its part file are done
+    db.delete_upload_session(upload['_id'])
+    remove_upload_files(part_path)
+    
+    try:
+        body, status = start_file_analysis(file_record, header)
+        return jsonify(body), status
+    except Exception as e:
+        print(f"[ERROR] Upload completion failed: {e}")
         return jsonify({"error": "File upload failed", "details": str(e)}), 500
 
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def abort_chunked_upload(upload_id):
+    """Abort an upload session and drop its partial data."""
+    upload, error = get_owned_upload(upload_id)
+    if error: return error
+    
+    # A session being completed is left alone: its part file is in use
+    if not db.abort_upload_session(upload['_id']):
+        return jsonify({"error": "Upload is completing and can no longer be aborted"}), 409
+    remove_upload_files(upload_part_path(upload['_id']))
+    return jsonify({"success": True})
+
 @app.route('/api/vaults/<vault_id>/files', methods=['GET', 'OPTIONS'])
 @login_required
 def get_vault_files(vault_id):
-    """Get all files in a vault."""
+    """
+    List files in a vault, newest first, one page at a time, as a streamed
+    JSON response: {"files": [...], "next_cursor": ...}. next_cursor is null
+    on the last page.
+    
+    Query params:
+      limit   page size (default FILE_PAGE_SIZE, max FILE_PAGE_MAX)
+      cursor  next_cursor from the previous page (keyset on uploaded_at, _id)
+      view    'full' to include every stored field (default: list projection)
+    """
     if request.method == 'OPTIONS': return '', 204
     
     try:
         # Verify vault membership
-        vault = db.vaults.find_one({
-            "_id": ObjectId(vault_id),
-            "members.user_id": ObjectId(session['user_id'])
-        })
-        if not vault:
+        role = db.get_member_role(ObjectId(vault_id), session['user_id'])
+        if not role:
             return jsonify({"error": "Vault not found or access denied"}), 403
         
-        # Get all files for this vault
-        files = list(db.files.find({"vault_id": ObjectId(vault_id)}).sort("uploaded_at", -1))
+        limit = max(1, min(FILE_PAGE_MAX, request.args.get('limit', FILE_PAGE_SIZE, type=int)))
+        projection = None if request.args.get('view') == 'full' else FILE_LIST_PROJECTION
         
-        return jsonify(stringify_ids(files))
+        query = {"vault_id": ObjectId(vault_id)}
+        if request.args.get('cursor'):
+            uploaded_at, last_id = decode_file_cursor(request.args['cursor'])
+            query["$or"] = [
+                {"uploaded_at": {"$lt": uploaded_at}},
+                {"uploaded_at": uploaded_at, "_id": {"$lt": last_id}}
+            ]
         
+        files = db.files.find(query, projection).sort(FILE_LIST_SORT).batch_size(FILE_STREAM_BATCH)
+        return Response(
+            stream_with_context(stream_file_page(files.limit(limit + 1), limit)),
+            mimetype='application/json'
+        )
+        
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
     except Exception as e:
         print(f"[ERROR] Get files failed: {e}")
         return jsonify({"error": "Failed to retrieve files"}), 500
@@ -712,24 +961,17 @@ def get_file_details(file_id):
             return jsonify({"error": "File not found"}), 404
         
         # Verify user has access to the vault
-        vault = db.vaults.find_one({
-            "_id": file_record['vault_id'],
-            "members.user_id": ObjectId(session['user_id'])
-        })
-        if not vault:
+        role = db.get_member_role(file_record['vault_id'], session['user_id'])
+        if not role:
             return jsonify({"error": "Access denied"}), 403
         
-        # Update access tracking
-        db.files.update_one(
-            {"file_id": file_id},
-            {
-                "$set": {"last_accessed_at": datetime.utcnow()},
-                "$inc": {"access_count": 1}
-            }
-        )
+        # Update access tracking (write-behind, flushed in batches)
+        access_tracker.record(file_record['_id'])
+        pending_hits, pending_last = access_tracker.pending_for(file_record['_id'])
+        last_accessed_at = max(filter(None, [file_record.get('last_accessed_at'), pending_last]), default=None)
         
         # Return complete file details for ML model
-        return jsonify(stringify_ids({
+        return jsonify({
             "id": file_record['_id'],
             "file_id": file_record['file_id'],
             "vault_id": file_record['vault_id'],
@@ -738,18 +980,19 @@ def get_file_details(file_id):
             "stored_key": file_record['stored_key'],
             "ext": file_record['ext'],
             "mime_claimed": file_record['mime_claimed'],
-            "mime_detected": file_record['mime_detected'],
+            "mime_detected": file_record.get('mime_detected'),
             "size_bytes": file_record['size_bytes'],
             "sha256": file_record['sha256'],
             "metadata_json": file_record.get('metadata_json', {}),
-            "metadata_score": file_record['metadata_score'],
-            "duplicate_count": file_record['duplicate_count'],
-            "access_risk_score": file_record['access_risk_score'],
-            "access_risk_reason": file_record['access_risk_reason'],
+            "metadata_score": file_record.get('metadata_score'),
+            "duplicate_count": file_record.get('duplicate_count'),
+            "access_risk_score": file_record.get('access_risk_score'),
+            "access_risk_reason": file_record.get('access_risk_reason'),
+            "analysis_status": file_record.get('analysis_status', ANALYSIS_DONE),
             "uploaded_at": file_record['uploaded_at'].isoformat(),
-            "last_accessed_at": file_record['last_accessed_at'].isoformat(),
-            "access_count": file_record['access_count']
-        }))
+            "last_accessed_at": last_accessed_at.isoformat() if last_accessed_at else None,
+            "access_count": file_record.get('access_count', 0) + pending_hits
+        })
         
     except Exception as e:
         print(f"[ERROR] Get file details failed: {e}")
@@ -768,38 +1011,147 @@ def download_file(file_id):
             return jsonify({"error": "File not found"}), 404
         
         # Verify access
-        vault = db.vaults.find_one({
-            "_id": file_record['vault_id'],
-            "members.user_id": ObjectId(session['user_id'])
-        })
-        if not vault:
+        role = db.get_member_role(file_record['vault_id'], session['user_id'])
+        if not role:
             return jsonify({"error": "Access denied"}), 403
         
-        # Get file path
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], file_record['stored_key'])
+        # Resolve the stored_key (content-addressed or legacy per-vault path)
+        file_path = blob_store.path_for_key(file_record['stored_key'])
         
         if not os.path.exists(file_path):
             return jsonify({"error": "File not found on disk"}), 404
         
-        # Update access tracking
-        db.files.update_one(
-            {"file_id": file_id},
-            {
-                "$set": {"last_accessed_at": datetime.utcnow()},
-                "$inc": {"access_count": 1}
-            }
-        )
-        
-        return send_file(
+        offload = app.config['USE_X_SENDFILE']
+        response = send_file(
             file_path,
             as_attachment=True,
             download_name=file_record['original_filename'],
-            mimetype=file_record['mime_detected']
+            mimetype=file_record.get('mime_detected') or file_record['mime_claimed'],
+            # Strong validator: the bytes behind a file record never change
+            etag=file_record['sha256'],
+            last_modified=file_record.get('uploaded_at'),
+            conditional=not offload
         )
+        response.cache_control.private = True
+        response.accept_ranges = 'bytes'
+        
+        if offload:
+            # The proxy serves the body (and any Range); only answer 304s here
+            response = response.make_conditional(request)
+            sendfile_path = response.headers.pop('X-Sendfile')
+            if response.status_code != 304:
+                if DOWNLOAD_OFFLOAD == 'x-accel':
+                    rel_path = os.path.relpath(sendfile_path, UPLOAD_FOLDER).replace(os.sep, '/')
+                    response.headers['X-Accel-Redirect'] = DOWNLOAD_ACCEL_PREFIX.rstrip('/') + '/' + rel_path
+                else:
+                    response.headers['X-Sendfile'] = sendfile_path
         
+        # Count a view once: skip revalidations (304) and follow-up ranges of a
+        # video/audio stream that is already playing
+        first_range = request.range.ranges[0][0] if request.range else 0
+        if response.status_code != 304 and first_range == 0:
+            access_tracker.record(file_record['_id'])
+        
+        return response
+        
+    except RequestedRangeNotSatisfiable as e:
+        return e
     except Exception as e:
         print(f"[ERROR] File download failed: {e}")
         return jsonify({"error": "Download failed"}), 500
 
+# ============================================================================
+# Analysis Job Routes
+# ============================================================================
+
+def job_status_body(job):
+    return {
+        "id": job['_id'],
+        "type": job['type'],
+        "file_id": job['file_id'],
+        "status": job['status'],
+        "attempts": job.get('attempts', 0),
+        "error": job.get('error'),
+        "created_at": job['created_at'].isoformat(),
+        "finished_at": job['finished_at'].isoformat() if job.get('finished_at') else None
+    }
+
+@app.route('/api/jobs/<job_id>', methods=['GET', 'OPTIONS'])
+@login_required
+def get_job_status(job_id):
+    """Poll the status of a background analysis job."""
+    if request.method == 'OPTIONS': return '', 204
+    
+    try:
+        job = db.get_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        
+        role = db.get_member_role(job['vault_id'], session['user_id'])
+        if not role:
+            return jsonify({"error": "Access denied"}), 403
+        
+        return jsonify(job_status_body(job))
+        
+    except ValueError:
+        return jsonify({"error": "Invalid job ID"}), 400
+    except Exception as e:
+        print(f"[ERROR] Get job status failed: {e}")
+        return jsonify({"error": "Failed to retrieve job"}), 500
+
+@app.route('/api/vaults/<vault_id>/jobs', methods=['GET', 'OPTIONS'])
+@login_required
+def get_vault_jobs(vault_id):
+    """Status of unfinished analysis jobs in a vault (one poll for a whole batch of uploads)."""
+    if request.method == 'OPTIONS': return '', 204
+    
+    try:
+        role = db.get_member_role(ObjectId(vault_id), session['user_id'])
+        if not role:
+            return jsonify({"error": "Vault not found or access denied"}), 403
+        
+        jobs = db.jobs.find({
+            "vault_id": ObjectId(vault_id),
+            "status": {"$in": [JOB_QUEUED, JOB_RUNNING]}
+        }, JOB_STATUS_PROJECTION).sort("created_at", 1).limit(500)
+        return jsonify([job_status_body(job) for job in jobs])
+        
+    except Exception as e:
+        print(f"[ERROR] Get vault jobs failed: {e}")
+        return jsonify({"error": "Failed to retrieve jobs"}), 500
+
+# ============================================================================
+# Metrics
+# ============================================================================
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Liveness probe; no auth and no database round trip."""
+    return jsonify({"status": "ok", "pid": os.getpid(), "database": db is not None})
+
+@app.route('/api/metrics', methods=['GET', 'OPTIONS'])
+@login_required
+def get_metrics():
+    """Per-process cache statistics, for sizing and TTL tuning."""
+    if request.method == 'OPTIONS': return '', 204
+    return jsonify({
+        "pid": os.getpid(),
+        "membership_cache": db.membership_cache.stats(),
+        "access_tracker": access_tracker.stats(),
+        "model": model_info(),
+        "mime_pool": mime_pool.stats(),
+        "pdf_pool": pdf_pool.stats(),
+        "startup": startup_report.info()
+    })
+
+# Import the scoring engine's and extractors' dependencies and touch the model
+# now, so the first request doesn't (and, when preloaded, the workers share them)
+startup_report.mark("routes")
+with startup_report.phase("warmup"):
+    warm_up()
+    preload_extractors()
+startup_report.ready()
+startup_report.print_report()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+Header metadata extraction benchmark for Domus Memoriae
+
+Builds one sample file per registered format: the tags a real file would
+carry (EXIF, ID3 with embedded cover art, FLAC/Ogg comments, an MP4 with its
+'moov' after a large 'mdat', RIFF INFO...) around a large media payload.
+For each file it reports extractions per second, the bytes actually read
+against the file size, and the fields found. Reading the whole file once is
+shown for comparison; extraction should cost a small fraction of it,
+whatever the file size.
+
+Usage:
+    python bench_extractors.py              # 8 MB payloads, 1s per format
+    python bench_extractors.py 64 0.5       # payload MB, seconds per format
+"""
+
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+from extractors import EXTRACTORS, METADATA_BYTE_BUDGET, BudgetExceeded, BudgetReader, extractor_for
+
+TAGS = {"author": "Ada Lovelace", "title": "Harbour at dusk", "date": "1968-07-14",
+        "description": "Scanned from the family album"}
+COVER_ART_BYTES = 150 * 1024
+
+
+def _tiff_block(endian="<"):
+    """A TIFF header and IFD0 with Artist, ImageDescription, DateTime, Make and Model."""
+    values = [(0x010E, TAGS["description"]), (0x010F, "Canon"), (0x0110, "AE-1"),
+              (0x0132, "1968:07:14 19:30:00"), (0x013B, TAGS["author"])]
+    data_offset = 8 + 2 + 12 * len(values) + 4
+    entries, blob = b"", b""
+    for tag, text in values:
+        raw = text.encode() + b"\x00"
+        entries += struct.pack(endian + "HHII", tag, 2, len(raw), data_offset + len(blob))
+        blob += raw
+    order = b"II" if endian == "<" else b"MM"
+    return (order + struct.pack(endian + "HI", 42, 8) + struct.pack(endian + "H", len(values))
+            + entries + b"\x00\x00\x00\x00" + blob)
+
+
+def _jpeg(payload):
+    exif = b"Exif\x00\x00" + _tiff_block(">")
+    return (b"\xff\xd8" + b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+            + b"\xff\xdb" + struct.pack(">H", 67) + b"\x00" * 65
+            + b"\xff\xda" + struct.pack(">H", 8) + b"\x00" * 6 + payload + b"\xff\xd9")
+
+
+def _tiff(payload):
+    return _tiff_block("<") + payload
+
+
+def _png(payload):
+    def chunk(ctype, data):
+        return struct.pack(">I", len(data)) + ctype + data + struct.pack(">I", zlib.crc32(ctype + data))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 1024, 1024, 8, 2, 0, 0, 0))
+            + chunk(b"tEXt", b"Author\x00" + TAGS["author"].encode())
+            + chunk(b"iTXt", b"Title\x00\x00\x00\x00\x00" + TAGS["title"].encode())
+            + chunk(b"tEXt", b"Creation Time\x00" + TAGS["date"].encode())
+            + chunk(b"zTXt", b"Description\x00\x00" + zlib.compress(TAGS["description"].encode()))
+            + chunk(b"IDAT", payload) + chunk(b"IEND", b""))
+
+
+def _riff_chunk(cid, data):
+    return cid + struct.pack("<I", len(data)) + data + (b"\x00" if len(data) & 1 else b"")
+
+
+def _riff_info():
+    info = b"".join(_riff_chunk(cid, value.encode() + b"\x00") for cid, value in (
+        (b"IART", TAGS["author"]), (b"INAM", TAGS["title"]), (b"ICRD", TAGS["date"]),
+        (b"ICMT", TAGS["description"])))
+    return _riff_chunk(b"LIST", b"INFO" + info)
+
+
+def _riff(form, chunks):
+    body = form + b"".join(chunks)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def _wav(payload):
+    # INFO after the samples, as most editors write it
+    fmt = struct.pack("<HHIIHH", 1, 2, 44100, 176400, 4, 16)
+    return _riff(b"WAVE", [_riff_chunk(b"fmt ", fmt), _riff_chunk(b"data", payload), _riff_info()])
+
+
+def _avi(payload):
+    return _riff(b"AVI ", [_riff_chunk(b"LIST", b"hdrl" + _riff_chunk(b"avih", b"\x00" * 56)),
+                           _riff_info(), _riff_chunk(b"LIST", b"movi" + payload)])
+
+
+def _webp(payload):
+    return _riff(b"WEBP", [_riff_chunk(b"VP8 ", payload), _riff_chunk(b"EXIF", _tiff_block("<"))])
+
+
+def _syncsafe(n):
+    return bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F])
+
+
+def _mp3(payload):
+    def frame(fid, data):
+        return fid + _syncsafe(len(data)) + b"\x00\x00" + data
+    frames = (frame(b"APIC", b"\x00image/jpeg\x00\x03\x00" + b"\x00" * COVER_ART_BYTES)
+              + frame(b"TIT2", b"\x03" + TAGS["title"].encode())
+              + frame(b"TPE1", b"\x03" + TAGS["author"].encode())
+              + frame(b"TDRC", b"\x03" + TAGS["date"].encode())
+              + frame(b"COMM", b"\x01eng\xff\xfe\x00\x00" + TAGS["description"].encode("utf-16-le")))
+    frames += b"\x00" * 1024  # padding
+    return b"ID3\x04\x00\x00" + _syncsafe(len(frames)) + frames + payload
+
+
+def _vorbis_block():
+    comments = [f"ARTIST={TAGS['author']}", f"TITLE={TAGS['title']}", f"DATE={TAGS['date']}",
+                f"DESCRIPTION={TAGS['description']}"]
+    vendor = b"reference libFLAC 1.4.3"
+    return (struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", len(comments))
+            + b"".join(struct.pack("<I", len(c.encode())) + c.encode() for c in comments))
+
+
+def _flac(payload):
+    def block(block_type, data, last=False):
+        return bytes([block_type | (0x80 if last else 0)]) + len(data).to_bytes(3, "big") + data
+    return (b"fLaC" + block(0, b"\x00" * 34) + block(6, b"\x00" * COVER_ART_BYTES)
+            + block(4, _vorbis_block(), last=True) + payload)
+
+
+def _ogg(payload):
+    def page(packet, seq):
+        lacing = bytes([255] * (len(packet) // 255) + [len(packet) % 255])
+        return b"OggS\x00\x00" + b"\x00" * 8 + b"\x01\x00\x00\x00" + struct.pack("<I", seq) + b"\x00" * 4 \
+            + bytes([len(lacing)]) + lacing + packet
+    ident = b"\x01vorbis" + b"\x00" * 23
+    return page(ident, 0) + page(b"\x03vorbis" + _vorbis_block() + b"\x01", 1) + payload
+
+
+def _box(box_type, data):
+    return struct.pack(">I", len(data) + 8) + box_type + data
+
+
+def _mp4(payload):
+    # 'moov' after 'mdat' (no faststart), with a sample table the extractor must skip
+    items = b"".join(_box(name, _box(b"data", b"\x00\x00\x00\x01\x00\x00\x00\x00" + value.encode()))
+                     for name, value in ((b"\xa9ART", TAGS["author"]), (b"\xa9nam", TAGS["title"]),
+                                         (b"\xa9day", TAGS["date"]), (b"desc", TAGS["description"])))
+    meta = _box(b"meta", b"\x00\x00\x00\x00" + _box(b"hdlr", b"\x00" * 25) + _box(b"ilst", items))
+    mvhd = _box(b"mvhd", b"\x00\x00\x00\x00" + struct.pack(">II", 2000000000, 2000000000) + b"\x00" * 88)
+    trak = _box(b"trak", _box(b"mdia", _box(b"minf", _box(b"stbl", b"\x00" * (512 * 1024)))))
+    return (_box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41") + _box(b"mdat", payload)
+            + _box(b"moov", mvhd + trak + _box(b"udta", meta)))
+
+
+BUILDERS = {
+    "jpg": _jpeg, "jpeg": _jpeg, "tif": _tiff, "tiff": _tiff, "png": _png, "webp": _webp,
+    "mp3": _mp3, "flac": _flac, "ogg": _ogg, "wav": _wav, "m4a": _mp4,
+    "mp4": _mp4, "mov": _mp4, "m4v": _mp4, "avi": _avi,
+}
+
+
+def rate(fn, seconds):
+    count, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def extract(path, ext):
+    found = {}
+    with open(path, "rb") as f:
+        reader = BudgetReader(f, METADATA_BYTE_BUDGET)
+        try:
+            extractor_for(ext)(reader, found)
+        except BudgetExceeded:
+            pass
+    return found, reader.bytes_read
+
+
+def full_read(path):
+    with open(path, "rb") as f:
+        while f.read(1024 * 1024):
+            pass
+
+
+def main():
+    payload_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    payload = os.urandom(int(payload_mb * 1024 * 1024))
+    registered = sorted((file_type, ext) for file_type, exts in EXTRACTORS.items() for ext in exts)
+    missing = [ext for _, ext in registered if ext not in BUILDERS]
+    if missing:
+        raise SystemExit(f"No sample builder for: {', '.join(missing)}")
+
+    print(f"Budget: {METADATA_BYTE_BUDGET} bytes, payload: {payload_mb:g} MB")
+    header = (f"{'Type':<6} {'Ext':<5} {'File MB':>8} {'Bytes read':>11} {'Extract/s':>10} "
+              f"{'ms':>7} {'Full read ms':>13}  Fields")
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory() as tmp:
+        for file_type, ext in registered:
+            path = os.path.join(tmp, f"sample.{ext}")
+            with open(path, "wb") as f:
+                f.write(BUILDERS[ext](payload))
+            found, bytes_read = extract(path, ext)
+            per_second = rate(lambda: extract(path, ext), seconds)
+            full_ms = 1000 / rate(lambda: full_read(path), seconds)
+            print(f"{file_type:<6} {ext:<5} {os.path.getsize(path) / 1e6:>8.1f} {bytes_read:>11,} "
+                  f"{per_second:>10,.0f} {1000 / per_second:>7.3f} {full_ms:>13.2f}  {', '.join(sorted(found))}")
+
+
+if __name__ == "__main__":
+    main()
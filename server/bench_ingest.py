@@ -0,0 +1,129 @@
+"""
+Upload ingest benchmark for Domus Memoriae
+
+Compares the legacy upload path (Werkzeug spool -> file.save -> getsize ->
+SHA-256 re-read -> libmagic on the stored file) against the single-pass
+IngestStream path used by upload_file. Reports throughput in MB/s.
+
+Usage:
+    python bench_ingest.py              # 10, 100 and 500 MB
+    python bench_ingest.py 10 50        # custom sizes in MB
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import magic
+from werkzeug.wrappers import Request
+
+from storage import IngestRequest, IngestStream
+
+DEFAULT_SIZES_MB = [10, 100, 500]
+BOUNDARY = "----DomusBenchBoundary"
+
+
+def build_multipart_body(path, size_bytes):
+    """Write a multipart/form-data body with one file part of size_bytes to path."""
+    head = (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="bench.mp4"\r\n'
+        f"Content-Type: video/mp4\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{BOUNDARY}--\r\n".encode()
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        f.write(head)
+        remaining = size_bytes
+        while remaining > 0:
+            f.write(block[:remaining])
+            remaining -= len(block)
+        f.write(tail)
+    return os.path.getsize(path)
+
+
+def make_environ(body_path, body_len):
+    return {
+        "REQUEST_METHOD": "POST",
+        "CONTENT_TYPE": f"multipart/form-data; boundary={BOUNDARY}",
+        "CONTENT_LENGTH": str(body_len),
+        "wsgi.input": open(body_path, "rb"),
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "wsgi.url_scheme": "http",
+    }
+
+
+def legacy_upload(environ, dest_path):
+    """The pre-ingest upload_file path: three passes over the stored bytes."""
+    req = Request(environ)
+    try:
+        file = req.files["file"]
+        file.save(dest_path)
+        size_bytes = os.path.getsize(dest_path)
+        sha256_hash = hashlib.sha256()
+        with open(dest_path, "rb") as f:
+            for byte_block in iter(lambda: f.read(4096), b""):
+                sha256_hash.update(byte_block)
+        mime = magic.Magic(mime=True).from_file(dest_path)
+        return size_bytes, sha256_hash.hexdigest(), mime
+    finally:
+        req.close()
+        environ["wsgi.input"].close()
+
+
+def ingest_upload(environ, dest_path, incoming_dir):
+    """The current upload_file path: one pass, then an atomic rename."""
+
+    class BenchRequest(IngestRequest):
+        ingest_dir = incoming_dir
+
+    req = BenchRequest(environ)
+    try:
+        ingest = req.files["file"].stream
+        assert isinstance(ingest, IngestStream)
+        ingest.commit(dest_path)
+        mime = magic.Magic(mime=True).from_buffer(ingest.header)
+        return ingest.size, ingest.hexdigest(), mime
+    finally:
+        req.close()
+        environ["wsgi.input"].close()
+
+
+def run(sizes_mb):
+    workdir = tempfile.mkdtemp(prefix="domus_bench_")
+    incoming_dir = os.path.join(workdir, ".incoming")
+    print(f"{'Size':>8} {'Legacy MB/s':>12} {'Ingest MB/s':>12} {'Speedup':>8}")
+    print("-" * 44)
+    try:
+        for size_mb in sizes_mb:
+            size_bytes = size_mb * 1024 * 1024
+            body_path = os.path.join(workdir, "body.bin")
+            body_len = build_multipart_body(body_path, size_bytes)
+
+            start = time.perf_counter()
+            legacy = legacy_upload(make_environ(body_path, body_len), os.path.join(workdir, "legacy.mp4"))
+            legacy_secs = time.perf_counter() - start
+
+            start = time.perf_counter()
+            fast = ingest_upload(make_environ(body_path, body_len), os.path.join(workdir, "ingest.mp4"), incoming_dir)
+            ingest_secs = time.perf_counter() - start
+
+            if legacy[:2] != fast[:2]:
+                raise RuntimeError(f"Mismatch between paths: {legacy} vs {fast}")
+
+            print(f"{size_mb:>6}MB {size_mb / legacy_secs:>12.1f} {size_mb / ingest_secs:>12.1f} "
+                  f"{legacy_secs / ingest_secs:>7.2f}x")
+
+            for name in ("body.bin", "legacy.mp4", "ingest.mp4"):
+                os.remove(os.path.join(workdir, name))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or DEFAULT_SIZES_MB
+    run(sizes)
@@ -0,0 +1,118 @@
+"""
+JSON serialization benchmark for Domus Memoriae
+
+Compares the old response path (recursive stringify_ids copy + Flask's default
+provider) against MongoJSONProvider with the stdlib backend and, when installed,
+the orjson backend, on realistic file-list payloads.
+
+Usage:
+    python bench_json.py                # 1k, 10k and 100k documents
+    python bench_json.py 5000           # custom sizes
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from json_provider import MongoJSONProvider, orjson
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+REPEATS = 3
+EXTS = ['jpg', 'png', 'pdf', 'mp4', 'mov', 'docx', 'mp3', 'tiff', 'heic', 'txt']
+
+
+def stringify_ids(obj):
+    """The pre-provider helper: recursively copies the tree, converting ObjectIds."""
+    if isinstance(obj, list):
+        return [stringify_ids(item) for item in obj]
+    if isinstance(obj, dict):
+        return {k: stringify_ids(v) for k, v in obj.items()}
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    return obj
+
+
+def make_file_docs(n, seed=42):
+    """File records shaped like upload_file's, including metadata_json."""
+    rng = random.Random(seed)
+    vault_id, user_id = ObjectId(), ObjectId()
+    now = datetime.utcnow()
+    docs = []
+    for i in range(n):
+        ext = rng.choice(EXTS)
+        uploaded_at = now - timedelta(days=rng.randint(0, 2000), seconds=rng.randint(0, 86400))
+        docs.append({
+            "_id": ObjectId(),
+            "file_id": f"{rng.getrandbits(128):032x}",
+            "vault_id": vault_id,
+            "user_id": user_id,
+            "original_filename": f"family_photo_{i}.{ext}",
+            "stored_key": f"blobs/{rng.getrandbits(8):02x}/{rng.getrandbits(256):064x}",
+            "ext": ext,
+            "mime_claimed": "image/jpeg",
+            "mime_detected": "image/jpeg",
+            "size_bytes": rng.randint(10_000, 50_000_000),
+            "sha256": f"{rng.getrandbits(256):064x}",
+            "metadata_json": {
+                "title": f"Summer {1950 + i % 70}",
+                "author": "Grandma Rose",
+                "creation_date": "D:19870612",
+                "description": "Picnic at the lake with the whole family " * 2,
+            },
+            "metadata_score": rng.randint(0, 100),
+            "duplicate_count": rng.randint(0, 3),
+            "access_risk_score": rng.choice([0, 10, 40, 50]),
+            "access_risk_reason": "Low risk",
+            "survivability_score": round(rng.uniform(20, 100), 1),
+            "analysis_status": "done",
+            "uploaded_at": uploaded_at,
+            "last_accessed_at": uploaded_at,
+            "access_count": rng.randint(0, 500),
+        })
+    return docs
+
+
+def best_of(fn, repeats=REPEATS):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def run(sizes):
+    app = Flask(__name__)
+    legacy = DefaultJSONProvider(app)
+    candidates = [("stdlib", MongoJSONProvider(app, backend="stdlib"))]
+    if orjson is not None:
+        candidates.append(("orjson", MongoJSONProvider(app, backend="orjson")))
+    else:
+        print("(orjson not installed: only the stdlib backend is measured)")
+
+    compact = {"separators": (",", ":")}
+    header = f"{'Docs':>8} {'Path':<22} {'ms':>9} {'docs/s':>12} {'MB/s':>8} {'Speedup':>8}"
+    print(header)
+    print("-" * len(header))
+    for n in sizes:
+        docs = make_file_docs(n)
+        base_secs, base_out = best_of(lambda: legacy.dumps(stringify_ids(docs), **compact).encode())
+        size_mb = len(base_out) / 1e6
+        print(f"{n:>8} {'stringify_ids+default':<22} {base_secs * 1000:>9.1f} {n / base_secs:>12,.0f} "
+              f"{size_mb / base_secs:>8.1f} {1.0:>7.2f}x")
+        for name, provider in candidates:
+            secs, out = best_of(lambda: provider.dumps_bytes(docs))
+            if legacy.loads(out) != legacy.loads(base_out):
+                raise RuntimeError(f"{name} output differs from the legacy path")
+            print(f"{n:>8} {'provider/' + name:<22} {secs * 1000:>9.1f} {n / secs:>12,.0f} "
+                  f"{size_mb / secs:>8.1f} {base_secs / secs:>7.2f}x")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or DEFAULT_SIZES
+    run(sizes)
@@ -0,0 +1,161 @@
+"""
+MIME sniffing benchmark for Domus Memoriae
+
+Measures detections per second for every allowed upload extension, on a
+synthesized header (the format's signature padded to MIME_SNIFF_BYTES),
+comparing a new python-magic handle per call (the old behaviour) against the
+pooled per-thread handles in database.MagicPool. A last line runs the pooled
+path from several threads at once.
+
+The extension list mirrors ALLOWED_EXTENSIONS in app.py (importing app here
+would start the whole app).
+
+Usage:
+    python bench_mime.py                 # 1s per extension and path
+    python bench_mime.py 0.2 4           # seconds per measurement, threads
+"""
+
+import sys
+import tarfile
+import threading
+import time
+
+import magic
+
+from database import MagicPool
+from storage import MIME_SNIFF_BYTES
+
+
+def _ftyp(brand):
+    return b"\x00\x00\x00\x18ftyp" + brand + b"\x00\x00\x00\x00" + brand + b"mif1"
+
+
+def _riff(kind):
+    return b"RIFF\x24\x00\x00\x00" + kind
+
+
+def _zip(first_name, content=b""):
+    name = first_name.encode()
+    return (b"PK\x03\x04\x14\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+            + len(content).to_bytes(4, "little") * 2 + len(name).to_bytes(2, "little")
+            + b"\x00\x00" + name + content)
+
+
+SAMPLE_HEADERS = {
+    # Images
+    "jpg": b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00",
+    "jpeg": b"\xff\xd8\xff\xe1\x00\x16Exif\x00\x00MM\x00*\x00\x00\x00\x08",
+    "png": b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x10\x00\x00\x00\x10\x08\x06\x00\x00\x00",
+    "gif": b"GIF89a\x10\x00\x10\x00\x80\x00\x00",
+    "bmp": b"BM\x36\x03\x00\x00\x00\x00\x00\x00\x36\x00\x00\x00\x28\x00\x00\x00\x10\x00\x00\x00"
+           b"\x10\x00\x00\x00\x01\x00\x18\x00",
+    "tiff": b"II*\x00\x08\x00\x00\x00",
+    "tif": b"MM\x00*\x00\x00\x00\x08",
+    "webp": _riff(b"WEBPVP8 "),
+    "heic": _ftyp(b"heic"),
+    "heif": _ftyp(b"mif1"),
+    "svg": b'<?xml version="1.0"?>\n<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10">',
+    # Videos
+    "mp4": _ftyp(b"isom"),
+    "avi": _riff(b"AVI LIST"),
+    "mov": _ftyp(b"qt  "),
+    "wmv": b"\x30\x26\xb2\x75\x8e\x66\xcf\x11\xa6\xd9\x00\xaa\x00\x62\xce\x6c",
+    "flv": b"FLV\x01\x05\x00\x00\x00\x09",
+    "mkv": b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x42\xf7\x81\x01\x42\x82\x88matroska",
+    "webm": b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x42\xf7\x81\x01\x42\x82\x84webm",
+    "m4v": _ftyp(b"M4V "),
+    "mpeg": b"\x00\x00\x01\xba\x44\x00\x04\x00\x04\x01\x01\x89\xc3\xf8",
+    "mpg": b"\x00\x00\x01\xb3\x14\x00\xf0\x13\xff\xff\xe0\x18",
+    # Documents
+    "pdf": b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n1 0 obj\n<< /Type /Catalog >>\nendobj\n",
+    "doc": b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\x00" * 16 + b"\x3e\x00\x03\x00\xfe\xff\x09\x00",
+    "docx": _zip("[Content_Types].xml", b"<?xml"),
+    "txt": b"Family letters from 1952 to 1961. Transcribed from the originals.\n",
+    "rtf": b"{\\rtf1\\ansi\\deff0 {\\fonttbl {\\f0 Times New Roman;}}\n",
+    "odt": _zip("mimetype", b"application/vnd.oasis.opendocument.text"),
+    # Archives
+    "zip": _zip("photos/"),
+    "rar": b"Rar!\x1a\x07\x01\x00",
+    "7z": b"7z\xbc\xaf\x27\x1c\x00\x04",
+    "tar": tarfile.TarInfo("photos/img.jpg").tobuf(tarfile.USTAR_FORMAT),
+    "gz": b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\x03",
+    # Audio
+    "mp3": b"ID3\x04\x00\x00\x00\x00\x00\x00\xff\xfb\x90\x64",
+    "wav": _riff(b"WAVEfmt "),
+    "ogg": b"OggS\x00\x02" + b"\x00" * 8 + b"\x01\x00\x00\x00" + b"\x00" * 8 + b"\x01\x1e\x01vorbis",
+    "flac": b"fLaC\x00\x00\x00\x22",
+    "m4a": _ftyp(b"M4A "),
+    "aac": b"\xff\xf1\x50\x80\x02\x1f\xfc",
+    # Other
+    "json": b'{"title": "Wedding album", "year": 1968, "people": ["Ada", "Tom"]}\n',
+    "xml": b'<?xml version="1.0" encoding="UTF-8"?>\n<archive><item id="1"/></archive>\n',
+    "csv": b"name,year,place\nAda,1968,Leeds\nTom,1970,York\n",
+}
+
+
+def sample_header(ext):
+    """The signature padded the way a real header is: zeros for binary formats, repeated text otherwise."""
+    head = SAMPLE_HEADERS[ext]
+    if head.isascii() and b"\x00" not in head:
+        body = head * (MIME_SNIFF_BYTES // len(head) + 1)
+    else:
+        body = head + b"\x00" * MIME_SNIFF_BYTES
+    return body[:MIME_SNIFF_BYTES]
+
+
+def rate(detect, header, seconds):
+    count, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        detect(header)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def threaded_rate(pool, headers, seconds, threads):
+    counts = [0] * threads
+
+    def work(i):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for header in headers:
+                pool.from_buffer(header)
+            counts[i] += len(headers)
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    pool = MagicPool()
+    headers = {ext: sample_header(ext) for ext in SAMPLE_HEADERS}
+
+    print(f"Header size: {MIME_SNIFF_BYTES} bytes")
+    header = f"{'Ext':<6} {'Detected':<44} {'New handle/s':>13} {'Pooled/s':>10} {'Speedup':>8}"
+    print(header)
+    print("-" * len(header))
+    totals = [0.0, 0.0]
+    for ext, data in headers.items():
+        fresh = rate(lambda h: magic.Magic(mime=True).from_buffer(h), data, seconds)
+        pooled = rate(pool.from_buffer, data, seconds)
+        totals[0] += 1 / fresh
+        totals[1] += 1 / pooled
+        print(f"{ext:<6} {pool.from_buffer(data):<44} {fresh:>13,.0f} {pooled:>10,.0f} {pooled / fresh:>7.1f}x")
+
+    # Harmonic mean: detections/s over a stream with one upload of each extension
+    n = len(headers)
+    print("-" * len(header))
+    print(f"{'all':<6} {'':<44} {n / totals[0]:>13,.0f} {n / totals[1]:>10,.0f} {totals[0] / totals[1]:>7.1f}x")
+    mixed = threaded_rate(pool, list(headers.values()), seconds * 3, threads)
+    print(f"\nPooled, {threads} threads, all extensions: {mixed:,.0f} detections/s "
+          f"({pool.stats()['handles_created']} handles created)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Survivability scoring benchmark for Domus Memoriae
+
+Compares the per-row path (predict_survivability, one DataFrame and one
+model.predict per file) against predict_survivability_many on file records
+rebuilt from data.csv, for both the ML model and the rule-based fallback.
+
+Uses MODEL_PATH when it exists, otherwise trains the model.py pipeline in memory.
+When the compact export (MODEL_ARRAYS_PATH) exists it is measured as well.
+The per-row path is timed on a sample and reported as files/s.
+
+A second table runs the batch path through a cold and then a warm
+PredictionCache and shows the share of rows that skipped inference and how
+far the cached scores (shared by quantized keys) are from the exact ones.
+
+Usage:
+    python bench_scoring.py                 # data.csv once and repeated 10x
+    python bench_scoring.py 1 50            # custom repeat factors
+"""
+
+import os
+import pickle
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import scoring
+from compact_model import CompactForest
+from features import FEATURE_COLUMNS
+
+CSV_PATH = "data.csv"
+DEFAULT_REPEATS = [1, 10]
+PER_ROW_SAMPLE = 300
+
+
+def load_model():
+    if os.path.exists(scoring.MODEL_PATH):
+        with open(scoring.MODEL_PATH, 'rb') as f:
+            return pickle.load(f), scoring.MODEL_PATH
+    from sklearn.pipeline import Pipeline
+    import model as training
+    df = pd.read_csv(CSV_PATH)
+    X, y = df[FEATURE_COLUMNS], df[training.TARGET]
+    preprocessor = training.create_preprocessing_pipeline(X, FEATURE_COLUMNS)
+    forest = training.train_model(preprocessor.fit_transform(X), y)
+    return Pipeline([("preprocessor", preprocessor), ("model", forest)]), "trained in memory from data.csv"
+
+
+def file_docs_from_csv(path, now):
+    """File records shaped like the files collection, from the training rows."""
+    df = pd.read_csv(path)
+    docs = []
+    for row in df.to_dict('records'):
+        docs.append({
+            'ext': row['ext'],
+            'mime_claimed': row['mime_claimed'],
+            'mime_detected': row['mime_detected'],
+            'size_bytes': row['size_bytes'],
+            'metadata_score': row['metadata_score'],
+            'access_risk_score': row['access_risk_score'],
+            'duplicate_count': row['duplicate_count'],
+            'access_count': row['access_count'],
+            'uploaded_at': now - timedelta(days=int(row['file_age_days']), hours=1),
+        })
+    return docs
+
+
+def per_row_rate(docs, now):
+    sample = docs[:PER_ROW_SAMPLE]
+    start = time.perf_counter()
+    scores = [scoring.predict_survivability(doc) for doc in sample]
+    return len(sample) / (time.perf_counter() - start), scores
+
+
+def batch_rate(docs, now):
+    start = time.perf_counter()
+    scores = scoring.predict_survivability_many(docs, now=now)
+    return len(docs) / (time.perf_counter() - start), scores
+
+
+def run(repeats):
+    now = datetime.utcnow()
+    base_docs = file_docs_from_csv(CSV_PATH, now)
+    model, source = load_model()
+    print(f"Model: {source}")
+
+    header = f"{'Path':<10} {'Files':>8} {'Per-row/s':>12} {'Batch/s':>12} {'Speedup':>8}"
+    print(header)
+    print("-" * len(header))
+    engines = [("ml", model)]
+    if os.path.isdir(scoring.MODEL_ARRAYS_PATH):
+        engines.append(("compact", CompactForest.load(scoring.MODEL_ARRAYS_PATH)))
+    engines.append(("fallback", None))
+    # Score with exactly the engines listed, not the registry's active
+    # version, and uncached: the cache is measured separately below
+    scoring.MODEL_REGISTRY = None
+    scoring.PREDICTION_CACHE = None
+    exact = {}
+    for label, ml_model in engines:
+        scoring.ML_MODEL = ml_model
+        for factor in repeats:
+            docs = base_docs * factor
+            row_rate, row_scores = per_row_rate(docs, now)
+            many_rate, many_scores = batch_rate(docs, now)
+            if many_scores[:len(row_scores)] != row_scores:
+                raise RuntimeError(f"{label}: batch scores differ from the per-row path")
+            exact[label, factor] = (many_rate, many_scores)
+            print(f"{label:<10} {len(docs):>8} {row_rate:>12,.0f} {many_rate:>12,.0f} {many_rate / row_rate:>7.1f}x")
+
+    header = f"{'Cached':<10} {'Files':>8} {'Cold/s':>12} {'Warm/s':>12} {'Skipped':>8} {'Mean |diff|':>12}"
+    print()
+    print(header)
+    print("-" * len(header))
+    for label, ml_model in engines:
+        if ml_model is None:
+            continue  # the fallback is never cached
+        scoring.ML_MODEL = ml_model
+        for factor in repeats:
+            docs = base_docs * factor
+            scoring.PREDICTION_CACHE = scoring.PredictionCache()
+            cold_rate, cached_scores = batch_rate(docs, now)
+            skipped = scoring.PREDICTION_CACHE.stats()["inference_skipped"]
+            warm_rate, _ = batch_rate(docs, now)
+            exact_scores = exact[label, factor][1]
+            diff = sum(abs(a - b) for a, b in zip(cached_scores, exact_scores)) / len(docs)
+            print(f"{label:<10} {len(docs):>8} {cold_rate:>12,.0f} {warm_rate:>12,.0f} "
+                  f"{skipped:>7.1%} {diff:>12.3f}")
+    scoring.PREDICTION_CACHE = None
+
+
+if __name__ == "__main__":
+    factors = [int(a) for a in sys.argv[1:]] or DEFAULT_REPEATS
+    run(factors)
@@ -0,0 +1,116 @@
+"""
+Startup benchmark for Domus Memoriae
+
+Starts gunicorn with and without preload and measures:
+  - cold start: launch until GET /api/health answers
+  - scale-out: SIGTTIN (one more worker) until the new worker answers
+  - memory: RSS and PSS (proportional set size, which splits shared pages
+    between the processes sharing them) of the master and all workers
+
+Runs against whatever Mongo the environment points at; with no Mongo
+variables set the app starts without a database, which isolates the model
+and import costs.
+
+Usage:
+    python bench_startup.py                 # 2 workers, preload on and off
+    python bench_startup.py 4               # 4 workers
+"""
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+STARTUP_TIMEOUT = 120
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def health(port):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as r:
+            return json.loads(r.read())["pid"]
+    except OSError:
+        return None
+
+
+def memory_kb(pid, field):
+    # PSS comes from smaps_rollup (Linux 4.14+), RSS from status
+    path, key = (f"/proc/{pid}/smaps_rollup", "Pss:") if field == "pss" else (f"/proc/{pid}/status", "VmRSS:")
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(key):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def wait_for(predicate, timeout=STARTUP_TIMEOUT):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        result = predicate()
+        if result:
+            return result
+        time.sleep(0.01)
+    raise TimeoutError("gunicorn did not answer in time")
+
+
+def run(preload, workers):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers),
+               GUNICORN_PRELOAD="true" if preload else "false")
+    started = time.perf_counter()
+    master = subprocess.Popen([sys.executable, "-m", "gunicorn", "app:app", "-c", "gunicorn.conf.py"],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(lambda: health(port))
+        cold = time.perf_counter() - started
+        wait_for(lambda: len(children(master.pid)) >= workers)
+        time.sleep(1)  # let every worker finish importing
+        pids = [master.pid] + children(master.pid)
+        rss = sum(memory_kb(p, "rss") for p in pids) / 1024
+        pss = sum(memory_kb(p, "pss") for p in pids) / 1024
+
+        before = set(children(master.pid))
+        started = time.perf_counter()
+        master.send_signal(signal.SIGTTIN)
+        new = wait_for(lambda: set(children(master.pid)) - before)
+        # Requests go to whichever worker accepts first: poll until the new one answers
+        wait_for(lambda: health(port) in new)
+        scale_out = time.perf_counter() - started
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=30)
+    return cold, scale_out, rss, pss
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    header = f"{'Preload':<8} {'Workers':>7} {'Cold start':>11} {'Scale-out':>10} {'RSS':>10} {'PSS':>10}"
+    print(header)
+    print("-" * len(header))
+    for preload in (True, False):
+        cold, scale_out, rss, pss = run(preload, workers)
+        print(f"{str(preload):<8} {workers:>7} {cold:>10.2f}s {scale_out:>9.2f}s {rss:>8.1f}MB {pss:>8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
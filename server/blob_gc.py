@@ -0,0 +1,317 @@
+"""
+Blob garbage collection for Domus Memoriae
+
+Deleting a file record (Database.delete_file, recursive folder deletes) only
+drops a blob reference, and failed or abandoned uploads leave bytes behind,
+so nothing under UPLOAD_FOLDER is ever removed by the request path. A
+collection pass reclaims that space with a mark-and-sweep over the storage
+tree:
+
+  - the tree is walked in streaming batches of BLOB_GC_BATCH_SIZE files;
+    it is never listed in memory as a whole
+  - for each batch, a few $in queries mark what is still referenced:
+      blobs/<xx>/<sha256>      a file record with that stored_key, or a blob
+                               record with refcount > 0 (zero-ref blobs are orphans)
+      <vault_id>/<name>        (legacy keys) a file record with that stored_key
+      .incoming/<id>.upload    a chunked upload session that still exists
+      .incoming/<id>.upload.sha256
+                               the same, for the session's partial hash
+      .incoming/<uuid>.part    never; upload temp files are renamed away on success
+    anything else under the root is left alone
+  - unreferenced files modified within BLOB_GC_GRACE_HOURS are kept
+    (uploads in flight, sessions still resumable); the rest are deleted at
+    no more than BLOB_GC_MAX_DELETE_RATE files per second
+
+A blob is moved into .trash/, its zero-ref record deleted, and then checked
+again before it is unlinked. Uploads take their reference before looking for
+an existing blob (app.acquire_and_store), so an upload of the same bytes either
+makes that re-check fail, and the blob is put back, or comes after the unlink
+and finds no blob to reuse.
+
+Each pass reports files and bytes scanned, orphans, bytes reclaimed and its
+duration, and stores the report on the "blob_gc" checkpoint, whose lease
+keeps two passes from running at once.
+
+Usage:
+    python blob_gc.py                   # run one pass
+    python blob_gc.py --dry-run         # report what would be deleted
+    python blob_gc.py --grace-hours 48
+
+In the web server, set BLOB_GC_INTERVAL_HOURS to run passes from a
+background thread (see BlobGCScheduler).
+"""
+
+import argparse
+import itertools
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from storage import BLOB_KEY_PREFIX, CHUNK_HASH_SUFFIX, blob_key
+
+BLOB_GC_CHECKPOINT = "blob_gc"
+BLOB_GC_BATCH_SIZE = int(os.environ.get('BLOB_GC_BATCH_SIZE', 500))
+# Unreferenced files younger than this are kept
+BLOB_GC_GRACE_HOURS = float(os.environ.get('BLOB_GC_GRACE_HOURS', 24))
+# Upper bound on files deleted per second (0 = unthrottled)
+BLOB_GC_MAX_DELETE_RATE = float(os.environ.get('BLOB_GC_MAX_DELETE_RATE', 50))
+# Hours between scheduled passes in the web server (0 = scheduler off)
+BLOB_GC_INTERVAL_HOURS = float(os.environ.get('BLOB_GC_INTERVAL_HOURS', 0))
+BLOB_GC_LEASE = timedelta(minutes=10)
+
+INCOMING_DIR = ".incoming"
+TRASH_DIR = ".trash"
+
+
+def walk_files(root):
+    """Yield (key relative to root, path, stat) for every regular file below ``root``."""
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        key = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                        yield key, entry.path, entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue  # removed while we were looking
+
+
+def classify(key):
+    """(kind, id) of a storage key; kind is None for files the collector must not touch."""
+    parts = key.split("/")
+    if key.startswith(BLOB_KEY_PREFIX) and len(parts) == 3:
+        return "blob", parts[2]
+    if parts[0] == TRASH_DIR and len(parts) == 2:
+        return "trash", parts[1]
+    if parts[0] == INCOMING_DIR and len(parts) == 2:
+        if parts[1].endswith(".upload"):
+            return "part", parts[1][:-len(".upload")]
+        if parts[1].endswith(".upload" + CHUNK_HASH_SUFFIX):
+            return "part", parts[1][:-len(".upload" + CHUNK_HASH_SUFFIX)]
+        if parts[1].endswith(".part"):
+            return "temp", parts[1]
+        return None, None
+    if len(parts) == 2 and ObjectId.is_valid(parts[0]):
+        return "legacy", key
+    return None, None
+
+
+def live_keys(db, entries):
+    """
+    Mark: the (kind, id) pairs of ``entries`` still referenced, from at most
+    three queries per batch.
+    """
+    shas = {ident for _, _, _, (kind, ident) in entries if kind == "blob"}
+    stored_keys = [blob_key(sha) for sha in shas]
+    stored_keys += [ident for _, _, _, (kind, ident) in entries if kind == "legacy"]
+    upload_ids = [ObjectId(ident) for _, _, _, (kind, ident) in entries
+                  if kind == "part" and ObjectId.is_valid(ident)]
+
+    live = set()
+    if shas:
+        for doc in db.blobs.find({"_id": {"$in": list(shas)}, "refcount": {"$gt": 0}}, {"_id": 1}):
+            live.add(("blob", doc["_id"]))
+    if stored_keys:
+        for doc in db.files.find({"stored_key": {"$in": stored_keys}}, {"stored_key": 1}):
+            key = doc["stored_key"]
+            if key.startswith(BLOB_KEY_PREFIX):
+                live.add(("blob", key.rsplit("/", 1)[-1]))
+            else:
+                live.add(("legacy", key))
+    if upload_ids:
+        for doc in db.uploads.find({"_id": {"$in": upload_ids}}, {"_id": 1}):
+            live.add(("part", str(doc["_id"])))
+    return live
+
+
+def blob_in_use(db, sha):
+    return (db.blobs.find_one({"_id": sha, "refcount": {"$gt": 0}}, {"_id": 1}) is not None
+            or db.files.find_one({"stored_key": blob_key(sha)}, {"_id": 1}) is not None)
+
+
+def collect_blob(db, root, path, sha):
+    """
+    Delete one unreferenced blob (or a leftover .trash entry). Returns False if
+    it turned out to be in use again, in which case it is put back.
+    """
+    blob_path = os.path.join(root, blob_key(sha))
+    trash_path = os.path.join(root, TRASH_DIR, sha)
+    if path != trash_path:
+        os.makedirs(os.path.dirname(trash_path), exist_ok=True)
+        os.replace(path, trash_path)
+    db.blobs.delete_one({"_id": sha, "refcount": {"$lte": 0}})
+    # Re-check after the rename: an upload of the same bytes may have re-acquired it
+    if blob_in_use(db, sha):
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(trash_path, blob_path)
+        return False
+    os.remove(trash_path)
+    return True
+
+
+def _batches(iterable, size):
+    it = iter(iterable)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+
+def run_pass(db, root, *, owner=None, batch_size=BLOB_GC_BATCH_SIZE, grace_hours=BLOB_GC_GRACE_HOURS,
+             max_rate=BLOB_GC_MAX_DELETE_RATE, dry_run=False, stop=None):
+    """
+    Run one collection pass over ``root``. Returns the report dict, or None if
+    another process holds the lease. ``stop`` is an optional threading.Event.
+    """
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    if db.claim_checkpoint(BLOB_GC_CHECKPOINT, owner=owner, lease=BLOB_GC_LEASE) is None:
+        return None
+
+    try:
+        report = {"scanned": 0, "scanned_bytes": 0, "orphans": 0, "kept_in_grace": 0, "deleted": 0,
+                  "restored": 0, "errors": 0, "bytes_reclaimed": 0, "dry_run": dry_run}
+        started = time.perf_counter()
+        cutoff = time.time() - grace_hours * 3600
+        complete = True
+        for batch in _batches(walk_files(root), batch_size):
+            if stop and stop.is_set():
+                complete = False
+                break
+            entries = [(key, path, st, classify(key)) for key, path, st in batch]
+            live = live_keys(db, entries)
+
+            orphans = []
+            for key, path, st, (kind, ident) in entries:
+                report["scanned"] += 1
+                report["scanned_bytes"] += st.st_size
+                if kind is None or (kind, ident) in live:
+                    continue
+                # Leftovers of an interrupted pass: collect_blob restores or deletes them
+                if kind != "trash" and st.st_mtime > cutoff:
+                    report["kept_in_grace"] += 1
+                    continue
+                orphans.append((key, path, st, kind, ident))
+            report["orphans"] += len(orphans)
+
+            # Sweep this batch's orphans, paced to max_rate deletions per second
+            sweep_started = time.perf_counter()
+            for i, (key, path, st, kind, ident) in enumerate(orphans):
+                if stop and stop.is_set():
+                    break
+                if dry_run:
+                    report["bytes_reclaimed"] += st.st_size
+                    continue
+                try:
+                    if kind in ("blob", "trash"):
+                        if not collect_blob(db, root, path, ident):
+                            report["restored"] += 1
+                            continue
+                    else:
+                        os.remove(path)
+                except OSError as e:
+                    report["errors"] += 1
+                    print(f"[WARNING] Blob GC could not delete {key}: {e}")
+                    continue
+                report["deleted"] += 1
+                report["bytes_reclaimed"] += st.st_size
+                if max_rate:
+                    delay = (i + 1) / max_rate - (time.perf_counter() - sweep_started)
+                    if delay > 0:
+                        if stop:
+                            stop.wait(delay)
+                        else:
+                            time.sleep(delay)
+
+            if not db.save_checkpoint(BLOB_GC_CHECKPOINT, owner=owner, lease=BLOB_GC_LEASE):
+                print("[WARNING] Blob GC lease lost; stopping")
+                complete = False
+                break
+
+        report["seconds"] = round(time.perf_counter() - started, 2)
+        report["complete"] = complete
+        fields = {"last_summary": report}
+        if complete:
+            fields["last_finished_at"] = datetime.utcnow()
+        db.save_checkpoint(BLOB_GC_CHECKPOINT, owner=owner, lease=BLOB_GC_LEASE, **fields)
+        print(f"[INFO] Blob GC pass {'(dry run) ' if dry_run else ''}{'complete' if complete else 'stopped'}: "
+              f"{report['orphans']} orphans in {report['scanned']} files, "
+              f"{report['bytes_reclaimed'] / 1e6:.1f} MB {'reclaimable' if dry_run else 'reclaimed'} "
+              f"in {report['seconds']}s")
+        return report
+    finally:
+        db.release_checkpoint(BLOB_GC_CHECKPOINT, owner=owner)
+
+
+class BlobGCScheduler:
+    """
+    Runs a collection pass from a daemon thread whenever the last completed
+    pass is older than ``interval``. Every gunicorn worker may start one; the
+    checkpoint lease lets only one of them run at a time.
+    """
+
+    POLL_SECONDS = 300
+
+    def __init__(self, db, root, interval_hours=BLOB_GC_INTERVAL_HOURS):
+        self.db = db
+        self.root = root
+        self.interval = timedelta(hours=interval_hours)
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+
+    def ensure_started(self):
+        # Threads don't survive fork: start lazily in each worker process
+        if not self.interval or (self._thread is not None and self._pid == os.getpid()):
+            return
+        self._pid = os.getpid()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="blob-gc-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _due(self):
+        finished = (self.db.get_checkpoint(BLOB_GC_CHECKPOINT) or {}).get("last_finished_at")
+        return finished is None or datetime.utcnow() - finished >= self.interval
+
+    def _run(self):
+        while not self._stop.wait(self.POLL_SECONDS):
+            try:
+                if self._due():
+                    run_pass(self.db, self.root, stop=self._stop)
+            except Exception as e:
+                print(f"[ERROR] Scheduled blob GC failed: {e}")
+
+
+def main():
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Delete unreferenced blobs and upload leftovers")
+    parser.add_argument("--root", default=os.environ.get('UPLOAD_FOLDER', '/tmp/domus_uploads'))
+    parser.add_argument("--batch-size", type=int, default=BLOB_GC_BATCH_SIZE)
+    parser.add_argument("--grace-hours", type=float, default=BLOB_GC_GRACE_HOURS)
+    parser.add_argument("--max-rate", type=float, default=BLOB_GC_MAX_DELETE_RATE,
+                        help="deletions per second (0 = unthrottled)")
+    parser.add_argument("--dry-run", action="store_true", help="report orphans without deleting them")
+    args = parser.parse_args()
+
+    report = run_pass(Database(), args.root, batch_size=args.batch_size, grace_hours=args.grace_hours,
+                      max_rate=args.max_rate, dry_run=args.dry_run)
+    if report is None:
+        print("[INFO] Another process is running a blob GC pass")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Compact survivability model for Domus Memoriae
+
+A pure-NumPy predictor for the forest trained by model.py. ``python model.py``
+exports the fitted pipeline into a directory of .npy arrays (all trees
+flattened into feature / threshold / children / value arrays) plus a meta.json
+holding the imputer fills and one-hot vocabularies. Here those arrays are
+memory-mapped, so gunicorn workers share one copy through the page cache and
+never import sklearn or pandas or unpickle the pipeline's object graph.
+
+Predictions follow sklearn's arithmetic: inputs are compared as float32 against
+float64 thresholds and tree outputs are summed in estimator order.
+
+Usage:
+    python compact_model.py [model_dir]     # latency / RSS report
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Mapping, Sequence
+
+import numpy as np
+
+COMPACT_MODEL_FORMAT = 1
+META_FILE = "meta.json"
+TREE_ARRAYS = ("feature", "threshold", "children", "value", "roots")
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB (Linux; peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class CompactForest:
+    """Fitted ColumnTransformer + RandomForestRegressor, as flat arrays."""
+
+    def __init__(self, meta: Dict[str, Any], arrays: Dict[str, np.ndarray], path: str | None = None):
+        if meta.get("format") != COMPACT_MODEL_FORMAT:
+            raise ValueError(f"Unsupported compact model format: {meta.get('format')}")
+        self.meta = meta
+        self.path = path
+        self.numeric_columns = meta["numeric"]["columns"]
+        self.numeric_fill = np.asarray(meta["numeric"]["fill"], dtype=np.float64)
+        self.categorical = meta["categorical"]
+        self.n_features = meta["n_features"]
+        self.n_trees = meta["n_trees"]
+        self.max_depth = meta["max_depth"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        # children[n] = (right, left): indexed by the outcome of x <= threshold
+        self.children = arrays["children"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        # category -> output column, per categorical input
+        self._onehot_index = [
+            {cat: i for i, cat in enumerate(spec["categories"])} for spec in self.categorical
+        ]
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CompactForest":
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in TREE_ARRAYS}
+        return cls(meta, arrays, path=path)
+
+    @staticmethod
+    def save(path: str, meta: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+        os.makedirs(path, exist_ok=True)
+        for name in TREE_ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(arrays[name]))
+        with open(os.path.join(path, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def transform(self, columns: Mapping[str, Sequence[Any]]) -> np.ndarray:
+        """
+        Impute and one-hot encode input columns (a DataFrame or a dict of
+        column -> values) into the float32 matrix the trees were fitted on.
+        """
+        numeric = np.column_stack([
+            np.asarray(columns[c], dtype=np.float64) for c in self.numeric_columns
+        ])
+        n_rows = len(numeric)
+        missing = np.isnan(numeric)
+        if missing.any():
+            numeric = np.where(missing, self.numeric_fill, numeric)
+
+        X = np.zeros((n_rows, self.n_features), dtype=np.float64)
+        X[:, :len(self.numeric_columns)] = numeric
+        offset = len(self.numeric_columns)
+        for spec, index in zip(self.categorical, self._onehot_index):
+            for row, value in enumerate(columns[spec["column"]]):
+                # Like SimpleImputer, only NaN is missing: None is an unknown category
+                if isinstance(value, float) and value != value:
+                    value = spec["fill"]
+                col = index.get(value)
+                if col is not None:  # unknown categories encode as all zeros
+                    X[row, offset + col] = 1.0
+            offset += len(spec["categories"])
+        return X.astype(np.float32)
+
+    def predict_matrix(self, X: np.ndarray) -> np.ndarray:
+        # Walk every tree for every row at once; leaves point to themselves,
+        # so max_depth steps always end on a leaf
+        flat_x = X.ravel()
+        children = self.children.ravel()
+        row_base = (np.arange(len(X), dtype=np.intp) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots.astype(np.intp), (len(X), self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            go_left = flat_x[row_base + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = children[nodes * 2 + go_left]
+        leaf_values = self.value[nodes]
+        total = np.zeros(len(X), dtype=np.float64)
+        for t in range(self.n_trees):
+            total += leaf_values[:, t]
+        return total / self.n_trees
+
+    def predict(self, columns: Mapping[str, Sequence[Any]]) -> np.ndarray:
+        return self.predict_matrix(self.transform(columns))
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "engine": "compact",
+            "path": self.path,
+            "trees": self.n_trees,
+            "nodes": self.n_nodes,
+            "max_depth": self.max_depth,
+            "array_bytes": int(sum(getattr(self, name).nbytes for name in TREE_ARRAYS)),
+            "mmap": isinstance(self.feature, np.memmap),
+        }
+
+
+def report(path: str, repeats: int = 1000) -> None:
+    """Load time, single-row latency, batch throughput and RSS for this process."""
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    model = CompactForest.load(path)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    row = {c: [0] for c in model.numeric_columns}
+    for spec in model.categorical:
+        row[spec["column"]] = [spec["fill"]]
+    model.predict(row)  # fault in the pages once
+    loaded_rss = rss_mb()
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    batch = {k: v * 10_000 for k, v in row.items()}
+    start = time.perf_counter()
+    model.predict(batch)
+    batch_rate = 10_000 / (time.perf_counter() - start)
+
+    info = model.info()
+    print(f"Compact model: {path} ({info['trees']} trees, {info['nodes']:,} nodes, "
+          f"{info['array_bytes'] / 1e6:.1f} MB of arrays, mmap={info['mmap']})")
+    print(f"  Load:               {load_ms:.1f} ms")
+    print(f"  Single-row p50:     {timings[len(timings) // 2] * 1e6:.0f} us")
+    print(f"  Single-row p99:     {timings[int(len(timings) * 0.99)] * 1e6:.0f} us")
+    print(f"  Batch throughput:   {batch_rate:,.0f} rows/s")
+    print(f"  RSS:                {loaded_rss:.1f} MB (+{loaded_rss - base_rss:.1f} MB for the model), "
+          f"{rss_mb():.1f} MB after the batch")
+    print(f"  sklearn imported:   {'sklearn' in sys.modules}, pandas imported: {'pandas' in sys.modules}")
+
+
+if __name__ == "__main__":
+    report(sys.argv[1] if len(sys.argv) > 1 else os.environ.get("MODEL_ARRAYS_PATH", "model_arrays"))
@@ -3,16 +3,20 @@ from __future__ import annotations
 import os
 import random
 import string
-from datetime import datetime, date
+import threading
+from datetime import datetime, date, timedelta
 from typing import Any, Dict, Optional, Tuple, Union
 
 from dotenv import load_dotenv
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument, UpdateOne
 from pymongo.collection import Collection
 from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
 from bson import ObjectId
-import magic
-from pypdf import PdfReader
+
+from cache import TTLCache
+from features import FILE_TYPE_FORMATS, file_type_for_ext
+from pdf_pool import PdfExtractionError, pdf_pool
+from storage import MIME_SNIFF_BYTES, is_blob_key
 
 load_dotenv()
 
@@ -21,6 +25,28 @@ ROLE_EDITOR = "editor"
 ROLE_VIEWER = "viewer"
 ALLOWED_ROLES = {ROLE_ADMIN, ROLE_EDITOR, ROLE_VIEWER}
 
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+
+# Membership cache: (user_id, vault_id) -> role
+MEMBERSHIP_CACHE_SIZE = int(os.environ.get("MEMBERSHIP_CACHE_SIZE", 4096))
+MEMBERSHIP_CACHE_TTL = float(os.environ.get("MEMBERSHIP_CACHE_TTL", 30))
+
+# Fields needed to undo a file's blob reference and vault aggregates on delete
+FILE_ACCOUNTING_PROJECTION = {"vault_id": 1, "stored_key": 1, "ext": 1, "size_bytes": 1, "survivability_score": 1}
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_MAX_ATTEMPTS = 3
+# Everything but the file header bytes carried for the worker
+JOB_STATUS_PROJECTION = {"header": 0}
+
+# Checkpoint recording that every folder has its materialized path
+FOLDER_PATHS_MIGRATION = "migration:folder_paths"
+MIGRATION_BATCH_SIZE = 1000
+UPLOADED_AT_MIGRATION = "migration:files_uploaded_at"
+
 
 def _now() -> datetime:
     return datetime.utcnow()
@@ -53,25 +79,61 @@ def _generate_invite_code(length: int = 12) -> str:
     return "".join(random.choice(alphabet) for _ in range(length))
 
 
-def extract_pdf_metadata(file_path: str) -> Dict[str, Any]:
+class MagicPool:
     """
-    Extracts internal metadata from a PDF file to improve model features.
+    Reusable python-magic handles, one per thread. Creating a handle loads the
+    compiled magic database, so each thread pays for that once instead of on
+    every detection. Handles are not carried across fork: a forked process
+    opens its own on first use.
     """
+
+    def __init__(self, mime: bool = True, max_bytes: int = MIME_SNIFF_BYTES):
+        self.mime = mime
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.detections = 0
+
+    def _handle(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            import magic
+
+            local.handle = magic.Magic(mime=self.mime)
+            local.pid = os.getpid()
+            with self._lock:
+                self.created += 1
+        return local.handle
+
+    def from_buffer(self, data: bytes) -> str:
+        with self._lock:
+            self.detections += 1
+        return self._handle().from_buffer(data[:self.max_bytes])
+
+    def stats(self) -> Dict[str, int]:
+        return {"handles_created": self.created, "detections": self.detections, "max_bytes": self.max_bytes}
+
+
+mime_pool = MagicPool()
+
+
+def detect_mime_type_from_buffer(header: bytes) -> str:
+    """Detect actual MIME type from a file's leading bytes using python-magic."""
     try:
-        reader = PdfReader(file_path)
-        meta = reader.metadata
-        return {
-            "author": meta.author or "",
-            "title": meta.title or "",
-            "creation_date": str(meta.get("/CreationDate", "")),
-            "description": meta.subject or "",
-            "page_count": len(reader.pages),
-            "creator": meta.creator or "",
-            "is_encrypted": reader.is_encrypted
-        }
-    except Exception as e:
-        print(f"PDF extraction error: {e}")
-        return {}
+        return mime_pool.from_buffer(header)
+    except Exception:
+        return "application/octet-stream"
+
+
+def preload_extractors() -> None:
+    """
+    Import python-magic (loading its database) and pypdf now instead of on the
+    first upload; PDF pool children are forked with pypdf already imported.
+    """
+    import pypdf  # noqa: F401
+
+    detect_mime_type_from_buffer(b"%PDF-1.4\n")
 
 
 def calculate_metadata_score(metadata_json: Optional[Dict[str, Any]]) -> int:
@@ -119,8 +181,12 @@ class Database:
     Collections:
       - users
       - vaults
-      - folders
+      - folders (ancestors = materialized path, root first)
       - files
+      - blobs  (content-addressed storage refcounts, _id = sha256)
+      - uploads (chunked upload sessions)
+      - jobs    (background analysis queue)
+      - checkpoints (progress and leases of maintenance passes, _id = task name)
     """
 
     def __init__(self):
@@ -140,7 +206,7 @@ class Database:
         self.uri = self._build_uri()
 
         # Connect (fast fail if creds/host wrong)
-        self.client = MongoClient(self.uri, serverSelectionTimeoutMS=5000)
+        self._connect()
         try:
             self.client.admin.command("ping")
         except ServerSelectionTimeoutError as e:
@@ -148,14 +214,37 @@ class Database:
                 "MongoDB connection failed (ping timeout). Check MONGO_PUBLIC_URL/MONGO_URL or host/port/user/pass."
             ) from e
 
+        self.membership_cache = TTLCache(MEMBERSHIP_CACHE_SIZE, MEMBERSHIP_CACHE_TTL, name="membership")
+
+        self._ensure_indexes()
+        self._run_migrations()
+
+    def _connect(self) -> None:
+        self.client = MongoClient(self.uri, serverSelectionTimeoutMS=5000)
         self.db = self.client[self.db_name]
 
         self.users: Collection = self.db["users"]
         self.vaults: Collection = self.db["vaults"]
         self.folders: Collection = self.db["folders"]
         self.files: Collection = self.db["files"]
+        self.blobs: Collection = self.db["blobs"]
+        self.uploads: Collection = self.db["uploads"]
+        self.jobs: Collection = self.db["jobs"]
+        self.checkpoints: Collection = self.db["checkpoints"]
+        self.pdf_metadata: Collection = self.db["pdf_metadata"]
 
-        self._ensure_indexes()
+    def close(self) -> None:
+        """Close the client (e.g. in the gunicorn master before workers fork)."""
+        self.client.close()
+
+    def reconnect(self) -> None:
+        """
+        Give this process its own MongoClient. MongoClient is not fork-safe, so a
+        forked worker must call this before its first query; the inherited
+        client is dropped without being closed, as its sockets belong to the parent.
+        Objects holding a collection from before (e.g. AccessTracker) must be rebound.
+        """
+        self._connect()
 
     def _validate_env(self) -> None:
         # If you gave a full URL, we can skip host/port/user/pass checks
@@ -203,7 +292,21 @@ class Database:
         self.vaults.create_index([("join_code", ASCENDING)], unique=True, sparse=True)
 
         self.folders.create_index([("vault_id", ASCENDING), ("parent_folder_id", ASCENDING)])
+        self.folders.create_index([("vault_id", ASCENDING), ("ancestors", ASCENDING)])
         self.files.create_index([("vault_id", ASCENDING), ("folder_id", ASCENDING)])
+        self.files.create_index([("vault_id", ASCENDING), ("sha256", ASCENDING)])
+        # Blob GC marks stored keys still referenced
+        self.files.create_index([("stored_key", ASCENDING)])
+        # Keyset pagination of vault file lists (newest first)
+        self.files.create_index([("vault_id", ASCENDING), ("uploaded_at", DESCENDING), ("_id", DESCENDING)])
+
+        # Workers claim the oldest queued job first
+        self.jobs.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+        self.jobs.create_index([("file_id", ASCENDING)])
+        self.jobs.create_index([("vault_id", ASCENDING), ("status", ASCENDING)])
+
+        # Abandoned chunked uploads expire on their own
+        self.uploads.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
 
     # -----------------------------
     # Users
@@ -307,6 +410,7 @@ class Database:
             "created_by": uid,
             "admin_user_id": uid,
             "members": [{"user_id": uid, "role": ROLE_ADMIN, "added_at": _now()}],
+            "stats": {"file_count": 0, "size_bytes": 0, "score_sum": 0, "score_count": 0, "by_type": {}},
         }
         doc = {k: v for k, v in doc.items() if v is not None}
 
@@ -342,6 +446,31 @@ class Database:
             return False, "Admin privileges required", None
         return True, "OK", vault
 
+    def get_member_role(self, vault_id: Union[str, ObjectId], user_id: Union[str, ObjectId]) -> Optional[str]:
+        """
+        Role of ``user_id`` in ``vault_id`` (None if not a member), served from a
+        bounded TTL/LRU cache. Only the matching member entry is fetched on a miss.
+        Non-members are not cached, so a join on another worker is seen at once.
+        """
+        vid = _oid(vault_id)
+        uid = _oid(user_id)
+        key = (uid, vid)
+        role = self.membership_cache.get(key)
+        if role is not None:
+            return role
+
+        vault = self.vaults.find_one({"_id": vid}, {"members": {"$elemMatch": {"user_id": uid}}})
+        if not vault or not vault.get("members"):
+            return None
+        role = vault["members"][0].get("role", ROLE_VIEWER)
+        self.membership_cache.set(key, role)
+        return role
+
+    def invalidate_membership(self, vault_id: Union[str, ObjectId], *user_ids: Union[str, ObjectId]) -> None:
+        vid = _oid(vault_id)
+        for user_id in user_ids:
+            self.membership_cache.invalidate((_oid(user_id), vid))
+
     def get_vaults_for_user(self, user_id: Union[str, ObjectId]) -> list[Dict[str, Any]]:
         uid = _oid(user_id)
         return list(self.vaults.find({"members.user_id": uid}).sort("created_at", -1))
@@ -375,6 +504,7 @@ class Database:
             {"_id": vid},
             {"$push": {"members": {"user_id": target_oid, "role": role, "added_at": _now()}}},
         )
+        self.invalidate_membership(vid, target_oid)
         return True, "User added to vault", self.vaults.find_one({"_id": vid})
 
     def join_vault_by_code(
@@ -408,11 +538,21 @@ class Database:
             {"_id": vault["_id"]},
             {"$push": {"members": {"user_id": uid, "role": role, "added_at": _now()}}},
         )
+        self.invalidate_membership(vault["_id"], uid)
         return True, "Joined vault", self.vaults.find_one({"_id": vault["_id"]})
 
     # -----------------------------
     # Folders
     # -----------------------------
+    # Each folder stores its materialized path: ``ancestors`` lists the folder
+    # ids from the vault root down to its parent. A whole subtree is one indexed
+    # query on {"ancestors": folder_id}, so listing, moving and deleting one
+    # take a fixed number of round trips whatever its depth.
+    @staticmethod
+    def _path_below(folder: Dict[str, Any]) -> list[ObjectId]:
+        """The ``ancestors`` of a child of ``folder``."""
+        return list(folder.get("ancestors") or []) + [folder["_id"]]
+
     def add_folder(
         self,
         *,
@@ -432,13 +572,17 @@ class Database:
             return False, msg, None
 
         parent_oid = _oid(parent_folder_id) if parent_folder_id else None
+        ancestors: list[ObjectId] = []
         if parent_oid:
-            if not self.folders.find_one({"_id": parent_oid, "vault_id": vid}):
+            parent = self.folders.find_one({"_id": parent_oid, "vault_id": vid}, {"ancestors": 1})
+            if not parent:
                 return False, "Parent folder not found in this vault", None
+            ancestors = self._path_below(parent)
 
         doc = {
             "vault_id": vid,
             "parent_folder_id": parent_oid,
+            "ancestors": ancestors,
             "name": name.strip(),
             "created_at": _now(),
             "created_by": uid,
@@ -447,20 +591,138 @@ class Database:
         return True, "Folder created", self.folders.find_one({"_id": res.inserted_id})
 
     def _delete_folder_recursive(self, vault_id: ObjectId, folder_id: ObjectId) -> Dict[str, int]:
-        counts = {"folders_deleted": 0, "files_deleted": 0}
+        """Delete a folder, everything below it and their files in a fixed number of queries, whatever the depth."""
+        folder_ids = [folder_id] + [
+            d["_id"] for d in self.folders.find({"vault_id": vault_id, "ancestors": folder_id}, {"_id": 1})
+        ]
+
+        file_query = {"vault_id": vault_id, "folder_id": {"$in": folder_ids}}
+        file_docs = list(self.files.find(file_query, FILE_ACCOUNTING_PROJECTION))
+        file_res = self.files.delete_many(file_query)
+        self.release_blobs([d.get("stored_key") for d in file_docs])
+        self.record_files_removed(file_docs)
+
+        folder_res = self.folders.delete_many({"vault_id": vault_id, "_id": {"$in": folder_ids}})
+        return {"folders_deleted": int(folder_res.deleted_count), "files_deleted": int(file_res.deleted_count)}
+
+    def list_folder_tree(
+        self,
+        *,
+        acting_user_id: Union[str, ObjectId],
+        vault_id: Union[str, ObjectId],
+        folder_id: Optional[Union[str, ObjectId]] = None,
+        file_projection: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """
+        A folder and everything below it (the whole vault when folder_id is None)
+        as flat ``folders`` and ``files`` lists; rebuild the tree from
+        parent_folder_id / folder_id, or order it by len(ancestors).
+        """
+        vid = _oid(vault_id)
+        uid = _oid(acting_user_id)
 
-        file_res = self.files.delete_many({"vault_id": vault_id, "folder_id": folder_id})
-        counts["files_deleted"] += int(file_res.deleted_count)
+        ok, msg, _vault = self._require_member(vid, uid)
+        if not ok:
+            return False, msg, None
 
-        children = list(self.folders.find({"vault_id": vault_id, "parent_folder_id": folder_id}, {"_id": 1}))
-        for c in children:
-            sub = self._delete_folder_recursive(vault_id, c["_id"])
-            counts["folders_deleted"] += sub["folders_deleted"]
-            counts["files_deleted"] += sub["files_deleted"]
+        if folder_id is None:
+            folders = list(self.folders.find({"vault_id": vid}))
+            file_query: Dict[str, Any] = {"vault_id": vid}
+        else:
+            fid = _oid(folder_id)
+            root = self.folders.find_one({"_id": fid, "vault_id": vid})
+            if not root:
+                return False, "Folder not found", None
+            folders = [root] + list(self.folders.find({"vault_id": vid, "ancestors": fid}))
+            file_query = {"vault_id": vid, "folder_id": {"$in": [f["_id"] for f in folders]}}
+
+        files = list(self.files.find(file_query, file_projection))
+        return True, "OK", {"folders": folders, "files": files}
+
+    def move_folder(
+        self,
+        *,
+        acting_user_id: Union[str, ObjectId],
+        vault_id: Union[str, ObjectId],
+        folder_id: Union[str, ObjectId],
+        new_parent_folder_id: Optional[Union[str, ObjectId]] = None,
+    ) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """Move a folder (with its subtree) under another folder, or to the vault root when None."""
+        vid = _oid(vault_id)
+        uid = _oid(acting_user_id)
+        fid = _oid(folder_id)
 
-        folder_res = self.folders.delete_one({"_id": folder_id, "vault_id": vault_id})
-        counts["folders_deleted"] += int(folder_res.deleted_count)
-        return counts
+        ok, msg, _vault = self._require_member(vid, uid)
+        if not ok:
+            return False, msg, None
+
+        folder = self.folders.find_one({"_id": fid, "vault_id": vid}, {"ancestors": 1})
+        if not folder:
+            return False, "Folder not found", None
+
+        parent_oid = _oid(new_parent_folder_id) if new_parent_folder_id else None
+        new_path: list[ObjectId] = []
+        if parent_oid:
+            parent = self.folders.find_one({"_id": parent_oid, "vault_id": vid}, {"ancestors": 1})
+            if not parent:
+                return False, "Parent folder not found in this vault", None
+            if parent_oid == fid or fid in (parent.get("ancestors") or []):
+                return False, "Cannot move a folder into itself or one of its subfolders", None
+            new_path = self._path_below(parent)
+
+        old_path = folder.get("ancestors") or []
+        self.folders.update_one({"_id": fid}, {"$set": {"parent_folder_id": parent_oid, "ancestors": new_path}})
+        # Descendants keep their path from this folder down and swap the prefix above it
+        # (a path never repeats an id, so the old prefix is exactly the ids in old_path)
+        res = self.folders.update_many(
+            {"vault_id": vid, "ancestors": fid},
+            [{"$set": {"ancestors": {"$concatArrays": [
+                new_path,
+                {"$filter": {"input": "$ancestors", "as": "id",
+                             "cond": {"$eq": [{"$in": ["$$id", old_path]}, False]}}},
+            ]}}}],
+        )
+        return True, "Folder moved", {
+            "folder": self.folders.find_one({"_id": fid}),
+            "descendants_moved": int(res.modified_count),
+        }
+
+    def backfill_folder_paths(self) -> Dict[str, int]:
+        """
+        Migration: (re)compute ``ancestors`` for every folder from parent_folder_id,
+        with one read of the collection and batched bulk writes. Idempotent.
+        A folder whose parent is missing, or that sits on a parent cycle, is
+        moved to its vault's root and counted under ``orphans``.
+        """
+        docs = {d["_id"]: d for d in self.folders.find({}, {"parent_folder_id": 1, "ancestors": 1})}
+        paths: Dict[ObjectId, list[ObjectId]] = {}
+        rerooted = set()
+        for start in docs:
+            chain, on_chain, node = [], set(), start
+            while node not in paths:
+                parent = docs[node].get("parent_folder_id")
+                if parent is None:
+                    paths[node] = []
+                elif parent not in docs or parent in on_chain or parent == node:
+                    paths[node] = []
+                    rerooted.add(node)
+                else:
+                    chain.append(node)
+                    on_chain.add(node)
+                    node = parent
+            for child in reversed(chain):
+                parent = docs[child]["parent_folder_id"]
+                paths[child] = paths[parent] + [parent]
+
+        ops = []
+        for fid, path in paths.items():
+            if fid in rerooted:
+                ops.append(UpdateOne({"_id": fid}, {"$set": {"parent_folder_id": None, "ancestors": []}}))
+            elif docs[fid].get("ancestors") != path:
+                ops.append(UpdateOne({"_id": fid}, {"$set": {"ancestors": path}}))
+        for i in range(0, len(ops), MIGRATION_BATCH_SIZE):
+            self.folders.bulk_write(ops[i:i + MIGRATION_BATCH_SIZE], ordered=False)
+        return {"folders": len(docs), "updated": len(ops), "orphans": len(rerooted)}
 
     def delete_folder(
         self,
@@ -523,6 +785,7 @@ class Database:
         if folder_oid and not self.folders.find_one({"_id": folder_oid, "vault_id": vid}):
             return False, "folder_id not found in this vault", None
 
+        now = _now()
         doc = {
             "vault_id": vid,
             "folder_id": folder_oid,
@@ -532,7 +795,9 @@ class Database:
             "storage": storage or None,
             "metadata": metadata or None,
             "integrity_hash": integrity_hash.strip() if integrity_hash else None,
-            "created_at": _now(),
+            "created_at": now,
+            # File lists sort and paginate on uploaded_at (see app.encode_file_cursor)
+            "uploaded_at": now,
             "uploaded_by": uid,
         }
         doc = {k: v for k, v in doc.items() if v is not None}
@@ -540,6 +805,21 @@ class Database:
         res = self.files.insert_one(doc)
         return True, "File added", self.files.find_one({"_id": res.inserted_id})
 
+    def backfill_uploaded_at(self) -> Dict[str, int]:
+        """
+        Migration: give every file record an ``uploaded_at`` (its ``created_at``,
+        else the ObjectId's timestamp). Records without one cannot be paginated.
+        """
+        ops = [
+            UpdateOne({"_id": d["_id"]}, {"$set": {
+                "uploaded_at": d.get("created_at") or d["_id"].generation_time.replace(tzinfo=None)
+            }})
+            for d in self.files.find({"uploaded_at": {"$exists": False}}, {"created_at": 1})
+        ]
+        for i in range(0, len(ops), MIGRATION_BATCH_SIZE):
+            self.files.bulk_write(ops[i:i + MIGRATION_BATCH_SIZE], ordered=False)
+        return {"files": len(ops)}
+
     def delete_file(
         self,
         *,
@@ -560,8 +840,383 @@ class Database:
             return False, "File not found", None
 
         res = self.files.delete_one({"_id": fid, "vault_id": vid})
+        if res.deleted_count:
+            self.release_blobs([file_doc.get("stored_key")])
+            self.record_files_removed([file_doc])
         return (True, "File deleted", {"files_deleted": int(res.deleted_count)}) if res.deleted_count else (False, "Delete failed", None)
 
+    # -----------------------------
+    # Blobs (content-addressed storage)
+    # -----------------------------
+    def acquire_blob(self, sha256: str, size_bytes: int) -> int:
+        """Add a reference to a stored blob (creating its record if needed). Returns the new refcount."""
+        doc = self.blobs.find_one_and_update(
+            {"_id": sha256},
+            {
+                "$inc": {"refcount": 1},
+                "$setOnInsert": {"size_bytes": int(size_bytes), "created_at": _now()},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return int(doc["refcount"])
+
+    def release_blobs(self, stored_keys: list[Optional[str]]) -> None:
+        """
+        Drop one reference per blob-backed stored_key. Blobs that reach zero are not
+        unlinked here: a concurrent upload of the same bytes may be re-acquiring them.
+        """
+        counts: Dict[str, int] = {}
+        for key in stored_keys:
+            if is_blob_key(key):
+                sha = key.rsplit("/", 1)[-1]
+                counts[sha] = counts.get(sha, 0) + 1
+        if counts:
+            now = _now()
+            self.blobs.bulk_write([
+                UpdateOne({"_id": sha}, {"$inc": {"refcount": -n}, "$set": {"released_at": now}})
+                for sha, n in counts.items()
+            ], ordered=False)
+
+    # -----------------------------
+    # Chunked upload sessions
+    # -----------------------------
+    def create_upload_session(
+        self,
+        *,
+        acting_user_id: Union[str, ObjectId],
+        vault_id: Union[str, ObjectId],
+        filename: str,
+        size_bytes: int,
+        chunk_size: int,
+        mime_claimed: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        ttl: timedelta = UPLOAD_SESSION_TTL,
+    ) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        vid = _oid(vault_id)
+        uid = _oid(acting_user_id)
+
+        if not filename or not filename.strip():
+            return False, "filename is required", None
+        if size_bytes <= 0 or chunk_size <= 0:
+            return False, "size_bytes and chunk_size must be positive", None
+
+        ok, msg, _vault = self._require_member(vid, uid)
+        if not ok:
+            return False, msg, None
+
+        doc = {
+            "vault_id": vid,
+            "user_id": uid,
+            "original_filename": filename.strip(),
+            "mime_claimed": mime_claimed,
+            "metadata_json": metadata or {},
+            "size_bytes": int(size_bytes),
+            "chunk_size": int(chunk_size),
+            "chunk_count": -(-int(size_bytes) // int(chunk_size)),
+            "received": [],
+            "status": "open",
+            "created_at": _now(),
+            "expires_at": _now() + ttl,
+        }
+        res = self.uploads.insert_one(doc)
+        doc["_id"] = res.inserted_id
+        return True, "Upload session created", doc
+
+    def get_upload_session(self, upload_id: Union[str, ObjectId]) -> Optional[Dict[str, Any]]:
+        return self.uploads.find_one({"_id": _oid(upload_id)})
+
+    def mark_chunk_received(self, upload_id: Union[str, ObjectId], index: int) -> Optional[Dict[str, Any]]:
+        """Record a verified chunk; returns the updated session (None if it is no longer open)."""
+        return self.uploads.find_one_and_update(
+            {"_id": _oid(upload_id), "status": "open"},
+            {"$addToSet": {"received": int(index)}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def claim_upload_session(self, upload_id: Union[str, ObjectId]) -> Optional[Dict[str, Any]]:
+        """Atomically move an open session to 'completing' so only one request can finish it."""
+        return self.uploads.find_one_and_update(
+            {"_id": _oid(upload_id), "status": "open"},
+            {"$set": {"status": "completing"}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def set_upload_status(self, upload_id: Union[str, ObjectId], status: str) -> None:
+        self.uploads.update_one({"_id": _oid(upload_id)}, {"$set": {"status": status}})
+
+    def delete_upload_session(self, upload_id: Union[str, ObjectId]) -> None:
+        self.uploads.delete_one({"_id": _oid(upload_id)})
+
+    def abort_upload_session(self, upload_id: Union[str, ObjectId]) -> bool:
+        """Delete a session unless a request is completing it. Returns False if it was left alone."""
+        res = self.uploads.delete_one({"_id": _oid(upload_id), "status": {"$ne": "completing"}})
+        return res.deleted_count == 1
+
+    # -----------------------------
+    # Vault resiliency (running aggregates)
+    # -----------------------------
+    # vault.stats = {file_count, size_bytes, score_sum, score_count,
+    #                by_type: {<file_type>: {file_count, size_bytes, score_sum, score_count}}}
+    # Kept current with $inc on insert / delete / rescore. Vaults that predate the
+    # aggregates have no "stats" and are skipped by the $inc paths until rebuilt.
+
+    @staticmethod
+    def _stats_inc(file_type: str, **deltas: float) -> Dict[str, float]:
+        inc: Dict[str, float] = {}
+        for field, delta in deltas.items():
+            if delta:
+                inc[f"stats.{field}"] = inc.get(f"stats.{field}", 0) + delta
+                inc[f"stats.by_type.{file_type}.{field}"] = delta
+        return inc
+
+    def _apply_stats_inc(self, vault_id: ObjectId, inc: Dict[str, float]) -> None:
+        if inc:
+            self.vaults.update_one({"_id": vault_id, "stats": {"$exists": True}}, {"$inc": inc})
+
+    def record_file_added(self, vault_id: Union[str, ObjectId], ext: str, size_bytes: int) -> None:
+        self._apply_stats_inc(
+            _oid(vault_id), self._stats_inc(file_type_for_ext(ext), file_count=1, size_bytes=int(size_bytes or 0))
+        )
+
+    def record_files_scored(self, changes: list[Tuple[ObjectId, str, Optional[float], float]]) -> None:
+        """
+        Account for (vault_id, ext, old_score, new_score) changes: a first score when
+        old_score is None, otherwise a rescore. One $inc per vault.
+        """
+        per_vault: Dict[ObjectId, Dict[str, float]] = {}
+        for vault_id, ext, old_score, new_score in changes:
+            if old_score is None:
+                inc = self._stats_inc(file_type_for_ext(ext), score_sum=new_score, score_count=1)
+            else:
+                inc = self._stats_inc(file_type_for_ext(ext), score_sum=new_score - old_score)
+            totals = per_vault.setdefault(_oid(vault_id), {})
+            for k, v in inc.items():
+                totals[k] = totals.get(k, 0) + v
+        for vault_id, inc in per_vault.items():
+            self._apply_stats_inc(vault_id, inc)
+
+    def record_files_removed(self, file_docs: list[Dict[str, Any]]) -> None:
+        """Subtract deleted file records (needs vault_id, ext, size_bytes, survivability_score)."""
+        per_vault: Dict[ObjectId, Dict[str, float]] = {}
+        for doc in file_docs:
+            score = doc.get("survivability_score")
+            inc = self._stats_inc(
+                file_type_for_ext(doc.get("ext")),
+                file_count=-1,
+                size_bytes=-int(doc.get("size_bytes") or 0),
+                score_sum=-score if score is not None else 0,
+                score_count=-1 if score is not None else 0,
+            )
+            totals = per_vault.setdefault(doc["vault_id"], {})
+            for k, v in inc.items():
+                totals[k] = totals.get(k, 0) + v
+        for vault_id, inc in per_vault.items():
+            self._apply_stats_inc(vault_id, inc)
+
+    @staticmethod
+    def resiliency_from_stats(stats: Optional[Dict[str, Any]]) -> float:
+        if not stats or not stats.get("score_count"):
+            return 0
+        return round(stats["score_sum"] / stats["score_count"], 1)
+
+    def calculate_vault_resiliency(self, vault_id: Union[str, ObjectId]) -> float:
+        """
+        The overall resiliency score for a vault: the average survivability score
+        across all files, read from the vault's running aggregates.
+        """
+        vid = _oid(vault_id)
+        vault = self.vaults.find_one({"_id": vid}, {"stats": 1})
+        if vault is None:
+            return 0
+        if "stats" not in vault:
+            return self.resiliency_from_stats(self.rebuild_vault_stats(vid).get(vid))
+        return self.resiliency_from_stats(vault["stats"])
+
+    def rebuild_vault_stats(self, vault_id: Optional[Union[str, ObjectId]] = None) -> Dict[ObjectId, Dict[str, Any]]:
+        """
+        Repair: recompute the aggregates with a server-side pipeline (one vault, or
+        every vault when vault_id is None) and overwrite vault.stats.
+        """
+        vid = _oid(vault_id) if vault_id is not None else None
+        type_branches = [
+            {"case": {"$in": [{"$toLower": {"$ifNull": ["$ext", ""]}}, formats]}, "then": file_type}
+            for file_type, formats in FILE_TYPE_FORMATS.items()
+        ]
+        pipeline: list[Dict[str, Any]] = [{"$match": {"vault_id": vid}}] if vid else []
+        pipeline += [
+            {"$project": {
+                "vault_id": 1,
+                "size_bytes": {"$ifNull": ["$size_bytes", 0]},
+                "score": "$survivability_score",
+                "file_type": {"$switch": {"branches": type_branches, "default": "other"}},
+            }},
+            {"$group": {
+                "_id": {"vault_id": "$vault_id", "file_type": "$file_type"},
+                "file_count": {"$sum": 1},
+                "size_bytes": {"$sum": "$size_bytes"},
+                "score_sum": {"$sum": {"$cond": [{"$isNumber": "$score"}, "$score", 0]}},
+                "score_count": {"$sum": {"$cond": [{"$isNumber": "$score"}, 1, 0]}},
+            }},
+        ]
+
+        fields = ("file_count", "size_bytes", "score_sum", "score_count")
+        rebuilt: Dict[ObjectId, Dict[str, Any]] = {}
+        for row in self.files.aggregate(pipeline):
+            stats = rebuilt.setdefault(row["_id"]["vault_id"], {**{f: 0 for f in fields}, "by_type": {}})
+            stats["by_type"][row["_id"]["file_type"]] = {f: row[f] for f in fields}
+            for f in fields:
+                stats[f] += row[f]
+
+        vault_ids = [vid] if vid else [v["_id"] for v in self.vaults.find({}, {"_id": 1})]
+        for v in vault_ids:
+            stats = rebuilt.setdefault(v, {**{f: 0 for f in fields}, "by_type": {}})
+            self.vaults.update_one({"_id": v}, {"$set": {"stats": stats}})
+        return rebuilt
+
+    # -----------------------------
+    # Background jobs
+    # -----------------------------
+    def enqueue_job(self, job_type: str, *, file_id: ObjectId, vault_id: ObjectId,
+                    header: Optional[bytes] = None) -> Dict[str, Any]:
+        """``header``: the file's leading bytes, so the worker can sniff the MIME type without reopening it."""
+        doc = {
+            "type": job_type,
+            "file_id": file_id,
+            "vault_id": vault_id,
+            "status": JOB_QUEUED,
+            "attempts": 0,
+            "created_at": _now(),
+        }
+        if header:
+            doc["header"] = bytes(header[:MIME_SNIFF_BYTES])
+        res = self.jobs.insert_one(doc)
+        doc["_id"] = res.inserted_id
+        return doc
+
+    def claim_jobs(self, *, worker_id: str, limit: int, lease: timedelta) -> list[Dict[str, Any]]:
+        """
+        Claim up to ``limit`` jobs for one worker. Jobs whose lease expired (a worker
+        died mid-batch) are claimed again until they run out of attempts.
+        """
+        claimed = []
+        now = _now()
+        query = {
+            "$or": [
+                {"status": JOB_QUEUED},
+                {"status": JOB_RUNNING, "lease_expires_at": {"$lt": now}},
+            ],
+            "attempts": {"$lt": JOB_MAX_ATTEMPTS},
+        }
+        for _ in range(limit):
+            job = self.jobs.find_one_and_update(
+                query,
+                {
+                    "$set": {"status": JOB_RUNNING, "worker_id": worker_id, "started_at": now,
+                             "lease_expires_at": now + lease},
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("created_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if not job:
+                break
+            claimed.append(job)
+        return claimed
+
+    def fail_exhausted_jobs(self) -> int:
+        """Mark jobs that crashed their worker on every attempt as failed."""
+        res = self.jobs.update_many(
+            {"status": JOB_RUNNING, "lease_expires_at": {"$lt": _now()}, "attempts": {"$gte": JOB_MAX_ATTEMPTS}},
+            {"$set": {"status": JOB_FAILED, "error": "Lease expired on final attempt", "finished_at": _now()}},
+        )
+        return int(res.modified_count)
+
+    def get_job(self, job_id: Union[str, ObjectId]) -> Optional[Dict[str, Any]]:
+        return self.jobs.find_one({"_id": _oid(job_id)}, JOB_STATUS_PROJECTION)
+
+    def get_latest_job_for_file(self, file_oid: ObjectId) -> Optional[Dict[str, Any]]:
+        return self.jobs.find_one({"file_id": file_oid}, JOB_STATUS_PROJECTION, sort=[("created_at", -1)])
+
+    # -----------------------------
+    # PDF metadata (cached by content hash)
+    # -----------------------------
+    def get_pdf_metadata(self, sha256: str, file_path: str) -> Dict[str, Any]:
+        """
+        Metadata of a stored PDF, parsed at most once per distinct content.
+        Parse errors are cached too, since the same bytes would fail again.
+        Timeouts and pool failures are not: they say nothing about the bytes,
+        so the next upload of the same content tries again.
+        """
+        cached = self.pdf_metadata.find_one({"_id": sha256}, {"metadata": 1})
+        if cached is not None:
+            return cached["metadata"]
+        try:
+            metadata, error = pdf_pool.extract(file_path), None
+        except PdfExtractionError as e:
+            print(f"[WARNING] PDF extraction failed for {sha256[:12]}: {e}")
+            if e.transient:
+                return {}
+            metadata, error = {}, str(e)
+        self.pdf_metadata.update_one(
+            {"_id": sha256},
+            {"$set": {"metadata": metadata, "error": error, "extracted_at": _now()}},
+            upsert=True,
+        )
+        return metadata
+
+    # -----------------------------
+    # Maintenance checkpoints
+    # -----------------------------
+    def claim_checkpoint(self, name: str, *, owner: str, lease: timedelta) -> Optional[Dict[str, Any]]:
+        """
+        Take the lease on a named maintenance task so only one process runs it.
+        Returns the checkpoint (created on first use), or None if another owner
+        holds an unexpired lease.
+        """
+        now = _now()
+        try:
+            return self.checkpoints.find_one_and_update(
+                {"_id": name, "$or": [
+                    {"owner": None}, {"owner": owner}, {"lease_expires_at": {"$lt": now}},
+                ]},
+                {"$set": {"owner": owner, "lease_expires_at": now + lease}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return None
+
+    def save_checkpoint(self, name: str, *, owner: str, lease: timedelta, **fields: Any) -> bool:
+        """Persist progress and renew the lease. False if the lease was lost."""
+        now = _now()
+        res = self.checkpoints.update_one(
+            {"_id": name, "owner": owner},
+            {"$set": {**fields, "updated_at": now, "lease_expires_at": now + lease}},
+        )
+        return res.matched_count == 1
+
+    def release_checkpoint(self, name: str, *, owner: str) -> None:
+        self.checkpoints.update_one({"_id": name, "owner": owner}, {"$set": {"owner": None, "lease_expires_at": None}})
+
+    def get_checkpoint(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.checkpoints.find_one({"_id": name})
+
+    def _run_migrations(self) -> None:
+        """One-off data migrations, each recorded as a checkpoint once done."""
+        if self.checkpoints.find_one({"_id": FOLDER_PATHS_MIGRATION}, {"_id": 1}) is None:
+            report = self.backfill_folder_paths()
+            self.checkpoints.update_one(
+                {"_id": FOLDER_PATHS_MIGRATION}, {"$set": {**report, "done_at": _now()}}, upsert=True
+            )
+            print(f"[INFO] Folder paths backfilled: {report}")
+        if self.checkpoints.find_one({"_id": UPLOADED_AT_MIGRATION}, {"_id": 1}) is None:
+            report = self.backfill_uploaded_at()
+            self.checkpoints.update_one(
+                {"_id": UPLOADED_AT_MIGRATION}, {"$set": {**report, "done_at": _now()}}, upsert=True
+            )
+            print(f"[INFO] File upload dates backfilled: {report}")
+
     # -----------------------------
     # Admin
     # -----------------------------
@@ -589,6 +1244,7 @@ class Database:
         self.vaults.update_one({"_id": vid}, {"$set": {"admin_user_id": new}})
         self.vaults.update_one({"_id": vid, "members.user_id": new}, {"$set": {"members.$.role": ROLE_ADMIN}})
         self.vaults.update_one({"_id": vid, "members.user_id": curr}, {"$set": {"members.$.role": ROLE_EDITOR}})
+        self.invalidate_membership(vid, new, curr)
 
         return True, "Admin handed off", self.vaults.find_one({"_id": vid})
 
@@ -620,9 +1276,17 @@ class Database:
             return False, "Cannot demote vault owner admin. Use handoff_admin first.", None
 
         self.vaults.update_one({"_id": vid, "members.user_id": target}, {"$set": {"members.$.role": new_role}})
+        self.invalidate_membership(vid, target)
         return True, "Role updated", self.vaults.find_one({"_id": vid})
 
 
 if __name__ == "__main__":
+    import sys
+
     db = Database()
-    print("✅ MongoDB connected (env vars matched) and indexes ensured.")
\ No newline at end of file
+    print("✅ MongoDB connected (env vars matched) and indexes ensured.")
+
+    # python database.py rebuild-stats [vault_id]
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild-stats":
+        rebuilt = db.rebuild_vault_stats(sys.argv[2] if len(sys.argv) > 2 else None)
+        print(f"✅ Rebuilt resiliency aggregates for {len(rebuilt)} vault(s)")
\ No newline at end of file
@@ -0,0 +1,525 @@
+"""
+Header-only metadata extraction for Domus Memoriae
+
+Reads the descriptive metadata a file carries about itself (EXIF, PNG text
+chunks, ID3, FLAC/Ogg Vorbis comments, MP4/QuickTime atoms, RIFF INFO lists)
+so calculate_metadata_score and calculate_access_risk_score see more than
+what the uploader typed. Fields use the same names as the PDF extractor:
+author, title, creation_date, description (plus album, camera, software and
+copyright where the format has them).
+
+Every extractor reads through a BudgetReader. It may seek anywhere, for
+example past image data, audio frames or an MP4 'mdat', but it can read at
+most METADATA_BYTE_BUDGET bytes in total, so it never reads the whole file.
+If a file's metadata does not fit in the budget, extraction stops and keeps
+what was found so far.
+
+Extractors are registered with @extractor under a file type (the
+FILE_TYPE_FORMATS categories in features.py) and its extensions. PDFs are
+handled by pdf_pool.py instead, because pypdf is neither header-only nor
+bounded. Standard library only.
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from features import file_type_for_ext
+
+METADATA_BYTE_BUDGET = int(os.environ.get("METADATA_BYTE_BUDGET", 256 * 1024))
+# Longest value kept from any field, and most bytes read for one
+MAX_VALUE_CHARS = 1000
+MAX_FIELD_BYTES = 64 * 1024
+
+# file type -> extension -> extractor(reader, found)
+EXTRACTORS: Dict[str, Dict[str, Callable[["BudgetReader", Dict[str, Any]], None]]] = {}
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class BudgetReader:
+    """A binary file whose reads (not seeks) are charged against a byte budget."""
+
+    def __init__(self, f, budget: int = METADATA_BYTE_BUDGET):
+        self.f = f
+        self.remaining = budget
+        self.bytes_read = 0
+        self.size = os.fstat(f.fileno()).st_size
+
+    def read(self, n: int) -> bytes:
+        if n > self.remaining:
+            raise BudgetExceeded(f"metadata needs more than the {self.bytes_read + self.remaining} byte budget")
+        data = self.f.read(n)
+        self.remaining -= len(data)
+        self.bytes_read += len(data)
+        return data
+
+    def read_at(self, offset: int, n: int) -> bytes:
+        self.f.seek(offset)
+        return self.read(n)
+
+    def seek(self, offset: int) -> None:
+        self.f.seek(offset)
+
+    def skip(self, n: int) -> None:
+        self.f.seek(n, os.SEEK_CUR)
+
+    def tell(self) -> int:
+        return self.f.tell()
+
+
+def extractor(file_type: str, *exts: str):
+    """Register the decorated function as the extractor for ``exts`` (all of ``file_type``)."""
+    def register(fn):
+        for ext in exts:
+            if file_type_for_ext(ext) != file_type:
+                raise ValueError(f"'{ext}' is not a {file_type} format")
+            EXTRACTORS.setdefault(file_type, {})[ext] = fn
+        return fn
+    return register
+
+
+def extractor_for(ext: Optional[str]):
+    ext = (ext or "").lower()
+    return EXTRACTORS.get(file_type_for_ext(ext), {}).get(ext)
+
+
+def extract_header_metadata(file_path: str, ext: Optional[str], budget: int = METADATA_BYTE_BUDGET) -> Dict[str, Any]:
+    """
+    Metadata fields found in the file's headers ({} for formats without an
+    extractor). Never raises on a malformed or truncated file.
+    """
+    fn = extractor_for(ext)
+    if fn is None:
+        return {}
+    found: Dict[str, Any] = {}
+    try:
+        with open(file_path, "rb") as f:
+            fn(BudgetReader(f, budget), found)
+    except BudgetExceeded:
+        pass
+    except (OSError, ValueError, OverflowError, IndexError, EOFError, struct.error, zlib.error) as e:
+        print(f"[DEBUG] Metadata extraction stopped for .{ext}: {e}")
+    return found
+
+
+def _put(found: Dict[str, Any], key: str, value: Any) -> None:
+    """Keep the first non-empty value seen for ``key``."""
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    value = (value or "").strip("\x00 ").split("\x00")[0].strip()[:MAX_VALUE_CHARS]
+    if value and not found.get(key):
+        found[key] = value
+
+
+# ============================================================================
+# TIFF / EXIF
+# ============================================================================
+
+EXIF_IFD_POINTER = 0x8769
+TIFF_ASCII_TAGS = {
+    0x010E: "description",    # ImageDescription
+    0x013B: "author",         # Artist
+    0x0132: "creation_date",  # DateTime (last modified; DateTimeOriginal wins)
+    0x0131: "software",
+    0x8298: "copyright",
+    0x010F: "make",
+    0x0110: "model",
+    0x9003: "creation_date",  # DateTimeOriginal, in the Exif sub-IFD
+}
+# Windows "XP" tags: UTF-16LE in BYTE arrays
+TIFF_XP_TAGS = {0x9C9B: "title", 0x9C9C: "description", 0x9C9D: "author", 0x9C9F: "description"}
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 7: 1, 13: 4}
+
+
+def _exif_date(value: str) -> str:
+    try:
+        return datetime.strptime(value.strip("\x00 ")[:19], "%Y:%m:%d %H:%M:%S").isoformat()
+    except ValueError:
+        return value
+
+
+def _read_ifd(read_at, endian: str, offset: int) -> Dict[int, Any]:
+    count = min(struct.unpack(endian + "H", read_at(offset, 2))[0], 512)
+    entries = read_at(offset + 2, 12 * count)
+    tags: Dict[int, Any] = {}
+    for i in range(count):
+        tag, typ, n, raw = struct.unpack(endian + "HHI4s", entries[12 * i:12 * i + 12])
+        if tag == EXIF_IFD_POINTER:
+            tags[tag] = struct.unpack(endian + "I", raw)[0]
+        elif tag in TIFF_ASCII_TAGS or tag in TIFF_XP_TAGS:
+            size = n * TIFF_TYPE_SIZES.get(typ, 1)
+            if size <= 4:
+                tags[tag] = raw[:size]
+            else:
+                tags[tag] = read_at(struct.unpack(endian + "I", raw)[0], min(size, MAX_FIELD_BYTES))
+    return tags
+
+
+def _parse_tiff(read_at, found: Dict[str, Any]) -> None:
+    """``read_at(offset, n)`` reads relative to the start of the TIFF header."""
+    head = read_at(0, 8)
+    endian = {b"II": "<", b"MM": ">"}.get(head[:2])
+    if endian is None or struct.unpack(endian + "H", head[2:4])[0] != 42:
+        return
+    tags = _read_ifd(read_at, endian, struct.unpack(endian + "I", head[4:8])[0])
+    if tags.get(EXIF_IFD_POINTER):
+        tags.update(_read_ifd(read_at, endian, tags[EXIF_IFD_POINTER]))
+
+    for tag in (0x9003, 0x0132):
+        if tag in tags:
+            _put(found, "creation_date", _exif_date(tags[tag].decode("latin-1")))
+    for tag, key in TIFF_XP_TAGS.items():
+        if tag in tags:
+            _put(found, key, tags[tag].decode("utf-16-le", "replace"))
+    for tag in (0x010E, 0x013B, 0x0131, 0x8298):
+        if tag in tags:
+            _put(found, TIFF_ASCII_TAGS[tag], tags[tag])
+    camera = " ".join(tags[t].decode("latin-1").strip("\x00 ") for t in (0x010F, 0x0110) if t in tags)
+    _put(found, "camera", camera)
+
+
+def _memory_reader(data: bytes):
+    return lambda offset, n: data[offset:offset + n]
+
+
+@extractor("image", "tif", "tiff")
+def _tiff(r: BudgetReader, found: Dict[str, Any]) -> None:
+    _parse_tiff(r.read_at, found)
+
+
+@extractor("image", "jpg", "jpeg")
+def _jpeg(r: BudgetReader, found: Dict[str, Any]) -> None:
+    if r.read(2) != b"\xff\xd8":
+        return
+    while True:
+        marker = r.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return
+        code = marker[1]
+        if code == 0xFF:
+            r.skip(-1)  # fill byte
+            continue
+        if code == 0x01 or 0xD0 <= code <= 0xD8:
+            continue  # markers without a length
+        if code in (0xDA, 0xD9):
+            return  # start of scan: the headers are over
+        length = struct.unpack(">H", r.read(2))[0]
+        if code == 0xE1:
+            data = r.read(length - 2)
+            if data.startswith(b"Exif\x00\x00"):
+                _parse_tiff(_memory_reader(data[6:]), found)
+        elif code == 0xFE:
+            _put(found, "description", r.read(length - 2))
+        else:
+            r.skip(length - 2)
+
+
+# ============================================================================
+# PNG
+# ============================================================================
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_TEXT_KEYS = {
+    "author": "author", "title": "title", "description": "description", "comment": "description",
+    "creation time": "creation_date", "software": "software", "copyright": "copyright",
+}
+
+
+def _png_text(ctype: bytes, data: bytes) -> tuple[str, str]:
+    keyword, _, rest = data.partition(b"\x00")
+    if ctype == b"tEXt":
+        text = rest.decode("latin-1")
+    elif ctype == b"zTXt":
+        text = zlib.decompressobj().decompress(rest[1:], MAX_FIELD_BYTES).decode("latin-1")
+    else:  # iTXt: compression flag, method, language tag, translated keyword, text
+        compressed, body = rest[0], rest[2:]
+        body = body.split(b"\x00", 2)[-1]
+        if compressed:
+            body = zlib.decompressobj().decompress(body, MAX_FIELD_BYTES)
+        text = body.decode("utf-8", "replace")
+    return keyword.decode("latin-1").lower(), text
+
+
+@extractor("image", "png")
+def _png(r: BudgetReader, found: Dict[str, Any]) -> None:
+    if r.read(8) != PNG_SIGNATURE:
+        return
+    while True:
+        head = r.read(8)
+        if len(head) < 8:
+            return
+        length, ctype = struct.unpack(">I4s", head)
+        if ctype == b"IEND":
+            return
+        if ctype in (b"tEXt", b"zTXt", b"iTXt") and length <= MAX_FIELD_BYTES:
+            keyword, text = _png_text(ctype, r.read(length))
+            if keyword in PNG_TEXT_KEYS:
+                _put(found, PNG_TEXT_KEYS[keyword], text)
+            r.skip(4)  # CRC
+        elif ctype == b"eXIf" and length <= MAX_FIELD_BYTES:
+            _parse_tiff(_memory_reader(r.read(length)), found)
+            r.skip(4)
+        else:
+            r.skip(length + 4)
+
+
+# ============================================================================
+# RIFF (WAV, AVI, WebP)
+# ============================================================================
+
+RIFF_INFO_KEYS = {
+    b"IART": "author", b"INAM": "title", b"ICRD": "creation_date", b"ICMT": "description",
+    b"ISBJ": "description", b"ICOP": "copyright", b"ISFT": "software",
+}
+
+
+def _riff_chunks(r: BudgetReader, end: int):
+    """Yield (id, size, data offset) and leave the reader after each chunk, wherever the caller stopped."""
+    while r.tell() + 8 <= end:
+        cid, size = struct.unpack("<4sI", r.read(8))
+        start = r.tell()
+        yield cid, size, start
+        r.seek(start + size + (size & 1))
+
+
+def _riff(r: BudgetReader, found: Dict[str, Any], form: bytes) -> None:
+    head = r.read(12)
+    if head[:4] != b"RIFF" or head[8:12] != form:
+        return
+    end = min(8 + struct.unpack("<I", head[4:8])[0], r.size)
+    for cid, size, start in _riff_chunks(r, end):
+        if cid == b"LIST" and r.read(4) == b"INFO":
+            for sub, sub_size, _ in _riff_chunks(r, min(start + size, end)):
+                if sub in RIFF_INFO_KEYS:
+                    _put(found, RIFF_INFO_KEYS[sub], r.read(min(sub_size, MAX_FIELD_BYTES)))
+        elif cid == b"EXIF" and size <= MAX_FIELD_BYTES:
+            data = r.read(size)
+            _parse_tiff(_memory_reader(data[6:] if data.startswith(b"Exif\x00\x00") else data), found)
+
+
+@extractor("audio", "wav")
+def _wav(r: BudgetReader, found: Dict[str, Any]) -> None:
+    _riff(r, found, b"WAVE")
+
+
+@extractor("video", "avi")
+def _avi(r: BudgetReader, found: Dict[str, Any]) -> None:
+    _riff(r, found, b"AVI ")
+
+
+@extractor("image", "webp")
+def _webp(r: BudgetReader, found: Dict[str, Any]) -> None:
+    _riff(r, found, b"WEBP")
+
+
+# ============================================================================
+# ID3 (MP3)
+# ============================================================================
+
+ID3_FRAMES = {
+    "TPE1": "author", "TIT2": "title", "TDRC": "creation_date", "TYER": "creation_date",
+    "COMM": "description", "TALB": "album", "TCOP": "copyright", "TSSE": "software",
+    # ID3v2.2 three-letter frames
+    "TP1": "author", "TT2": "title", "TYE": "creation_date", "COM": "description", "TAL": "album",
+}
+ID3_ENCODINGS = ("latin-1", "utf-16", "utf-16-be", "utf-8")
+
+
+def _syncsafe(b: bytes) -> int:
+    return (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+
+
+def _id3_text(data: bytes, comment: bool) -> str:
+    if not data or data[0] >= len(ID3_ENCODINGS):
+        return ""
+    encoding, body = data[0], data[1:]
+    wide = encoding in (1, 2)
+    if comment:
+        # Language, then a short description ending in a (wide) NUL
+        body = body[3:]
+        step, nul = (2, b"\x00\x00") if wide else (1, b"\x00")
+        for i in range(0, len(body) - step + 1, step):
+            if body[i:i + step] == nul:
+                body = body[i + step:]
+                break
+    return body.decode(ID3_ENCODINGS[encoding], "replace")
+
+
+def _id3v1(r: BudgetReader, found: Dict[str, Any]) -> None:
+    if r.size < 128:
+        return
+    tag = r.read_at(r.size - 128, 128)
+    if tag[:3] != b"TAG":
+        return
+    for key, field in (("title", tag[3:33]), ("author", tag[33:63]), ("album", tag[63:93]),
+                       ("creation_date", tag[93:97]), ("description", tag[97:127])):
+        _put(found, key, field)
+
+
+@extractor("audio", "mp3")
+def _mp3(r: BudgetReader, found: Dict[str, Any]) -> None:
+    head = r.read(10)
+    if head[:3] == b"ID3" and len(head) == 10:
+        major, flags = head[3], head[5]
+        end = min(10 + _syncsafe(head[6:10]), r.size)
+        if flags & 0x40 and major >= 3:  # extended header
+            size = r.read(4)
+            r.seek(10 + (_syncsafe(size) if major == 4 else struct.unpack(">I", size)[0] + 4))
+        id_len, head_len = (3, 6) if major == 2 else (4, 10)
+        while r.tell() + head_len <= end:
+            frame = r.read(head_len)
+            frame_id = frame[:id_len]
+            if not frame_id.strip(b"\x00"):
+                break  # padding
+            if major == 2:
+                size = int.from_bytes(frame[3:6], "big")
+            elif major == 4:
+                size = _syncsafe(frame[4:8])
+            else:
+                size = struct.unpack(">I", frame[4:8])[0]
+            # Compressed, encrypted or unsynchronised frames are skipped
+            packed = major >= 3 and frame[9] & (0x0F if major == 4 else 0xC0)
+            key = ID3_FRAMES.get(frame_id.decode("latin-1"))
+            if key and not packed and size <= MAX_FIELD_BYTES:
+                _put(found, key, _id3_text(r.read(size), comment=frame_id in (b"COMM", b"COM")))
+            else:
+                r.skip(size)
+    if not all(found.get(k) for k in ("author", "title")):
+        _id3v1(r, found)
+
+
+# ============================================================================
+# Vorbis comments (FLAC, Ogg Vorbis, Ogg Opus)
+# ============================================================================
+
+VORBIS_FIELDS = {
+    "ARTIST": "author", "TITLE": "title", "DATE": "creation_date", "DESCRIPTION": "description",
+    "COMMENT": "description", "ALBUM": "album", "COPYRIGHT": "copyright",
+}
+
+
+def _vorbis_comments(data: bytes, found: Dict[str, Any]) -> None:
+    vendor_length = struct.unpack_from("<I", data, 0)[0]
+    pos = 4 + vendor_length
+    count = struct.unpack_from("<I", data, pos)[0]
+    pos += 4
+    for _ in range(min(count, 1000)):
+        length = struct.unpack_from("<I", data, pos)[0]
+        key, _, value = data[pos + 4:pos + 4 + length].partition(b"=")
+        pos += 4 + length
+        field = VORBIS_FIELDS.get(key.decode("ascii", "replace").upper())
+        if field:
+            _put(found, field, value.decode("utf-8", "replace"))
+
+
+@extractor("audio", "flac")
+def _flac(r: BudgetReader, found: Dict[str, Any]) -> None:
+    if r.read(4) != b"fLaC":
+        return
+    last = False
+    while not last:
+        head = r.read(4)
+        if len(head) < 4:
+            return
+        last, block_type, size = head[0] & 0x80, head[0] & 0x7F, int.from_bytes(head[1:4], "big")
+        if block_type == 4:
+            _vorbis_comments(r.read(size), found)
+            return
+        r.skip(size)  # STREAMINFO, SEEKTABLE, PICTURE, ...
+
+
+@extractor("audio", "ogg")
+def _ogg(r: BudgetReader, found: Dict[str, Any]) -> None:
+    # The comment header is the stream's second packet, possibly spread over pages
+    packets, current = [], b""
+    while len(packets) < 2:
+        head = r.read(27)
+        if len(head) < 27 or head[:4] != b"OggS":
+            return
+        lacing = r.read(head[26])
+        body = r.read(sum(lacing))
+        pos = 0
+        for lace in lacing:
+            current += body[pos:pos + lace]
+            pos += lace
+            if lace < 255:
+                packets.append(current)
+                current = b""
+    comment = packets[1]
+    if comment.startswith(b"\x03vorbis"):
+        _vorbis_comments(comment[7:], found)
+    elif comment.startswith(b"OpusTags"):
+        _vorbis_comments(comment[8:], found)
+
+
+# ============================================================================
+# ISO base media / QuickTime (MP4, MOV, M4V, M4A)
+# ============================================================================
+
+MP4_ITEMS = {
+    b"\xa9ART": "author", b"aART": "author", b"\xa9nam": "title", b"\xa9day": "creation_date",
+    b"desc": "description", b"\xa9des": "description", b"\xa9cmt": "description", b"\xa9alb": "album",
+    b"cprt": "copyright", b"\xa9too": "software",
+}
+MP4_EPOCH = datetime(1904, 1, 1)
+
+
+def _boxes(r: BudgetReader, end: int):
+    """Yield (type, body offset, end offset) and leave the reader after each box."""
+    while r.tell() + 8 <= end:
+        start = r.tell()
+        size, box_type = struct.unpack(">I4s", r.read(8))
+        header = 8
+        if size == 1:
+            size, header = struct.unpack(">Q", r.read(8))[0], 16
+        elif size == 0:
+            size = end - start
+        if size < header:
+            return
+        yield box_type, start + header, min(start + size, end)
+        r.seek(start + size)
+
+
+def _mp4_walk(r: BudgetReader, end: int, found: Dict[str, Any], times: Dict[str, str], parent: bytes = b"") -> None:
+    for box_type, body, box_end in _boxes(r, end):
+        if box_type in (b"moov", b"udta", b"ilst"):
+            _mp4_walk(r, box_end, found, times, box_type)
+        elif box_type == b"meta":
+            # ISO 'meta' is a full box (4 bytes of version and flags); QuickTime's is not
+            if r.read(4) != b"\x00\x00\x00\x00":
+                r.seek(body)
+            _mp4_walk(r, box_end, found, times, box_type)
+        elif box_type == b"mvhd" and parent == b"moov":
+            version = r.read(4)[0]
+            created = struct.unpack(">Q", r.read(8))[0] if version == 1 else struct.unpack(">I", r.read(4))[0]
+            if created:
+                times["created"] = (MP4_EPOCH + timedelta(seconds=created)).isoformat()
+        elif parent == b"ilst" and box_type in MP4_ITEMS:
+            for sub_type, sub_body, sub_end in _boxes(r, box_end):
+                if sub_type == b"data":
+                    # 4 bytes of type indicator, 4 of locale, then the value
+                    _put(found, MP4_ITEMS[box_type], r.read(min(sub_end - sub_body, MAX_FIELD_BYTES))[8:]
+                         .decode("utf-8", "replace"))
+                    break
+        elif parent == b"udta" and box_type in MP4_ITEMS and box_type[0] == 0xA9:
+            # QuickTime user data text: 2 bytes length, 2 bytes language, text
+            length = struct.unpack(">H", r.read(4)[:2])[0]
+            _put(found, MP4_ITEMS[box_type], r.read(min(length, MAX_FIELD_BYTES)).decode("utf-8", "replace"))
+
+
+@extractor("video", "mp4", "mov", "m4v")
+@extractor("audio", "m4a")
+def _mp4(r: BudgetReader, found: Dict[str, Any]) -> None:
+    times: Dict[str, str] = {}
+    try:
+        _mp4_walk(r, r.size, found, times)
+    finally:
+        # The movie header's creation time is a fallback for an explicit date tag
+        _put(found, "creation_date", times.get("created"))
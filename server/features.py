@@ -0,0 +1,134 @@
+"""
+Survivability feature definitions for Domus Memoriae
+
+Single source of truth for how a file record is turned into the model's
+feature columns, row by row (serving) or column-wise (batch scoring and
+training data export). Kept free of pandas/sklearn so the database layer and
+background workers can import it cheaply.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+# Common format categories
+IMAGE_FORMATS = ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff', 'tif', 'webp', 'heic', 'heif', 'svg']
+VIDEO_FORMATS = ['mp4', 'avi', 'mov', 'wmv', 'flv', 'mkv', 'webm', 'm4v', 'mpeg', 'mpg']
+DOCUMENT_FORMATS = ['pdf', 'doc', 'docx', 'txt', 'rtf', 'odt']
+AUDIO_FORMATS = ['mp3', 'wav', 'ogg', 'flac', 'm4a', 'aac']
+
+FILE_TYPE_FORMATS = {
+    'image': IMAGE_FORMATS,
+    'video': VIDEO_FORMATS,
+    'document': DOCUMENT_FORMATS,
+    'audio': AUDIO_FORMATS,
+}
+FILE_TYPES = list(FILE_TYPE_FORMATS) + ['other']
+
+# Format risk levels
+HIGH_RISK_FORMATS = ['wma', 'rm', 'ra', 'swf', 'fla', 'psd', 'ai', 'doc', 'bmp', 'tiff']
+MEDIUM_RISK_FORMATS = ['avi', 'mov', 'wmv']
+MODERN_FORMATS = ['mp4', 'png', 'jpg', 'jpeg', 'pdf', 'mp3', 'webp']
+FORMAT_RISK_LEVELS = ['low', 'medium', 'high']
+
+# Column order of the training data (data.csv) and of every feature row
+FEATURE_COLUMNS = [
+    'ext', 'file_type', 'format_risk', 'size_bytes',
+    'metadata_score', 'access_risk_score', 'duplicate_count',
+    'access_count', 'file_age_days', 'mime_mismatch'
+]
+CATEGORICAL_COLUMNS = ['ext', 'file_type', 'format_risk']
+NUMERIC_COLUMNS = [c for c in FEATURE_COLUMNS if c not in CATEGORICAL_COLUMNS]
+
+
+def file_type_for_ext(ext):
+    """Map a file extension to its broad category."""
+    ext = (ext or '').lower()
+    for file_type, formats in FILE_TYPE_FORMATS.items():
+        if ext in formats:
+            return file_type
+    return 'other'
+
+
+def format_risk_for_ext(ext):
+    """Obsolescence risk tier of a file extension."""
+    ext = (ext or '').lower()
+    if ext in HIGH_RISK_FORMATS:
+        return 'high'
+    if ext in MEDIUM_RISK_FORMATS:
+        return 'medium'
+    if ext in MODERN_FORMATS:
+        return 'low'
+    return 'medium'
+
+
+def file_age_days(uploaded_at, now=None):
+    now = now or datetime.utcnow()
+    if uploaded_at is None:
+        return 0
+    if isinstance(uploaded_at, str):
+        uploaded_at = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
+    return (now - uploaded_at).days
+
+
+def build_feature_row(file_data, now=None):
+    """
+    Extract the features from a file record that match the training data columns.
+    Returns a dict keyed by FEATURE_COLUMNS.
+    """
+    ext = file_data.get('ext', '').lower()
+    return {
+        'ext': ext,
+        'file_type': file_type_for_ext(ext),
+        'format_risk': format_risk_for_ext(ext),
+        'size_bytes': file_data.get('size_bytes', 0),
+        'metadata_score': file_data.get('metadata_score', 0),
+        'access_risk_score': file_data.get('access_risk_score', 0),
+        'duplicate_count': file_data.get('duplicate_count', 0),
+        'access_count': file_data.get('access_count', 0),
+        'file_age_days': file_age_days(file_data.get('uploaded_at', now or datetime.utcnow()), now),
+        'mime_mismatch': 1 if file_data.get('mime_claimed') != file_data.get('mime_detected') else 0,
+    }
+
+
+def _numeric_column(docs, key):
+    # Missing keys default to 0 like build_feature_row; explicit None becomes NaN (imputed)
+    return np.array([d.get(key, 0) for d in docs], dtype=np.float64)
+
+
+def _age_days_column(docs, now):
+    uploaded = [d.get('uploaded_at', now) for d in docs]
+    try:
+        stamps = np.array(uploaded, dtype='datetime64[us]')
+    except (TypeError, ValueError):
+        # ISO strings with offsets etc.: take the exact per-row path
+        return np.array([file_age_days(u, now) for u in uploaded], dtype=np.int64)
+    missing = np.isnat(stamps)
+    ages = (np.datetime64(now, 'us') - np.where(missing, np.datetime64(now, 'us'), stamps)) // np.timedelta64(1, 'D')
+    return ages.astype(np.int64)
+
+
+def feature_columns_many(file_docs, now=None):
+    """
+    Column-wise version of build_feature_row for a list of file records.
+    Returns a dict of FEATURE_COLUMNS -> NumPy array.
+    """
+    now = now or datetime.utcnow()
+    ext = [(d.get('ext', '') or '').lower() for d in file_docs]
+    type_of, risk_of = {}, {}
+    for e in set(ext):
+        type_of[e] = file_type_for_ext(e)
+        risk_of[e] = format_risk_for_ext(e)
+    return {
+        'ext': np.array(ext, dtype=object),
+        'file_type': np.array([type_of[e] for e in ext], dtype=object),
+        'format_risk': np.array([risk_of[e] for e in ext], dtype=object),
+        'size_bytes': _numeric_column(file_docs, 'size_bytes'),
+        'metadata_score': _numeric_column(file_docs, 'metadata_score'),
+        'access_risk_score': _numeric_column(file_docs, 'access_risk_score'),
+        'duplicate_count': _numeric_column(file_docs, 'duplicate_count'),
+        'access_count': _numeric_column(file_docs, 'access_count'),
+        'file_age_days': _age_days_column(file_docs, now),
+        'mime_mismatch': np.array(
+            [d.get('mime_claimed') != d.get('mime_detected') for d in file_docs], dtype=np.int64),
+    }
@@ -0,0 +1,32 @@
+"""
+gunicorn settings for the Domus Memoriae API (railway.yaml: gunicorn app:app -c gunicorn.conf.py)
+
+With preload (the default) the app, the survivability model and the heavy
+modules are loaded once in the master and shared copy-on-write by the workers.
+Each worker then opens its own Mongo connection, because MongoClient is not
+fork-safe. Set GUNICORN_PRELOAD=false to load everything in every worker
+instead. The worker count comes from WEB_CONCURRENCY (gunicorn's own setting).
+Workers flush their buffered file access counts as they exit (worker_exit).
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        import app
+        app.before_fork()
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        import app
+        app.after_fork()
+
+
+def worker_exit(server, worker):
+    import app
+    app.before_worker_exit()
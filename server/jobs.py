@@ -0,0 +1,232 @@
+"""
+Background analysis workers for Domus Memoriae
+
+Uploads only store the blob and a "pending" file record; the expensive
+analysis (libmagic, PDF metadata, duplicate count, ML survivability and the
+vault resiliency aggregates) runs here, in a pool of worker processes that pull
+jobs from the Mongo ``jobs`` collection in batches.
+
+Usage:
+    python jobs.py                  # 2 worker processes
+    python jobs.py --workers 4 --batch-size 32
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+from database import (
+    Database,
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_MAX_ATTEMPTS,
+    JOB_QUEUED,
+    calculate_access_risk_score,
+    calculate_metadata_score,
+    detect_mime_type_from_buffer,
+)
+from extractors import extract_header_metadata
+from scoring import predict_survivability, predict_survivability_many
+from storage import BlobStore, read_header
+
+JOB_ANALYZE_FILE = "analyze_file"
+
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', '/tmp/domus_uploads')
+BATCH_SIZE = int(os.environ.get('ANALYSIS_BATCH_SIZE', 16))
+POLL_INTERVAL = float(os.environ.get('ANALYSIS_POLL_INTERVAL', 1.0))
+JOB_LEASE = timedelta(minutes=10)
+
+ANALYSIS_PENDING = "pending"
+ANALYSIS_DONE = "done"
+ANALYSIS_FAILED = "failed"
+
+
+def scoring_input(file_record, fields):
+    """The record as the survivability model sees it once ``fields`` are applied."""
+    return {
+        'ext': file_record.get('ext', ''),
+        'mime_claimed': file_record.get('mime_claimed') or "application/octet-stream",
+        'mime_detected': fields['mime_detected'],
+        'metadata_score': fields['metadata_score'],
+        'uploaded_at': file_record.get('uploaded_at', datetime.utcnow()),
+        'duplicate_count': fields['duplicate_count'],
+        'access_count': file_record.get('access_count', 0),
+        'access_risk_score': fields['access_risk_score'],
+        'size_bytes': file_record.get('size_bytes', 0)
+    }
+
+
+def analyze_file(db, file_record, file_path, header=None, predict=True):
+    """
+    Compute the analysis fields for a stored file record.
+    Returns the dict of fields to $set on the record. With predict=False the
+    survivability_score is left out so a batch can be scored in one call.
+    """
+    vault_id = file_record['vault_id']
+    file_extension = file_record.get('ext', '')
+    mime_claimed = file_record.get('mime_claimed') or "application/octet-stream"
+    metadata_json = dict(file_record.get('metadata_json') or {})
+
+    # Detect actual MIME type from the leading bytes only
+    if header is None:
+        header = read_header(file_path)
+    mime_detected = detect_mime_type_from_buffer(header)
+
+    # Extract PDF metadata automatically if it's a PDF (parsed once per distinct content)
+    if file_extension.lower() == 'pdf':
+        pdf_metadata = db.get_pdf_metadata(file_record['sha256'], file_path)
+        # Merge PDF metadata with user-provided metadata
+        if pdf_metadata:
+            metadata_json.update(pdf_metadata)
+    else:
+        # Fill in what the file's own headers say (EXIF, ID3, ...) without
+        # overriding what the user typed
+        for key, value in extract_header_metadata(file_path, file_extension).items():
+            if not metadata_json.get(key):
+                metadata_json[key] = value
+
+    # Calculate metadata score with enhanced data
+    metadata_score = calculate_metadata_score(metadata_json)
+
+    # Count earlier copies of the same bytes in this vault
+    duplicate_count = db.files.count_documents({
+        "vault_id": vault_id,
+        "sha256": file_record['sha256'],
+        "_id": {"$lt": file_record['_id']}
+    })
+
+    access_risk_score, access_risk_reason = calculate_access_risk_score(
+        mime_claimed,
+        mime_detected,
+        metadata_json
+    )
+
+    fields = {
+        "mime_detected": mime_detected,
+        "metadata_json": metadata_json,
+        "metadata_score": metadata_score,
+        "duplicate_count": duplicate_count,
+        "access_risk_score": access_risk_score,
+        "access_risk_reason": access_risk_reason,
+        "analysis_status": ANALYSIS_DONE,
+        "analyzed_at": datetime.utcnow(),
+    }
+    if predict:
+        # Predict survivability score using ML model
+        fields["survivability_score"], fields["model_version"] = predict_survivability(
+            scoring_input(file_record, fields), with_version=True)
+    return fields
+
+
+def process_batch(db, blob_store, jobs):
+    """Analyze a batch of claimed jobs and write all results back in two bulk writes."""
+    file_ids = [job['file_id'] for job in jobs]
+    records = {f['_id']: f for f in db.files.find({"_id": {"$in": file_ids}})}
+
+    file_ops, job_ops, analyzed = [], [], []
+    for job in jobs:
+        record = records.get(job['file_id'])
+        now = datetime.utcnow()
+        if record is None:
+            job_ops.append(UpdateOne({"_id": job['_id']}, {"$set": {
+                "status": JOB_FAILED, "error": "File record no longer exists", "finished_at": now}}))
+            continue
+        try:
+            fields = analyze_file(db, record, blob_store.path_for_key(record['stored_key']),
+                                  header=job.get('header'), predict=False)
+            analyzed.append((job, record, fields))
+        except Exception as e:
+            print(f"[ERROR] Analysis failed for file {job['file_id']}: {e}")
+            final = job.get('attempts', 1) >= JOB_MAX_ATTEMPTS
+            job_ops.append(UpdateOne({"_id": job['_id']}, {"$set": {
+                "status": JOB_FAILED if final else JOB_QUEUED, "error": str(e), "finished_at": now}}))
+            if final:
+                file_ops.append(UpdateOne({"_id": record['_id']}, {"$set": {"analysis_status": ANALYSIS_FAILED}}))
+
+    # Score the whole batch with one model call
+    scores = predict_survivability_many((scoring_input(record, fields) for _, record, fields in analyzed),
+                                        with_version=True)
+    score_changes = []
+    now = datetime.utcnow()
+    for (job, record, fields), (score, model_version) in zip(analyzed, scores):
+        fields["survivability_score"] = score
+        fields["model_version"] = model_version
+        old_score = record.get('survivability_score')
+        # Guard on the old score so the aggregate delta below matches what was written
+        file_ops.append(UpdateOne({"_id": record['_id'], "survivability_score": old_score}, {"$set": fields}))
+        job_ops.append(UpdateOne({"_id": job['_id']}, {"$set": {"status": JOB_DONE, "finished_at": now},
+                                                       "$unset": {"header": ""}}))
+        score_changes.append((record['vault_id'], record.get('ext'), old_score, score))
+
+    matched = db.files.bulk_write(file_ops, ordered=False).matched_count if file_ops else 0
+    if job_ops:
+        db.jobs.bulk_write(job_ops, ordered=False)
+
+    # One $inc per vault for the whole batch. If a record changed under us (a
+    # concurrent rescore), the deltas are unreliable: rebuild those vaults instead.
+    if matched == len(file_ops):
+        db.record_files_scored(score_changes)
+    else:
+        for vault_id in {change[0] for change in score_changes}:
+            db.rebuild_vault_stats(vault_id)
+
+    return len(jobs)
+
+
+def run_worker(batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL):
+    """Worker process main loop. The Mongo client is created here, after fork."""
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+    db = Database()
+    blob_store = BlobStore(UPLOAD_FOLDER)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"[INFO] Analysis worker {worker_id} started (batch size {batch_size})")
+
+    while not stopping:
+        db.fail_exhausted_jobs()
+        jobs = db.claim_jobs(worker_id=worker_id, limit=batch_size, lease=JOB_LEASE)
+        if not jobs:
+            time.sleep(poll_interval)
+            continue
+        started = time.perf_counter()
+        count = process_batch(db, blob_store, jobs)
+        print(f"[INFO] {worker_id} analyzed {count} file(s) in {time.perf_counter() - started:.2f}s")
+
+    print(f"[INFO] Analysis worker {worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background analysis workers")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get('ANALYSIS_WORKERS', 2)))
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    args = parser.parse_args()
+
+    procs = [
+        multiprocessing.Process(target=run_worker, args=(args.batch_size, args.poll_interval), daemon=False)
+        for _ in range(max(1, args.workers))
+    ]
+    for p in procs:
+        p.start()
+
+    def shutdown(*_):
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    for p in procs:
+        p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+JSON serialization for Domus Memoriae responses
+
+MongoJSONProvider encodes BSON ObjectIds (as hex strings) and datetimes (as
+RFC 822 strings, Flask's default format) while serializing, so routes can
+return Mongo documents directly instead of copying them first. When orjson is
+installed it is used as the backend; the output is the same JSON either way.
+
+Set JSON_BACKEND=stdlib to force the standard library encoder.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any
+
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider, _default
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+_WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _http_date(dt: datetime) -> str:
+    """RFC 822 date, identical to werkzeug.http.http_date but without email.utils overhead."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return (f"{_WEEKDAYS[dt.weekday()]}, {dt.day:02d} {_MONTHS[dt.month - 1]} {dt.year:04d} "
+            f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d} GMT")
+
+
+def _mongo_default(o: Any) -> Any:
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, datetime):
+        return _http_date(o)
+    return _default(o)
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_mongo_default)
+
+    def __init__(self, app, backend: str | None = None):
+        super().__init__(app)
+        backend = (backend or os.environ.get("JSON_BACKEND", "auto")).lower()
+        self.use_orjson = orjson is not None and backend in ("auto", "orjson")
+        if self.use_orjson:
+            self._orjson_options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                self._orjson_options |= orjson.OPT_SORT_KEYS
+
+    @property
+    def backend(self) -> str:
+        return "orjson" if self.use_orjson else "stdlib"
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Compact UTF-8 JSON, without the str round trip when orjson is available."""
+        if self.use_orjson:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options)
+        return json.dumps(
+            obj, default=self.default, ensure_ascii=self.ensure_ascii,
+            sort_keys=self.sort_keys, separators=(",", ":"),
+        ).encode()
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # orjson only produces compact output; fall back for indent/custom separators
+        if self.use_orjson and not kwargs.keys() - {"separators"} \
+                and kwargs.get("separators", (",", ":")) == (",", ":"):
+            return self.dumps_bytes(obj).decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(obj)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
@@ -1,27 +1,157 @@
 """
 Updated Model Training Script for Domus Memoriae
 
-Trains a survivability prediction model using the complete feature set
-that matches app.py's extract_ml_features() function.
+Trains a survivability prediction model on the feature columns defined in
+features.py, the same ones the server scores with (scoring.py).
+
+The pipeline is fitted once; the fitted preprocessor and transformed feature
+matrix are cached on disk (joblib.Memory, MODEL_CACHE_DIR) so repeated runs on
+the same data skip preprocessing. Every phase is timed.
+
+Each trained model is published to the model registry (registry.py) as a new
+version with its metrics and activated, unless --no-activate is given; running
+servers pick it up without a restart. Training also publishes a low-memory
+variant (pruned or distilled forest) when one stays within
+MODEL_COMPACT_MAE_DELTA of the full model's validation MAE; --serve-compact
+activates it instead, and --report-variants measures size, load time, RSS and
+latency for both. Candidates are compared on a reference forest fitted to part
+of the training split and scored on the rest; the production forest is fitted
+on the whole training split and the test split only reports the MAE of the
+models that are published.
+
+Usage:
+    python model.py                 # train, evaluate, save, export and publish
+    python model.py --report-variants
+                                    # ... then measure the published versions
+    python model.py export          # export an existing model.pkl
+    python model.py cv              # parallel k-fold of the current parameters
+    python model.py search          # parallel k-fold grid search over PARAM_GRID
+    python model.py cv --folds 10 --jobs 4 --no-cache
+    python model.py train-chunks training_chunks --estimator mlp
+                                    # out-of-core, from `training_data.py export`
+    python model.py bench           # compare estimator families on data.csv x1/x10/x100
+    python model.py bench --scales 1 10 --estimators random_forest hist_gradient_boosting
 """
 
+import argparse
+import copy
+import json
+import os
 import pickle
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from joblib import Memory
+from sklearn.base import clone
+from sklearn.model_selection import GridSearchCV, KFold, train_test_split
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.impute import SimpleImputer
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import ExtraTreesRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.neural_network import MLPRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 import numpy as np
 
+from features import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, NUMERIC_COLUMNS
+from registry import publish_version
+from training_data import iter_chunks, load_manifest
+
 # Configuration
 CSV_PATH = "data.csv"
 MODEL_PATH = "model.pkl"
+MODEL_ARRAYS_PATH = os.environ.get("MODEL_ARRAYS_PATH", "model_arrays")
 TARGET = "survivability_score"
 TEST_SIZE = 0.2
+# Share of the training split held out to choose the low-memory variant; the
+# production forest is still fitted on the whole training split
+VALIDATION_SIZE = 0.25
 RANDOM_STATE = 42
+CV_FOLDS = 5
+# Rows stored in the registry's canary.json (created by the first publish)
+CANARY_ROWS = 48
+# Fitted preprocessors / transformed matrices (set to "" to disable)
+CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", ".model_cache")
+
+# RandomForest hyperparameters used for training and as the search baseline
+MODEL_PARAMS = {
+    "n_estimators": 300,
+    "max_depth": 15,
+    "min_samples_split": 5,
+    "min_samples_leaf": 2,
+}
+
+# Low-memory variant: every candidate is evaluated on the validation split and
+# the smallest (fewest tree nodes) whose MAE is within COMPACT_MAE_DELTA of the
+# reference forest's is rebuilt from the full model and published next to it. "prune" keeps the full forest's first n trees;
+# "distill" fits a smaller forest to the full forest's predictions.
+COMPACT_MAE_DELTA = float(os.environ.get("MODEL_COMPACT_MAE_DELTA", 0.25))
+COMPACT_CANDIDATES = [
+    {"strategy": "distill", "n_estimators": 20, "max_depth": 8},
+    {"strategy": "distill", "n_estimators": 30, "max_depth": 10},
+    {"strategy": "distill", "n_estimators": 50, "max_depth": 12},
+    {"strategy": "prune", "n_estimators": 25},
+    {"strategy": "prune", "n_estimators": 50},
+    {"strategy": "prune", "n_estimators": 100},
+]
+
+# Estimator families compared by `python model.py bench`, all behind the same
+# create_preprocessing_pipeline; each factory returns an unfitted estimator
+BENCH_ESTIMATORS = {
+    "random_forest": lambda: RandomForestRegressor(**MODEL_PARAMS, random_state=RANDOM_STATE, n_jobs=-1),
+    "extra_trees": lambda: ExtraTreesRegressor(**MODEL_PARAMS, random_state=RANDOM_STATE, n_jobs=-1),
+    "hist_gradient_boosting": lambda: HistGradientBoostingRegressor(max_iter=300, random_state=RANDOM_STATE),
+    "ridge": lambda: Pipeline([("scale", StandardScaler()), ("ridge", Ridge(alpha=1.0))]),
+    "mlp": lambda: Pipeline([("scale", StandardScaler()), ("mlp", MLPRegressor(
+        hidden_layer_sizes=(64, 32), learning_rate_init=1e-2, max_iter=200, early_stopping=True,
+        random_state=RANDOM_STATE))]),
+}
+# Multiples of data.csv benchmarked by default (synthetic rows beyond x1)
+BENCH_SCALES = [1, 10, 100]
+BENCH_REPORT_PATH = "model_bench.json"
+# Single-row predictions timed per estimator
+BENCH_SINGLE_ROWS = 200
+
+# Out-of-core training (`python model.py train-chunks`)
+# hgb: HistGradientBoosting on a uniform sample of at most CHUNK_SAMPLE_ROWS rows
+# mlp: MLPRegressor.partial_fit over every chunk, CHUNK_EPOCHS times
+CHUNK_SAMPLE_ROWS = 1_000_000
+CHUNK_EPOCHS = 3
+
+# Search space for `python model.py search`
+PARAM_GRID = {
+    "model__n_estimators": [100, 300],
+    "model__max_depth": [10, 15, None],
+    "model__min_samples_leaf": [1, 2, 4],
+}
+
+# Seconds spent per phase, printed at the end of each run
+PHASE_TIMINGS = {}
+
+@contextmanager
+def phase(name):
+    """Time a block and record it under ``name``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        PHASE_TIMINGS[name] = PHASE_TIMINGS.get(name, 0.0) + elapsed
+        print(f"  ⏱  {name}: {elapsed:.2f}s")
+
+def print_timings():
+    total = sum(PHASE_TIMINGS.values())
+    print(f"\n{'Phase':<14} {'Seconds':>9} {'Share':>7}")
+    print("-" * 32)
+    for name, secs in PHASE_TIMINGS.items():
+        print(f"{name:<14} {secs:>9.2f} {secs / total * 100 if total else 0:>6.1f}%")
+    print(f"{'total':<14} {total:>9.2f}")
 
 # Columns to drop (not used as features)
 DROP_COLS = {
@@ -42,11 +172,7 @@ def load_and_prepare_data(csv_path):
     if TARGET not in df.columns:
         raise ValueError(f"Target column '{TARGET}' not found in CSV")
     
-    required_features = [
-        'ext', 'file_type', 'format_risk', 'size_bytes', 
-        'metadata_score', 'access_risk_score', 'duplicate_count',
-        'access_count', 'file_age_days', 'mime_mismatch'
-    ]
+    required_features = FEATURE_COLUMNS
     
     missing_features = [f for f in required_features if f not in df.columns]
     if missing_features:
@@ -90,15 +216,21 @@ def create_preprocessing_pipeline(X, feature_cols):
     
     return preprocessor
 
-def train_model(X_train, y_train):
-    """Train Random Forest model"""
+def _fit_transform(preprocessor, X):
+    # Module-level so joblib.Memory can key the cache on (preprocessor, X)
+    X_t = preprocessor.fit_transform(X)
+    return preprocessor, X_t
+
+def fit_preprocessor(preprocessor, X, memory):
+    """Fit the preprocessor and transform X, reusing a cached result for the same data."""
+    return memory.cache(_fit_transform)(preprocessor, X)
+
+def train_model(X_train, y_train, **params):
+    """Train Random Forest model on an already-transformed feature matrix"""
     print("\nTraining Random Forest Regressor...")
     
     model = RandomForestRegressor(
-        n_estimators=300,
-        max_depth=15,
-        min_samples_split=5,
-        min_samples_leaf=2,
+        **{**MODEL_PARAMS, **params},
         random_state=RANDOM_STATE,
         n_jobs=-1,
         verbose=0
@@ -108,9 +240,10 @@ def train_model(X_train, y_train):
     
     return model
 
-def evaluate_model(pipeline, X_test, y_test):
+def evaluate_model(pipeline, X_test, y_test, quiet=False):
     """Evaluate model performance"""
-    print("\nEvaluating model...")
+    if not quiet:
+        print("\nEvaluating model...")
     
     # Make predictions
     y_pred = pipeline.predict(X_test)
@@ -126,6 +259,14 @@ def evaluate_model(pipeline, X_test, y_test):
     within_10 = (errors <= 10).sum() / len(errors) * 100
     within_15 = (errors <= 15).sum() / len(errors) * 100
     
+    metrics = {
+        "mae": float(mae), "rmse": float(rmse), "r2": float(r2),
+        "within_5": float(within_5), "within_10": float(within_10), "within_15": float(within_15),
+        "test_rows": len(y_test),
+    }
+    if quiet:
+        return metrics
+    
     print(f"\n{'='*60}")
     print("MODEL PERFORMANCE METRICS")
     print(f"{'='*60}")
@@ -148,7 +289,7 @@ def evaluate_model(pipeline, X_test, y_test):
         error = actual - predicted
         print(f"{actual:>8.2f} {predicted:>10.2f} {error:>8.2f}")
     
-    return mae, r2
+    return metrics
 
 def save_model(pipeline, model_path, feature_cols):
     """Save trained model to disk"""
@@ -159,25 +300,185 @@ def save_model(pipeline, model_path, feature_cols):
     
     print(f"✅ Model saved successfully")
     print(f"   Features used: {feature_cols}")
-    
-    # Verify the model can be loaded
-    with open(model_path, "rb") as f:
-        loaded_model = pickle.load(f)
-    print(f"✅ Model verified (can be loaded)")
 
-def main():
+def export_compact_model(pipeline, out_dir):
+    """
+    Flatten the fitted pipeline into NumPy arrays for compact_model.CompactForest:
+    imputer fills and one-hot vocabularies go to meta.json, and all trees are
+    concatenated into feature/threshold/children/value arrays (leaves loop to
+    themselves) with one root offset per tree.
+    """
+    from compact_model import COMPACT_MODEL_FORMAT, CompactForest
+
+    preprocessor = pipeline.named_steps["preprocessor"]
+    forest = pipeline.named_steps["model"]
+    transformers = {name: (step, list(cols)) for name, step, cols in preprocessor.transformers_}
+    num_imputer, num_cols = transformers["num"]
+    cat_pipeline, cat_cols = transformers["cat"]
+    cat_imputer = cat_pipeline.named_steps["imputer"]
+    onehot = cat_pipeline.named_steps["onehot"]
+    if onehot.drop is not None or getattr(onehot, "_infrequent_enabled", False):
+        raise ValueError("Compact export supports plain one-hot encoding only")
+    if forest.n_outputs_ != 1:
+        raise ValueError("Compact export supports single-output forests only")
+
+    feature, threshold, children, value, roots = [], [], [], [], []
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, 0.0, tree.threshold))
+        # (right, left) so the predictor can index children by "x <= threshold"
+        children.append(np.column_stack([
+            np.where(is_leaf, nodes, tree.children_right),
+            np.where(is_leaf, nodes, tree.children_left),
+        ]) + offset)
+        value.append(tree.value[:, 0, 0])
+        offset += tree.node_count
+
+    arrays = {
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "children": np.concatenate(children).astype(np.int32),
+        "value": np.concatenate(value).astype(np.float64),
+        "roots": np.asarray(roots, dtype=np.int32),
+    }
+    meta = {
+        "format": COMPACT_MODEL_FORMAT,
+        "numeric": {"columns": num_cols, "fill": [float(v) for v in num_imputer.statistics_]},
+        "categorical": [
+            {"column": col, "fill": str(fill), "categories": [str(c) for c in cats]}
+            for col, fill, cats in zip(cat_cols, cat_imputer.statistics_, onehot.categories_)
+        ],
+        "n_features": len(num_cols) + sum(len(c) for c in onehot.categories_),
+        "n_trees": len(forest.estimators_),
+        "max_depth": max(e.tree_.max_depth for e in forest.estimators_),
+    }
+    CompactForest.save(out_dir, meta, arrays)
+    print(f"✅ Compact model exported to {out_dir}/ "
+          f"({offset:,} nodes, {sum(a.nbytes for a in arrays.values()) / 1e6:.1f} MB)")
+
+def verify_compact_model(pipeline, out_dir, X):
+    """Check the exported arrays reproduce the sklearn pipeline on X."""
+    from compact_model import CompactForest
+
+    compact = CompactForest.load(out_dir)
+    forest = pipeline.named_steps["model"]
+    # sklearn sums tree outputs in thread completion order when n_jobs != 1,
+    # so compare against an in-order (single-threaded) prediction
+    n_jobs = forest.n_jobs
+    forest.n_jobs = 1
+    try:
+        expected = pipeline.predict(X)
+    finally:
+        forest.n_jobs = n_jobs
+    actual = compact.predict(X)
+    identical = int((actual == expected).sum())
+    max_diff = float(np.max(np.abs(actual - expected)))
+    print(f"   Compact vs sklearn on {len(X)} rows: {identical} identical, max |diff| = {max_diff:.3g}")
+    if max_diff > 1e-9:
+        raise ValueError(f"Compact model diverges from the pipeline (max |diff| {max_diff})")
+    return max_diff
+
+def _node_count(forest):
+    return sum(e.tree_.node_count for e in forest.estimators_)
+
+def _compact_candidate(forest, X_train_t, teacher, spec):
+    """One low-memory forest built from the full one, per a COMPACT_CANDIDATES entry."""
+    if spec["strategy"] == "prune":
+        pruned = copy.copy(forest)
+        pruned.estimators_ = forest.estimators_[:spec["n_estimators"]]
+        pruned.n_estimators = len(pruned.estimators_)
+        return pruned
+    # Distill: the student learns the teacher's (smoother) predictions
+    student = RandomForestRegressor(
+        n_estimators=spec["n_estimators"], max_depth=spec["max_depth"],
+        min_samples_leaf=MODEL_PARAMS["min_samples_leaf"], random_state=RANDOM_STATE, n_jobs=-1,
+    )
+    student.fit(X_train_t, teacher)
+    return student
+
+def select_compact_spec(preprocessor, X_train, y_train, memory, mae_delta=COMPACT_MAE_DELTA):
+    """
+    Choose a COMPACT_CANDIDATES entry without touching the production fit: a
+    reference forest is fitted on all but VALIDATION_SIZE of the training
+    split, candidates are built from it and compared on the held-out rest.
+    Returns (spec, validation) for the smallest candidate whose validation MAE
+    is within ``mae_delta`` of the reference forest's, or None if none qualifies.
+    """
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=VALIDATION_SIZE, random_state=RANDOM_STATE
+    )
+    print(f"  Fit samples: {len(X_fit)}, validation samples: {len(X_val)}")
+    preprocessor, X_fit_t = fit_preprocessor(clone(preprocessor), X_fit, memory)
+    forest = train_model(X_fit_t, y_fit)
+    reference = Pipeline([("preprocessor", preprocessor), ("model", forest)])
+    full_mae = evaluate_model(reference, X_val, y_val, quiet=True)["mae"]
+    teacher = forest.predict(X_fit_t)
+    budget = full_mae + mae_delta
+    print(f"\nLow-memory candidates (validation MAE budget {full_mae:.3f} + {mae_delta} = {budget:.3f}):")
+    print(f"  {'Strategy':<9} {'Trees':>5} {'Depth':>5} {'Nodes':>9} {'Val MAE':>7}")
+    accepted = []
+    for spec in COMPACT_CANDIDATES:
+        candidate = Pipeline([("preprocessor", preprocessor),
+                              ("model", _compact_candidate(forest, X_fit_t, teacher, spec))])
+        mae = evaluate_model(candidate, X_val, y_val, quiet=True)["mae"]
+        nodes = _node_count(candidate.named_steps["model"])
+        ok = mae <= budget
+        depth = spec.get("max_depth") or MODEL_PARAMS["max_depth"]
+        print(f"  {spec['strategy']:<9} {spec['n_estimators']:>5} {depth:>5} {nodes:>9,} "
+              f"{mae:>7.3f} {'ok' if ok else 'over budget'}")
+        if ok:
+            accepted.append((nodes, spec, mae))
+    if not accepted:
+        return None
+    nodes, spec, mae = min(accepted, key=lambda a: a[0])
+    print(f"  Selected {spec['strategy']} with {spec['n_estimators']} trees "
+          f"({nodes / _node_count(forest):.0%} of the reference forest's nodes)")
+    return spec, {"validation_mae": mae, "validation_mae_budget": budget}
+
+def build_compact_variant(pipeline, X_train_t, spec):
+    """Build the chosen low-memory variant from the production pipeline."""
+    forest = pipeline.named_steps["model"]
+    teacher = forest.predict(X_train_t) if spec["strategy"] == "distill" else None
+    return Pipeline([("preprocessor", pipeline.named_steps["preprocessor"]),
+                     ("model", _compact_candidate(forest, X_train_t, teacher, spec))])
+
+def _measure(version, engine):
+    # A fresh interpreter per measurement, so RSS is that model's alone
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "registry.py")
+    result = subprocess.run([sys.executable, script, "measure", version, "--engine", engine],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def print_variant_report(variants):
+    """Artifact size, load time, RSS and p50/p99 single-row latency per published variant."""
+    print(f"\n{'Variant':<8} {'Engine':<8} {'MAE':>7} {'Artifact':>10} {'Load':>9} "
+          f"{'RSS':>9} {'p50':>9} {'p99':>9}")
+    print("-" * 76)
+    for label, version, metrics in variants:
+        for engine in ("compact", "sklearn"):
+            m = _measure(version, engine)
+            print(f"{label:<8} {m['engine']:<8} {metrics['mae']:>7.3f} {m['artifact_bytes'] / 1e6:>8.2f}MB "
+                  f"{m['load_ms']:>7.1f}ms {m['rss_mb']:>7.1f}MB {m['p50_us']:>7.0f}us {m['p99_us']:>7.0f}us")
+
+def main(memory, activate=True, compact=True, serve_compact=False, report=False):
     """Main training pipeline"""
     print("="*60)
     print("DOMUS MEMORIAE SURVIVABILITY MODEL TRAINING")
     print("="*60)
     
     # Load data
-    X, y, feature_cols = load_and_prepare_data(CSV_PATH)
+    with phase("load"):
+        X, y, feature_cols = load_and_prepare_data(CSV_PATH)
     
     # Create preprocessing pipeline
     preprocessor = create_preprocessing_pipeline(X, feature_cols)
     
-    # Split data
+    # Split data: the test split is only used to report the published models
     print(f"\nSplitting data (test_size={TEST_SIZE})...")
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
@@ -185,21 +486,75 @@ def main():
     print(f"  Training samples: {len(X_train)}")
     print(f"  Test samples:     {len(X_test)}")
     
-    # Create full pipeline
-    pipeline = Pipeline([
-        ("preprocessor", preprocessor),
-        ("model", train_model(preprocessor.fit_transform(X_train), y_train))
-    ])
-    
-    # Refit the full pipeline on training data
-    print("\nFitting complete pipeline...")
-    pipeline.fit(X_train, y_train)
+    # Choose the low-memory variant on a split of the training rows, before
+    # the production fit, which always sees the whole training split
+    selection = None
+    if compact:
+        with phase("compact-select"):
+            selection = select_compact_spec(preprocessor, X_train, y_train, memory)
+        if selection is None:
+            print(f"⚠️  No low-memory candidate within {COMPACT_MAE_DELTA} MAE of the full model")
+    
+    # Fit the preprocessor once (cached across runs on the same data)
+    with phase("preprocess"):
+        preprocessor, X_train_t = fit_preprocessor(preprocessor, X_train, memory)
+    
+    # Fit the forest once on the transformed matrix; both steps are already
+    # fitted, so the pipeline is assembled without another fit
+    with phase("fit"):
+        pipeline = Pipeline([
+            ("preprocessor", preprocessor),
+            ("model", train_model(X_train_t, y_train))
+        ])
     
     # Evaluate
-    mae, r2 = evaluate_model(pipeline, X_test, y_test)
+    with phase("evaluate"):
+        metrics = evaluate_model(pipeline, X_test, y_test)
     
     # Save model
-    save_model(pipeline, MODEL_PATH, feature_cols)
+    with phase("save"):
+        save_model(pipeline, MODEL_PATH, feature_cols)
+    
+    # Export the compact NumPy form the server loads
+    with phase("export"):
+        export_compact_model(pipeline, MODEL_ARRAYS_PATH)
+        verify_compact_model(pipeline, MODEL_ARRAYS_PATH, X)
+    
+    # The chosen low-memory variant, built from the production forest
+    variant = None
+    if selection is not None:
+        with phase("compact"):
+            spec, validation = selection
+            variant = build_compact_variant(pipeline, X_train_t, spec)
+    
+    # Publish registry versions; running servers hot-reload the activated one
+    with phase("publish"):
+        canary_rows = X.sample(n=min(CANARY_ROWS, len(X)), random_state=RANDOM_STATE).to_dict("records")
+        full_version = publish_version(
+            pipeline, metrics=metrics, arrays_dir=MODEL_ARRAYS_PATH, canary_rows=canary_rows,
+            activate=activate and not (serve_compact and variant),
+            extra={"estimator": "random_forest", "variant": "full", "params": MODEL_PARAMS,
+                   "train_rows": len(X_train)},
+        )
+        published = [("full", full_version, metrics)]
+        if variant is not None:
+            small = variant
+            small_metrics = evaluate_model(small, X_test, y_test, quiet=True)
+            print(f"  Low-memory variant test MAE: {small_metrics['mae']:.3f} (full model: {metrics['mae']:.3f})")
+            with tempfile.TemporaryDirectory() as arrays_dir:
+                export_compact_model(small, arrays_dir)
+                verify_compact_model(small, arrays_dir, X)
+                small_version = publish_version(
+                    small, metrics=small_metrics, arrays_dir=arrays_dir, canary_rows=canary_rows,
+                    activate=activate and serve_compact,
+                    extra={"estimator": "random_forest", "variant": "compact", "parent": full_version,
+                           "compact": spec, **validation, "train_rows": len(X_train)},
+                )
+            published.append(("compact", small_version, small_metrics))
+    
+    if report:
+        with phase("report"):
+            print_variant_report(published)
     
     print("\n" + "="*60)
     print("TRAINING COMPLETE")
@@ -207,12 +562,355 @@ def main():
     print(f"Model ready for deployment!")
     print(f"To use in your app, ensure model.pkl is in the same directory")
     print(f"as app.py (or set MODEL_PATH environment variable)")
+    print_timings()
+    
+    return pipeline, metrics
+
+def cross_validate(memory, folds=CV_FOLDS, n_jobs=-1, search=False):
+    """
+    Parallel k-fold evaluation (search=False: MODEL_PARAMS only; search=True:
+    every PARAM_GRID combination). Folds and candidates run in parallel joblib
+    workers; the pipeline's memory caches each fold's fitted preprocessor, so
+    it is fitted once per fold rather than once per candidate.
+    """
+    print("="*60)
+    print(f"DOMUS MEMORIAE {'HYPERPARAMETER SEARCH' if search else 'CROSS-VALIDATION'} ({folds} folds)")
+    print("="*60)
     
-    return pipeline, mae, r2
+    with phase("load"):
+        X, y, feature_cols = load_and_prepare_data(CSV_PATH)
+    
+    pipeline = Pipeline([
+        ("preprocessor", create_preprocessing_pipeline(X, feature_cols)),
+        # One core per forest: the parallelism is across folds/candidates
+        ("model", RandomForestRegressor(**MODEL_PARAMS, random_state=RANDOM_STATE, n_jobs=1)),
+    ], memory=memory)
+    grid = GridSearchCV(
+        pipeline,
+        PARAM_GRID if search else {},
+        cv=KFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE),
+        scoring="neg_mean_absolute_error",
+        n_jobs=n_jobs,
+        refit=False,
+    )
+    with phase("cross-validate"):
+        grid.fit(X, y)
+    
+    results = grid.cv_results_
+    order = np.argsort(results["rank_test_score"])
+    print(f"\n{'MAE':>8} {'± std':>7} {'fit s':>7}  Parameters")
+    print("-" * 60)
+    for i in order:
+        params = {k.replace("model__", ""): v for k, v in results["params"][i].items()} or MODEL_PARAMS
+        print(f"{-results['mean_test_score'][i]:>8.3f} {results['std_test_score'][i]:>7.3f} "
+              f"{results['mean_fit_time'][i]:>7.2f}  {params}")
+    best = results["params"][order[0]]
+    print(f"\nBest: MAE {-results['mean_test_score'][order[0]]:.3f} with "
+          f"{ {k.replace('model__', ''): v for k, v in best.items()} or MODEL_PARAMS}")
+    print_timings()
+    return grid
+
+def create_chunk_preprocessor(vocab, scale):
+    """
+    Preprocessing for chunked training data. Categorical columns are one-hot
+    encoded from the export manifest's fixed vocabularies, so encoding does not
+    depend on which chunk the encoder was fitted on.
+    """
+    numeric = [("imputer", SimpleImputer(strategy="median"))]
+    if scale:
+        numeric.append(("scaler", StandardScaler()))
+    return ColumnTransformer(
+        transformers=[
+            ("num", Pipeline(numeric), NUMERIC_COLUMNS),
+            ("cat", OneHotEncoder(categories=[vocab[c] for c in CATEGORICAL_COLUMNS],
+                                  handle_unknown="ignore", sparse_output=False), CATEGORICAL_COLUMNS),
+        ],
+        remainder="drop",
+    )
+
+def _chunk_frame(arrays, rows=slice(None)):
+    return pd.DataFrame({c: arrays[c][rows] for c in FEATURE_COLUMNS}, columns=FEATURE_COLUMNS)
+
+def _holdout_mask(index, n_rows):
+    # Deterministic per chunk, so every pass sees the same split
+    return np.random.default_rng(RANDOM_STATE + index).random(n_rows) < TEST_SIZE
+
+def _fit_sampled_hgb(data_dir, manifest, preprocessor, max_rows):
+    """Keep a uniform sample of at most max_rows training rows (smallest random keys), then fit once."""
+    rng = np.random.default_rng(RANDOM_STATE)
+    sample, keys = None, np.empty(0)
+    for index, arrays in iter_chunks(data_dir, manifest):
+        train = ~_holdout_mask(index, len(arrays[manifest["target"]]))
+        chunk = {c: arrays[c][train] for c in FEATURE_COLUMNS + [manifest["target"]]}
+        chunk_keys = rng.random(int(train.sum()))
+        if sample is None:
+            sample, keys = chunk, chunk_keys
+        else:
+            sample = {c: np.concatenate([sample[c], chunk[c]]) for c in sample}
+            keys = np.concatenate([keys, chunk_keys])
+        if len(keys) > max_rows:
+            keep = np.argpartition(keys, max_rows)[:max_rows]
+            sample = {c: v[keep] for c, v in sample.items()}
+            keys = keys[keep]
+    print(f"  Fitting on a {len(keys):,}-row sample")
+    pipeline = Pipeline([
+        ("preprocessor", preprocessor),
+        ("model", HistGradientBoostingRegressor(max_iter=300, random_state=RANDOM_STATE)),
+    ])
+    pipeline.fit(_chunk_frame(sample), sample[manifest["target"]])
+    return pipeline
+
+def _fit_incremental_mlp(data_dir, manifest, preprocessor, epochs):
+    """Stream every chunk through StandardScaler / MLPRegressor partial_fit."""
+    target = manifest["target"]
+    scaler = StandardScaler()
+    imputer = None
+    for index, arrays in iter_chunks(data_dir, manifest):
+        train = ~_holdout_mask(index, len(arrays[target]))
+        frame = _chunk_frame(arrays, train)
+        if imputer is None:
+            # Column layout and imputation medians from the first chunk
+            preprocessor.fit(frame)
+            imputer = preprocessor.named_transformers_["num"].named_steps["imputer"]
+        scaler.partial_fit(imputer.transform(frame[NUMERIC_COLUMNS]))
+    # Install the scaling statistics of the full training data
+    fitted_scaler = preprocessor.named_transformers_["num"].named_steps["scaler"]
+    for attr in ("mean_", "var_", "scale_", "n_samples_seen_"):
+        setattr(fitted_scaler, attr, getattr(scaler, attr))
+
+    model = MLPRegressor(hidden_layer_sizes=(64, 32), learning_rate_init=1e-2, random_state=RANDOM_STATE)
+    for epoch in range(epochs):
+        for index, arrays in iter_chunks(data_dir, manifest):
+            train = ~_holdout_mask(index, len(arrays[target]))
+            model.partial_fit(preprocessor.transform(_chunk_frame(arrays, train)), arrays[target][train])
+        print(f"  Epoch {epoch + 1}/{epochs}: loss {model.loss_:.3f}")
+    return Pipeline([("preprocessor", preprocessor), ("model", model)])
+
+def evaluate_chunks(pipeline, data_dir, manifest):
+    """MAE / RMSE / R² on the held-out rows of every chunk, streamed."""
+    target = manifest["target"]
+    n = abs_err = sq_err = y_sum = y_sq = 0.0
+    for index, arrays in iter_chunks(data_dir, manifest):
+        holdout = _holdout_mask(index, len(arrays[target]))
+        if not holdout.any():
+            continue
+        y = arrays[target][holdout]
+        errors = y - pipeline.predict(_chunk_frame(arrays, holdout))
+        n += len(y)
+        abs_err += np.abs(errors).sum()
+        sq_err += (errors ** 2).sum()
+        y_sum += y.sum()
+        y_sq += (y ** 2).sum()
+    metrics = {
+        "mae": float(abs_err / n),
+        "rmse": float(np.sqrt(sq_err / n)),
+        "r2": float(1 - sq_err / (y_sq - y_sum ** 2 / n)),
+        "test_rows": int(n),
+    }
+    print(f"\n{'='*60}")
+    print(f"HELD-OUT PERFORMANCE ({int(n):,} rows)")
+    print(f"{'='*60}")
+    print(f"Mean Absolute Error (MAE):  {metrics['mae']:.3f}")
+    print(f"Root Mean Squared Error:    {metrics['rmse']:.3f}")
+    print(f"R² Score:                   {metrics['r2']:.4f}")
+    return metrics
+
+def _canary_rows_from_chunks(data_dir, manifest, n=None):
+    """The first ``n`` feature rows of the first chunk, for the registry canary set."""
+    n = n or CANARY_ROWS
+    for _, arrays in iter_chunks(data_dir, manifest):
+        rows = min(n, len(arrays[manifest["target"]]))
+        return [{col: arrays[col][i] for col in FEATURE_COLUMNS} for i in range(rows)]
+    return []
+
+def train_from_chunks(data_dir, estimator="hgb", max_rows=CHUNK_SAMPLE_ROWS, epochs=CHUNK_EPOCHS,
+                      activate=True):
+    """
+    Train from a `training_data.py export` directory with bounded memory:
+    only one chunk (plus the hgb sample) is held at a time.
+    """
+    print("="*60)
+    print(f"DOMUS MEMORIAE OUT-OF-CORE TRAINING ({estimator})")
+    print("="*60)
+    manifest = load_manifest(data_dir)
+    if manifest["feature_columns"] != FEATURE_COLUMNS:
+        raise ValueError("Training data was exported with different feature columns; re-export it")
+    print(f"  {manifest['rows']:,} rows in {len(manifest['chunks'])} chunk(s), exported {manifest['exported_at']}")
+
+    preprocessor = create_chunk_preprocessor(manifest["vocab"], scale=estimator == "mlp")
+    with phase("fit"):
+        if estimator == "mlp":
+            pipeline = _fit_incremental_mlp(data_dir, manifest, preprocessor, epochs)
+        else:
+            pipeline = _fit_sampled_hgb(data_dir, manifest, preprocessor, max_rows)
+    with phase("evaluate"):
+        metrics = evaluate_chunks(pipeline, data_dir, manifest)
+    with phase("save"):
+        save_model(pipeline, MODEL_PATH, FEATURE_COLUMNS)
+        # The compact export only supports the RandomForest; don't let the
+        # server keep serving an export of the previous model
+        if os.path.isdir(MODEL_ARRAYS_PATH):
+            shutil.rmtree(MODEL_ARRAYS_PATH)
+            print(f"   Removed stale compact export {MODEL_ARRAYS_PATH}/")
+    with phase("publish"):
+        publish_version(
+            pipeline, metrics=metrics, activate=activate,
+            canary_rows=_canary_rows_from_chunks(data_dir, manifest),
+            extra={"estimator": estimator, "training_data": {"rows": manifest["rows"],
+                                                             "exported_at": manifest["exported_at"]}},
+        )
+    print(f"\nPeak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    print_timings()
+    return pipeline, metrics
+
+def synthetic_dataset(X, y, scale, seed=RANDOM_STATE):
+    """
+    ``scale`` times as many rows as (X, y): the originals plus bootstrap
+    resamples with numeric features and the target jittered by 5% of their
+    standard deviation, so trees can't simply memorize repeated rows.
+    """
+    if scale == 1:
+        return X, y
+    rng = np.random.default_rng(seed)
+    extra = len(X) * (scale - 1)
+    idx = rng.integers(0, len(X), size=extra)
+    X_new = X.iloc[idx].reset_index(drop=True).copy()
+    y_new = y.iloc[idx].reset_index(drop=True).astype(float).copy()
+    for col in X.columns:
+        if pd.api.types.is_numeric_dtype(X[col]) and X[col].nunique() > 2:
+            noise = rng.normal(0, 0.05 * X[col].std(), size=extra)
+            jittered = X_new[col] + noise
+            X_new[col] = jittered.clip(lower=X[col].min(), upper=X[col].max()).astype(X[col].dtype)
+    y_new = (y_new + rng.normal(0, 0.05 * y.std(), size=extra)).clip(y.min(), y.max())
+    return (pd.concat([X, X_new], ignore_index=True),
+            pd.concat([y.astype(float), y_new], ignore_index=True))
+
+def _bench_estimator(name, preprocessor, X_train_t, y_train, X_test, y_test):
+    model = BENCH_ESTIMATORS[name]()
+    start = time.perf_counter()
+    model.fit(X_train_t, y_train)
+    fit_s = time.perf_counter() - start
+    pipeline = Pipeline([("preprocessor", preprocessor), ("model", model)])
+
+    start = time.perf_counter()
+    y_pred = pipeline.predict(X_test)
+    batch_s = time.perf_counter() - start
+
+    # Per-request cost on the serving path: one-row DataFrame through the pipeline
+    rows = [X_test.iloc[[i]] for i in range(min(BENCH_SINGLE_ROWS, len(X_test)))]
+    timings = []
+    for row in rows:
+        start = time.perf_counter()
+        pipeline.predict(row)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    return {
+        "estimator": name,
+        "fit_s": round(fit_s, 3),
+        "batch_predict_s": round(batch_s, 4),
+        "batch_rows_per_s": round(len(X_test) / batch_s),
+        "single_row_p50_ms": round(timings[len(timings) // 2] * 1000, 3),
+        "single_row_p99_ms": round(timings[int(len(timings) * 0.99)] * 1000, 3),
+        "model_bytes": len(pickle.dumps(pipeline)),
+        "mae": round(float(mean_absolute_error(y_test, y_pred)), 4),
+        "r2": round(float(r2_score(y_test, y_pred)), 4),
+    }
+
+def benchmark_estimators(scales=None, estimators=None, out_path=BENCH_REPORT_PATH):
+    """
+    Train every estimator family on the same split of data.csv (and of its
+    synthetic 10x/100x versions) and write fit time, predict latency, model
+    size and MAE/R² to a JSON report.
+    """
+    import platform
+    import sklearn
+
+    scales = scales or BENCH_SCALES
+    estimators = estimators or list(BENCH_ESTIMATORS)
+    X_base, y_base, feature_cols = load_and_prepare_data(CSV_PATH)
+    results = []
+    for scale in scales:
+        # Split first and scale each side from its own rows, so no jittered
+        # copy of a test row ends up in the training set
+        X_train, X_test, y_train, y_test = train_test_split(
+            X_base, y_base, test_size=TEST_SIZE, random_state=RANDOM_STATE
+        )
+        X_train, y_train = synthetic_dataset(X_train, y_train, scale, seed=RANDOM_STATE)
+        X_test, y_test = synthetic_dataset(X_test, y_test, scale, seed=RANDOM_STATE + 1)
+        dataset = CSV_PATH if scale == 1 else f"{CSV_PATH} x{scale} (synthetic)"
+        # One fitted preprocessor per dataset, shared by every estimator
+        preprocessor = create_preprocessing_pipeline(X_train, feature_cols)
+        start = time.perf_counter()
+        X_train_t = preprocessor.fit_transform(X_train)
+        preprocess_s = time.perf_counter() - start
+        print(f"\n{dataset}: {len(X_train):,} train / {len(X_test):,} test rows")
+        print(f"  {'Estimator':<24} {'Fit':>8} {'Batch/s':>10} {'p50':>8} {'p99':>8} {'Size':>9} {'MAE':>7} {'R²':>7}")
+        for name in estimators:
+            result = _bench_estimator(name, preprocessor, X_train_t, y_train, X_test, y_test)
+            result.update(dataset=dataset, scale=scale, train_rows=len(X_train), test_rows=len(X_test),
+                          preprocess_s=round(preprocess_s, 3))
+            results.append(result)
+            print(f"  {name:<24} {result['fit_s']:>7.2f}s {result['batch_rows_per_s']:>10,} "
+                  f"{result['single_row_p50_ms']:>6.2f}ms {result['single_row_p99_ms']:>6.2f}ms "
+                  f"{result['model_bytes'] / 1e6:>7.2f}MB {result['mae']:>7.3f} {result['r2']:>7.4f}")
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {"python": platform.python_version(), "sklearn": sklearn.__version__,
+                        "numpy": np.__version__, "cpu_count": os.cpu_count()},
+        "model_params": MODEL_PARAMS,
+        "results": results,
+    }
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Benchmark report written to {out_path}")
+    return report
+
+def export_main():
+    """Export an existing model.pkl without retraining: python model.py export"""
+    with open(MODEL_PATH, "rb") as f:
+        pipeline = pickle.load(f)
+    X, _, _ = load_and_prepare_data(CSV_PATH)
+    export_compact_model(pipeline, MODEL_ARRAYS_PATH)
+    verify_compact_model(pipeline, MODEL_ARRAYS_PATH, X)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the survivability model")
+    parser.add_argument("command", nargs="?", default="train",
+                        choices=["train", "export", "cv", "search", "train-chunks", "bench"])
+    parser.add_argument("data_dir", nargs="?", default="training_chunks", help="directory for train-chunks")
+    parser.add_argument("--estimator", choices=["hgb", "mlp"], default="hgb", help="train-chunks estimator")
+    parser.add_argument("--max-rows", type=int, default=CHUNK_SAMPLE_ROWS, help="hgb sample size")
+    parser.add_argument("--epochs", type=int, default=CHUNK_EPOCHS, help="mlp passes over the chunks")
+    parser.add_argument("--folds", type=int, default=CV_FOLDS)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel joblib workers for cv/search")
+    parser.add_argument("--no-cache", action="store_true", help="don't read or write MODEL_CACHE_DIR")
+    parser.add_argument("--no-activate", action="store_true",
+                        help="publish the new registry version without making it ACTIVE")
+    parser.add_argument("--no-compact", action="store_true", help="don't build the low-memory variant")
+    parser.add_argument("--scales", type=int, nargs="+", default=BENCH_SCALES, help="bench dataset multiples")
+    parser.add_argument("--estimators", nargs="+", choices=list(BENCH_ESTIMATORS), help="bench estimators")
+    parser.add_argument("--report", default=BENCH_REPORT_PATH, help="bench JSON report path")
+    parser.add_argument("--serve-compact", action="store_true",
+                        help="activate the low-memory variant (if accepted) instead of the full model")
+    parser.add_argument("--report-variants", action="store_true",
+                        help="measure size, load time, RSS and latency of the published versions")
+    args = parser.parse_args()
+    memory = Memory(None if args.no_cache or not CACHE_DIR else CACHE_DIR, verbose=0)
     try:
-        pipeline, mae, r2 = main()
+        if args.command == "export":
+            export_main()
+        elif args.command == "train-chunks":
+            train_from_chunks(args.data_dir, estimator=args.estimator, max_rows=args.max_rows, epochs=args.epochs,
+                              activate=not args.no_activate)
+        elif args.command == "bench":
+            benchmark_estimators(args.scales, args.estimators, args.report)
+        elif args.command in ("cv", "search"):
+            cross_validate(memory, folds=args.folds, n_jobs=args.jobs, search=args.command == "search")
+        else:
+            pipeline, metrics = main(memory, activate=not args.no_activate, compact=not args.no_compact,
+                                     serve_compact=args.serve_compact, report=args.report_variants)
     except Exception as e:
         print(f"\n❌ Training failed: {e}")
         import traceback
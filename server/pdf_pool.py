@@ -0,0 +1,168 @@
+"""
+PDF metadata extraction for Domus Memoriae
+
+pypdf runs in a small pool of child processes so a huge or malformed PDF
+cannot stall a web or job worker:
+  - every extraction has a timeout (PDF_TIMEOUT_SECONDS); on expiry the pool
+    is killed and rebuilt on the next call
+  - every child may grow its address space by at most PDF_MEMORY_LIMIT_MB
+    beyond what it inherited, so a PDF that tries to allocate more fails
+    with MemoryError in the child
+  - children are recycled after PDF_MAX_TASKS_PER_CHILD extractions
+
+Only the trailer, the Info dictionary and the page tree root's /Count are
+read: the page tree itself is never walked.
+
+Children are forked from the process that uses the pool (a gunicorn or job
+worker), so they start instantly and share its pages copy-on-write. Results
+are cached by SHA-256 by the caller (Database.get_pdf_metadata).
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from typing import Any, Dict, Optional
+
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", 2))
+PDF_TIMEOUT_SECONDS = float(os.environ.get("PDF_TIMEOUT_SECONDS", 10))
+PDF_MEMORY_LIMIT_MB = int(os.environ.get("PDF_MEMORY_LIMIT_MB", 512))  # 0 = no limit
+PDF_MAX_TASKS_PER_CHILD = int(os.environ.get("PDF_MAX_TASKS_PER_CHILD", 100))
+
+
+class PdfExtractionError(Exception):
+    """
+    The extraction did not finish or the PDF could not be parsed. ``transient``
+    is set when the bytes are not to blame (a timeout, which may be collateral
+    from another PDF's, or a pool that could not take the task) and a later
+    attempt may succeed.
+    """
+
+    def __init__(self, message: str, transient: bool = False):
+        super().__init__(message)
+        self.transient = transient
+
+
+def _text(value: Any) -> str:
+    return str(value) if value is not None else ""
+
+
+def read_pdf_metadata(file_path: str) -> Dict[str, Any]:
+    """
+    Read the Info dictionary and the page count of a PDF. Runs in a pool child,
+    but has no dependency on the pool and can be called directly.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    meta = reader.metadata
+    if meta is None:
+        return {}
+    # /Count on the root /Pages node is the total number of leaf pages
+    pages = reader.trailer["/Root"].get_object().get("/Pages")
+    count = pages.get_object().get("/Count") if pages is not None else None
+    return {
+        "author": _text(meta.author),
+        "title": _text(meta.title),
+        "creation_date": str(meta.get("/CreationDate", "")),
+        "description": _text(meta.subject),
+        "page_count": int(count) if isinstance(count, int) and count >= 0 else 0,
+        "creator": _text(meta.creator),
+        "is_encrypted": reader.is_encrypted,
+    }
+
+
+def _init_child(memory_limit_mb: int) -> None:
+    if memory_limit_mb <= 0:
+        return
+    import resource
+
+    try:
+        # The child inherits its parent's address space (model, libraries):
+        # the limit is headroom on top of that
+        with open("/proc/self/statm") as f:
+            inherited = int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError):
+        return
+    limit = inherited + memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+class PdfPool:
+    """
+    Lazily started process pool; safe to share between threads. The pool is
+    per process: a forked process (gunicorn worker) starts its own on first use.
+    """
+
+    def __init__(self, workers: int = PDF_WORKERS, timeout: float = PDF_TIMEOUT_SECONDS,
+                 memory_limit_mb: int = PDF_MEMORY_LIMIT_MB, max_tasks_per_child: int = PDF_MAX_TASKS_PER_CHILD):
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_child = max_tasks_per_child
+        self._pool = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.extracted = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                ctx = multiprocessing.get_context("fork")
+                self._pool = ctx.Pool(self.workers, initializer=_init_child, initargs=(self.memory_limit_mb,),
+                                      maxtasksperchild=self.max_tasks_per_child)
+                self._pid = os.getpid()
+            return self._pool
+
+    def _discard(self, pool) -> None:
+        """Kill a pool with a stuck child. Jobs still running in it time out too."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self.restarts += 1
+        pool.terminate()
+
+    def extract(self, file_path: str) -> Dict[str, Any]:
+        """Metadata of one PDF; raises PdfExtractionError if it fails or times out."""
+        try:
+            pool = self._get_pool()
+            result = pool.apply_async(read_pdf_metadata, (file_path,))
+        except (OSError, ValueError) as e:
+            # Could not start the pool, or another thread just discarded it
+            self.failures += 1
+            raise PdfExtractionError(f"pool unavailable: {e}", transient=True) from e
+        try:
+            metadata = result.get(self.timeout)
+        except multiprocessing.TimeoutError:
+            # Also raised for tasks that were in flight when another timeout killed the pool
+            self.timeouts += 1
+            self._discard(pool)
+            raise PdfExtractionError(f"timed out after {self.timeout:g}s", transient=True)
+        except Exception as e:
+            self.failures += 1
+            raise PdfExtractionError(f"{type(e).__name__}: {e}") from e
+        self.extracted += 1
+        return metadata
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None and self._pid == os.getpid():
+            pool.terminate()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": self._pool is not None and self._pid == os.getpid(),
+            "extracted": self.extracted,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+        }
+
+
+pdf_pool = PdfPool()
@@ -0,0 +1,353 @@
+"""
+Versioned model registry for Domus Memoriae
+
+    model_registry/
+        ACTIVE                  name of the version workers should serve
+        canary.json             feature rows every version is checked against
+        versions/<version>/
+            meta.json           features, metrics, checksums, canary predictions
+            model.pkl           fitted sklearn pipeline
+            model_arrays/       compact export (RandomForest only, optional)
+
+model.py publishes each trained model as a new version and (by default)
+activates it. Each worker's ModelRegistry notices ACTIVE changing, loads the
+new version, verifies its checksums and that it reproduces the canary
+predictions recorded at publish time, and only then swaps it in. A version
+that fails validation is logged and skipped; the worker keeps serving the
+previous one.
+
+Usage:
+    python registry.py list
+    python registry.py activate <version>
+    python registry.py measure <version> --engine compact   # size / load / RSS / latency (JSON)
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from compact_model import CompactForest, rss_mb
+from features import FEATURE_COLUMNS
+
+MODEL_REGISTRY_PATH = os.environ.get('MODEL_REGISTRY_PATH', 'model_registry')
+# Seconds between checks of the ACTIVE pointer in each worker
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', 10))
+ACTIVE_FILE = "ACTIVE"
+CANARY_FILE = "canary.json"
+META_FILE = "meta.json"
+CANARY_TOLERANCE = 1e-6
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _artifact_checksums(version_dir: str) -> Dict[str, str]:
+    checksums = {}
+    for root, _, files in os.walk(version_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, version_dir).replace(os.sep, "/")
+            if rel != META_FILE:
+                checksums[rel] = _sha256(path)
+    return dict(sorted(checksums.items()))
+
+
+def _json_value(value):
+    if hasattr(value, "item"):  # NumPy scalars
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _canary_columns(rows: List[Dict[str, Any]]) -> Dict[str, list]:
+    return {col: [row.get(col) for row in rows] for col in FEATURE_COLUMNS}
+
+
+def predict_columns(model, columns: Dict[str, list]) -> np.ndarray:
+    """Run either engine on a dict of feature columns."""
+    if isinstance(model, CompactForest):
+        return model.predict(columns)
+    import pandas as pd
+    return model.predict(pd.DataFrame(columns, columns=FEATURE_COLUMNS))
+
+
+def load_version_model(version_dir: str, engine: str = "auto"):
+    """The model object for a version: compact arrays when present and allowed, else the pickle."""
+    arrays_dir = os.path.join(version_dir, "model_arrays")
+    if engine in ("auto", "compact") and os.path.isdir(arrays_dir):
+        return CompactForest.load(arrays_dir)
+    with open(os.path.join(version_dir, "model.pkl"), "rb") as f:
+        return pickle.load(f)
+
+
+# ============================================================================
+# Publishing (used by model.py)
+# ============================================================================
+
+def write_canary(registry_dir: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Create canary.json from sample feature rows (plus edge cases) if it doesn't exist yet."""
+    path = os.path.join(registry_dir, CANARY_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    edge_cases = [
+        {col: 0 for col in FEATURE_COLUMNS} | {"ext": "", "file_type": "other", "format_risk": "medium"},
+        {col: 0 for col in FEATURE_COLUMNS} | {"ext": "never-seen", "file_type": "other", "format_risk": "medium",
+                                               "size_bytes": 10 ** 12, "file_age_days": 365 * 50},
+    ]
+    canary = [{col: _json_value(row.get(col)) for col in FEATURE_COLUMNS} for row in rows] + edge_cases
+    os.makedirs(registry_dir, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(canary, f, indent=2)
+    return canary
+
+
+def publish_version(pipeline, *, metrics: Dict[str, Any], canary_rows: List[Dict[str, Any]],
+                    arrays_dir: Optional[str] = None, registry_dir: str = MODEL_REGISTRY_PATH,
+                    activate: bool = True, extra: Optional[Dict[str, Any]] = None) -> str:
+    """Store a fitted pipeline (and optional compact export) as a new version."""
+    canary = write_canary(registry_dir, canary_rows)
+    staging = os.path.join(registry_dir, "versions", f".staging-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    with open(os.path.join(staging, "model.pkl"), "wb") as f:
+        pickle.dump(pipeline, f)
+    if arrays_dir and os.path.isdir(arrays_dir):
+        shutil.copytree(arrays_dir, os.path.join(staging, "model_arrays"))
+
+    checksums = _artifact_checksums(staging)
+    combined = hashlib.sha256("".join(checksums.values()).encode()).hexdigest()
+    version = f"{datetime.utcnow():%Y%m%d-%H%M%S}-{combined[:8]}"
+    meta = {
+        "version": version,
+        "created_at": datetime.utcnow().isoformat(),
+        "feature_columns": FEATURE_COLUMNS,
+        "metrics": metrics,
+        "checksum": combined,
+        "files": checksums,
+        # What this exact artifact predicts for canary.json (validated on load)
+        "canary_predictions": [float(p) for p in predict_columns(pipeline, _canary_columns(canary))],
+        **(extra or {}),
+    }
+    with open(os.path.join(staging, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    target = os.path.join(registry_dir, "versions", version)
+    if os.path.isdir(target):
+        # Same artifact published twice within a second
+        shutil.rmtree(staging)
+    else:
+        os.replace(staging, target)
+        print(f"✅ Published model version {version}")
+    if activate:
+        activate_version(version, registry_dir)
+    return version
+
+
+def activate_version(version: str, registry_dir: str = MODEL_REGISTRY_PATH) -> None:
+    """Point ACTIVE at a version. Atomic: readers see the old or the new name."""
+    if not os.path.isfile(os.path.join(registry_dir, "versions", version, META_FILE)):
+        raise ValueError(f"Unknown model version: {version}")
+    tmp = os.path.join(registry_dir, f".{ACTIVE_FILE}.{os.getpid()}")
+    with open(tmp, "w") as f:
+        f.write(version + "\n")
+    os.replace(tmp, os.path.join(registry_dir, ACTIVE_FILE))
+    print(f"✅ Activated model version {version}")
+
+
+def list_versions(registry_dir: str = MODEL_REGISTRY_PATH) -> List[Dict[str, Any]]:
+    versions_dir = os.path.join(registry_dir, "versions")
+    metas = []
+    for name in sorted(os.listdir(versions_dir)) if os.path.isdir(versions_dir) else []:
+        meta_path = os.path.join(versions_dir, name, META_FILE)
+        if os.path.isfile(meta_path):
+            with open(meta_path) as f:
+                metas.append(json.load(f))
+    return metas
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def measure_version(version: str, engine: str = "auto", registry_dir: str = MODEL_REGISTRY_PATH,
+                    repeats: int = 1000) -> Dict[str, Any]:
+    """
+    Artifact size, load time, RSS and single-row latency of one version with
+    one engine. Run it in a fresh process (``registry.py measure``) so the RSS
+    figures are that model's alone.
+    """
+    version_dir = os.path.join(registry_dir, "versions", version)
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    model = load_version_model(version_dir, engine)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    with open(os.path.join(registry_dir, CANARY_FILE)) as f:
+        row = {col: [value] for col, value in json.load(f)[0].items()}
+    predict_columns(model, row)  # warm up (imports, page faults)
+    loaded_rss = rss_mb()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict_columns(model, row)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    compact = isinstance(model, CompactForest)
+    artifact = os.path.join(version_dir, "model_arrays") if compact else os.path.join(version_dir, "model.pkl")
+    return {
+        "version": version,
+        "engine": "compact" if compact else "sklearn",
+        "artifact_bytes": _dir_bytes(artifact) if compact else os.path.getsize(artifact),
+        "load_ms": round(load_ms, 1),
+        "rss_mb": round(loaded_rss, 1),
+        "model_rss_mb": round(loaded_rss - base_rss, 1),
+        "p50_us": round(timings[len(timings) // 2] * 1e6, 1),
+        "p99_us": round(timings[int(len(timings) * 0.99)] * 1e6, 1),
+    }
+
+
+# ============================================================================
+# Serving
+# ============================================================================
+
+class ModelRegistry:
+    """
+    Per-process view of the registry. ``current()`` returns the (version, model)
+    pair being served; every MODEL_RELOAD_INTERVAL seconds it re-reads ACTIVE
+    and, if it changed, validates and swaps in the new version. The pair is
+    replaced in a single assignment, so concurrent readers never see a model
+    with another version's name.
+    """
+
+    def __init__(self, registry_dir: str = MODEL_REGISTRY_PATH, engine: str = "auto",
+                 reload_interval: float = MODEL_RELOAD_INTERVAL):
+        self.registry_dir = registry_dir
+        self.engine = engine
+        self.reload_interval = reload_interval
+        self._active: Tuple[Optional[str], Any] = (None, None)
+        self._active_meta: Dict[str, Any] = {}
+        self._rejected: set[str] = set()
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.check(force=True)
+
+    def _read_active_name(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.registry_dir, ACTIVE_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current(self) -> Tuple[Optional[str], Any]:
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.check()
+        return self._active
+
+    def check(self, force: bool = False) -> bool:
+        """Load the ACTIVE version if it differs from the one served. True if swapped."""
+        if not self._lock.acquire(blocking=force):
+            return False  # another thread is already checking
+        try:
+            self._checked_at = time.monotonic()
+            name = self._read_active_name()
+            if name is None or name == self._active[0] or name in self._rejected:
+                return False
+            try:
+                model, meta = self._load_and_validate(name)
+            except Exception as e:
+                self._rejected.add(name)
+                print(f"[ERROR] Model version {name} rejected: {e}. Still serving {self._active[0] or 'fallback'}.")
+                return False
+            self._active = (name, model)
+            self._active_meta = meta
+            self.reloads += 1
+            print(f"✅ Serving model version {name} (pid {os.getpid()})")
+            return True
+        finally:
+            self._lock.release()
+
+    def _load_and_validate(self, name: str):
+        version_dir = os.path.join(self.registry_dir, "versions", name)
+        with open(os.path.join(version_dir, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get("feature_columns") != FEATURE_COLUMNS:
+            raise ValueError("feature columns differ from this server's features.py")
+        for rel, expected in meta["files"].items():
+            if _sha256(os.path.join(version_dir, rel)) != expected:
+                raise ValueError(f"checksum mismatch for {rel}")
+
+        model = load_version_model(version_dir, self.engine)
+
+        with open(os.path.join(self.registry_dir, CANARY_FILE)) as f:
+            canary = json.load(f)
+        predictions = np.asarray(predict_columns(model, _canary_columns(canary)), dtype=np.float64)
+        expected = np.asarray(meta["canary_predictions"], dtype=np.float64)
+        if predictions.shape != expected.shape or not np.all(np.isfinite(predictions)):
+            raise ValueError("canary predictions are missing or not finite")
+        worst = float(np.max(np.abs(predictions - expected)))
+        if worst > CANARY_TOLERANCE:
+            raise ValueError(f"canary predictions differ from publish time by up to {worst:.3g}")
+        return model, meta
+
+    def info(self) -> Dict[str, Any]:
+        version, model = self._active
+        return {
+            "version": version,
+            "metrics": self._active_meta.get("metrics"),
+            "reloads": self.reloads,
+            "rejected": sorted(self._rejected),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the model registry")
+    parser.add_argument("--registry", default=MODEL_REGISTRY_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="list published versions")
+    activate = sub.add_parser("activate", help="point ACTIVE at a version (workers reload it)")
+    activate.add_argument("version")
+    measure = sub.add_parser("measure", help="size, load time, RSS and latency of a version, as JSON")
+    measure.add_argument("version")
+    measure.add_argument("--engine", choices=["auto", "compact", "sklearn"], default="auto")
+    args = parser.parse_args()
+
+    if args.command == "activate":
+        activate_version(args.version, args.registry)
+        return
+    if args.command == "measure":
+        print(json.dumps(measure_version(args.version, args.engine, args.registry)))
+        return
+    active = None
+    try:
+        with open(os.path.join(args.registry, ACTIVE_FILE)) as f:
+            active = f.read().strip()
+    except FileNotFoundError:
+        pass
+    for meta in list_versions(args.registry):
+        marker = "*" if meta["version"] == active else " "
+        metrics = ", ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}"
+                            for k, v in (meta.get("metrics") or {}).items())
+        print(f"{marker} {meta['version']}  {meta['created_at']}  {meta.get('variant', '-'):<8} {metrics}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Survivability re-scoring for Domus Memoriae
+
+A file's score is computed once, at analysis time, but several of its inputs
+keep moving (file age, access count, duplicate count). A re-scoring pass walks
+the scored files in _id order, recomputes duplicate counts for each batch with
+one query, scores the batch with predict_survivability_many and writes back
+only the records whose score, duplicate count or model version changed, in one
+bulk_write. Vault aggregates are adjusted with the same deltas.
+
+Progress is checkpointed in Mongo after every batch, so an interrupted pass
+resumes where it stopped, and a lease on the checkpoint keeps two processes
+from running the same pass. Passes are throttled to RESCORE_MAX_RATE files/s.
+
+Usage:
+    python rescore.py                   # run (or resume) one pass
+    python rescore.py --restart         # start over from the first file
+    python rescore.py --vault <id>      # only one vault (own checkpoint)
+
+In the web server, set RESCORE_INTERVAL_HOURS to run passes from a background
+thread (see RescoreScheduler).
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from scoring import predict_survivability_many
+
+RESCORE_CHECKPOINT = "rescore"
+RESCORE_BATCH_SIZE = int(os.environ.get('RESCORE_BATCH_SIZE', 500))
+# Upper bound on files scanned per second (0 = unthrottled)
+RESCORE_MAX_RATE = float(os.environ.get('RESCORE_MAX_RATE', 500))
+# Hours between scheduled passes in the web server (0 = scheduler off)
+RESCORE_INTERVAL_HOURS = float(os.environ.get('RESCORE_INTERVAL_HOURS', 0))
+RESCORE_LEASE = timedelta(minutes=5)
+
+# Everything the model reads, plus what the write-back needs
+RESCORE_PROJECTION = {
+    "vault_id": 1, "sha256": 1, "ext": 1, "mime_claimed": 1, "mime_detected": 1,
+    "metadata_score": 1, "access_risk_score": 1, "duplicate_count": 1,
+    "access_count": 1, "uploaded_at": 1, "size_bytes": 1, "survivability_score": 1,
+    "model_version": 1,
+}
+
+
+def checkpoint_name(vault_id=None):
+    return f"{RESCORE_CHECKPOINT}:{vault_id}" if vault_id else RESCORE_CHECKPOINT
+
+
+def duplicate_counts(db, records):
+    """Earlier copies of each record's bytes in its vault, from one query per batch."""
+    copies = {}
+    cursor = db.files.find(
+        {"vault_id": {"$in": list({r['vault_id'] for r in records})},
+         "sha256": {"$in": list({r['sha256'] for r in records})}},
+        {"vault_id": 1, "sha256": 1},
+    )
+    for doc in cursor:
+        copies.setdefault((doc['vault_id'], doc['sha256']), []).append(doc['_id'])
+    for ids in copies.values():
+        ids.sort()
+    return {r['_id']: bisect_left(copies.get((r['vault_id'], r['sha256']), []), r['_id']) for r in records}
+
+
+def rescore_batch(db, records, now=None):
+    """
+    Re-score one batch of file records. Returns the number of records written.
+    """
+    now = now or datetime.utcnow()
+    dup_counts = duplicate_counts(db, records)
+    docs = [dict(r, duplicate_count=dup_counts[r['_id']]) for r in records]
+    scores = predict_survivability_many(docs, now=now, with_version=True)
+
+    ops, score_changes = [], []
+    for record, doc, (score, model_version) in zip(records, docs, scores):
+        old_score = record['survivability_score']
+        if (score == old_score and doc['duplicate_count'] == record.get('duplicate_count')
+                and model_version == record.get('model_version')):
+            continue
+        # Guard on the old score so the aggregate delta below matches what was written
+        ops.append(UpdateOne(
+            {"_id": record['_id'], "survivability_score": old_score},
+            {"$set": {"survivability_score": score, "duplicate_count": doc['duplicate_count'],
+                      "model_version": model_version, "rescored_at": now}},
+        ))
+        if score != old_score:
+            score_changes.append((record['vault_id'], record.get('ext'), old_score, score))
+    if not ops:
+        return 0
+
+    matched = db.files.bulk_write(ops, ordered=False).matched_count
+    if matched == len(ops):
+        db.record_files_scored(score_changes)
+    else:
+        # A record was re-analyzed under us: recount those vaults instead
+        for vault_id in {change[0] for change in score_changes}:
+            db.rebuild_vault_stats(vault_id)
+    return matched
+
+
+def run_pass(db, *, owner=None, vault_id=None, batch_size=RESCORE_BATCH_SIZE,
+             max_rate=RESCORE_MAX_RATE, restart=False, stop=None):
+    """
+    Run (or resume) one re-scoring pass. Returns a summary dict, or None if
+    another process holds the lease. ``stop`` is an optional threading.Event.
+    """
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    name = checkpoint_name(vault_id)
+    checkpoint = db.claim_checkpoint(name, owner=owner, lease=RESCORE_LEASE)
+    if checkpoint is None:
+        return None
+
+    try:
+        if restart or checkpoint.get("last_id") is None:
+            last_id, scanned, changed = None, 0, 0
+            pass_started_at = datetime.utcnow()
+        else:
+            last_id = checkpoint["last_id"]
+            scanned, changed = checkpoint.get("scanned", 0), checkpoint.get("changed", 0)
+            pass_started_at = checkpoint.get("pass_started_at") or datetime.utcnow()
+            print(f"[INFO] Resuming re-scoring pass after {last_id} ({scanned} files scanned)")
+
+        started = time.perf_counter()
+        complete = False
+        while not (stop and stop.is_set()):
+            batch_started = time.perf_counter()
+            query = {"survivability_score": {"$ne": None}}
+            if vault_id:
+                query["vault_id"] = ObjectId(vault_id)
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            records = list(db.files.find(query, RESCORE_PROJECTION).sort("_id", 1).limit(batch_size))
+            if not records:
+                complete = True
+                break
+
+            changed += rescore_batch(db, records)
+            scanned += len(records)
+            last_id = records[-1]['_id']
+            if not db.save_checkpoint(name, owner=owner, lease=RESCORE_LEASE, last_id=last_id,
+                                      scanned=scanned, changed=changed, pass_started_at=pass_started_at):
+                print("[WARNING] Re-scoring lease lost; stopping")
+                break
+
+            # Throttle: spread batches out so a pass never saturates Mongo
+            if max_rate:
+                delay = len(records) / max_rate - (time.perf_counter() - batch_started)
+                if delay > 0:
+                    if stop:
+                        stop.wait(delay)
+                    else:
+                        time.sleep(delay)
+
+        summary = {
+            "scanned": scanned,
+            "changed": changed,
+            "seconds": round(time.perf_counter() - started, 2),
+            "complete": complete,
+        }
+        if complete:
+            db.save_checkpoint(name, owner=owner, lease=RESCORE_LEASE, last_id=None, scanned=0, changed=0,
+                               pass_started_at=None, last_finished_at=datetime.utcnow(), last_summary=summary)
+            print(f"[INFO] Re-scoring pass complete: {changed} of {scanned} files updated "
+                  f"in {summary['seconds']}s")
+        return summary
+    finally:
+        db.release_checkpoint(name, owner=owner)
+
+
+class RescoreScheduler:
+    """
+    Runs a re-scoring pass from a daemon thread whenever the last completed pass
+    is older than ``interval`` (or one was interrupted). Every gunicorn worker
+    may start one; the checkpoint lease lets only one of them run at a time.
+    """
+
+    POLL_SECONDS = 60
+
+    def __init__(self, db, interval_hours=RESCORE_INTERVAL_HOURS):
+        self.db = db
+        self.interval = timedelta(hours=interval_hours)
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+
+    def ensure_started(self):
+        # Threads don't survive fork: start lazily in each worker process
+        if not self.interval or (self._thread is not None and self._pid == os.getpid()):
+            return
+        self._pid = os.getpid()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rescore-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _due(self):
+        checkpoint = self.db.get_checkpoint(RESCORE_CHECKPOINT) or {}
+        if checkpoint.get("last_id") is not None:
+            return True
+        finished = checkpoint.get("last_finished_at")
+        return finished is None or datetime.utcnow() - finished >= self.interval
+
+    def _run(self):
+        while not self._stop.wait(self.POLL_SECONDS):
+            try:
+                if self._due():
+                    run_pass(self.db, stop=self._stop)
+            except Exception as e:
+                print(f"[ERROR] Scheduled re-scoring failed: {e}")
+
+
+def main():
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Re-score stale survivability scores")
+    parser.add_argument("--vault", help="only re-score one vault")
+    parser.add_argument("--batch-size", type=int, default=RESCORE_BATCH_SIZE)
+    parser.add_argument("--max-rate", type=float, default=RESCORE_MAX_RATE,
+                        help="files per second (0 = unthrottled)")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    args = parser.parse_args()
+
+    summary = run_pass(Database(), vault_id=args.vault, batch_size=args.batch_size,
+                       max_rate=args.max_rate, restart=args.restart)
+    if summary is None:
+        print("[INFO] Another process is running this re-scoring pass")
+    else:
+        print(summary)
+
+
+if __name__ == "__main__":
+    main()
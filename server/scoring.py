@@ -0,0 +1,301 @@
+"""
+Survivability scoring for Domus Memoriae
+
+Loads the trained model (see model.py) and turns file records into
+survivability predictions. Shared by the web app and the analysis workers.
+
+When a model registry exists (see registry.py) the active version is served
+and hot-reloaded when it changes; otherwise MODEL_ARRAYS_PATH / MODEL_PATH are
+loaded once at import. Every score comes with the name of the model that
+produced it (``with_version=True``) so callers can store it next to the score.
+
+Model predictions go through PredictionCache: records whose features differ
+only by a few percent in size or a few days in age share a quantized key, so
+rescoring and bulk imports run inference once per distinct key.
+"""
+
+import os
+import pickle
+import threading
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+from dotenv import load_dotenv
+
+from cache import TTLCache
+from compact_model import CompactForest, rss_mb
+from features import FEATURE_COLUMNS, NUMERIC_COLUMNS, build_feature_row, feature_columns_many
+from registry import MODEL_REGISTRY_PATH, ModelRegistry, predict_columns
+from startup import startup_report
+
+load_dotenv()
+
+# ============================================================================
+# Load ML Model for Survivability Prediction
+# ============================================================================
+
+ML_MODEL = None
+MODEL_PATH = os.environ.get('MODEL_PATH', 'model.pkl')
+# Exported by `python model.py` (see compact_model.py); no sklearn/pandas needed
+MODEL_ARRAYS_PATH = os.environ.get('MODEL_ARRAYS_PATH', 'model_arrays')
+# 'auto' prefers the compact arrays and falls back to the pickled pipeline
+MODEL_ENGINE = os.environ.get('MODEL_ENGINE', 'auto').lower()
+
+# Rows per model.predict call in predict_survivability_many
+SCORING_CHUNK_SIZE = int(os.environ.get('SCORING_CHUNK_SIZE', 4096))
+
+# Version names stored with scores that didn't come from a registry version
+LEGACY_MODEL_VERSION = 'legacy'
+FALLBACK_MODEL_VERSION = 'fallback'
+
+MODEL_REGISTRY = None
+with startup_report.phase("model"):
+    if os.path.isdir(MODEL_REGISTRY_PATH):
+        MODEL_REGISTRY = ModelRegistry(MODEL_REGISTRY_PATH, engine=MODEL_ENGINE)
+
+    try:
+        if MODEL_REGISTRY is not None and MODEL_REGISTRY.current()[0] is not None:
+            pass  # the registry's active version is served; no legacy model needed
+        elif MODEL_ENGINE in ('auto', 'compact') and os.path.isdir(MODEL_ARRAYS_PATH):
+            ML_MODEL = CompactForest.load(MODEL_ARRAYS_PATH)
+            print(f"✅ Compact ML model memory-mapped from {MODEL_ARRAYS_PATH}")
+        elif MODEL_ENGINE in ('auto', 'sklearn') and os.path.exists(MODEL_PATH):
+            with open(MODEL_PATH, 'rb') as f:
+                ML_MODEL = pickle.load(f)
+            print(f"✅ ML model loaded from {MODEL_PATH}")
+        else:
+            print(f"⚠️  ML model not found at {MODEL_PATH}. Survivability scores will use fallback calculation.")
+    except Exception as e:
+        print(f"⚠️  Failed to load ML model: {e}. Using fallback calculation.")
+
+# ============================================================================
+# Prediction Cache
+# ============================================================================
+
+# Entries per process (0 disables the cache and feature quantization)
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 50000))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 6 * 3600))
+# Relative width of size_bytes buckets (0.05: sizes within ~5% share one); 0 = exact
+PREDICTION_SIZE_BUCKET = float(os.environ.get('PREDICTION_SIZE_BUCKET', 0.05))
+# Width of file_age_days buckets in days; 0 = exact
+PREDICTION_AGE_BUCKET_DAYS = int(os.environ.get('PREDICTION_AGE_BUCKET_DAYS', 7))
+
+def quantize_columns(columns, size_bucket=PREDICTION_SIZE_BUCKET, age_bucket=PREDICTION_AGE_BUCKET_DAYS):
+    """
+    Snap size_bytes (log-scale buckets) and file_age_days to the centre of
+    their bucket. Only used to build cache keys: records in the same buckets
+    share a key, the model always sees the exact features.
+    """
+    columns = dict(columns)
+    if size_bucket:
+        step = np.log1p(size_bucket)
+        size = np.maximum(np.asarray(columns['size_bytes'], dtype=np.float64), 0)
+        columns['size_bytes'] = np.round(np.expm1(np.round(np.log1p(size) / step) * step))
+    if age_bucket:
+        age = np.asarray(columns['file_age_days'], dtype=np.float64)
+        columns['file_age_days'] = (age // age_bucket) * age_bucket + age_bucket // 2
+    return columns
+
+def _row_keys(columns):
+    """One hashable tuple per row, in FEATURE_COLUMNS order (NaN -> None so keys compare equal)."""
+    values = []
+    for col in FEATURE_COLUMNS:
+        column = np.asarray(columns[col])
+        if col in NUMERIC_COLUMNS:
+            column = column.astype(np.float64)
+            if np.isnan(column).any():
+                column = np.where(np.isnan(column), None, column)
+        values.append(column.tolist())
+    return list(zip(*values))
+
+class PredictionCache:
+    """
+    LRU cache of final (clipped, rounded) scores keyed on (model version,
+    quantized feature row). Only rows whose key is missing reach the model,
+    once per distinct key: the first such row is scored on its exact features
+    and the other rows with that key reuse its score. The entries of earlier
+    versions are dropped as soon as a new version is scored with.
+    """
+
+    def __init__(self, maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL,
+                 size_bucket=PREDICTION_SIZE_BUCKET, age_bucket=PREDICTION_AGE_BUCKET_DAYS):
+        self.cache = TTLCache(maxsize, ttl, name="predictions")
+        self.size_bucket = size_bucket
+        self.age_bucket = age_bucket
+        self.version = None
+        self.rows = 0
+        self.inferred = 0
+        self._lock = threading.Lock()
+
+    def _use_version(self, version):
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    self.cache.clear()
+                    self.version = version
+
+    def predict(self, model, version, columns):
+        """Scores for a dict of feature columns, in row order."""
+        self._use_version(version)
+        keys = [(version, row) for row in _row_keys(quantize_columns(columns, self.size_bucket, self.age_bucket))]
+        scores = [self.cache.get(key) for key in keys]
+        missing = {}
+        for i, (key, score) in enumerate(zip(keys, scores)):
+            if score is None:
+                missing.setdefault(key, []).append(i)
+        if missing:
+            first = [rows[0] for rows in missing.values()]
+            subset = {col: np.asarray(columns[col])[first] for col in FEATURE_COLUMNS}
+            predictions = np.round(np.clip(predict_columns(model, subset), 0, 100), 1).tolist()
+            for (key, rows), score in zip(missing.items(), predictions):
+                self.cache.set(key, score)
+                for i in rows:
+                    scores[i] = score
+        self.rows += len(keys)
+        self.inferred += len(missing)
+        return scores
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats.update(
+            version=self.version,
+            size_bucket=self.size_bucket,
+            age_bucket_days=self.age_bucket,
+            rows_scored=self.rows,
+            rows_inferred=self.inferred,
+            inference_skipped=round(1 - self.inferred / self.rows, 4) if self.rows else None,
+        )
+        return stats
+
+PREDICTION_CACHE = PredictionCache() if PREDICTION_CACHE_SIZE > 0 else None
+
+def _predict_scores(model, version, columns):
+    """Clipped, rounded scores for a dict of feature columns, through the cache when enabled."""
+    if PREDICTION_CACHE is not None:
+        return PREDICTION_CACHE.predict(model, version, columns)
+    return np.round(np.clip(predict_columns(model, columns), 0, 100), 1).tolist()
+
+# ============================================================================
+# Feature Extraction & Prediction
+# ============================================================================
+
+def current_model():
+    """
+    The (version, model) pair to score with. Take it once per call and use
+    that model throughout, so a hot reload can't split one batch between two
+    versions.
+    """
+    if MODEL_REGISTRY is not None:
+        active = MODEL_REGISTRY.current()
+        if active[0] is not None:
+            return active
+    if ML_MODEL is not None:
+        return LEGACY_MODEL_VERSION, ML_MODEL
+    return FALLBACK_MODEL_VERSION, None
+
+def warm_up():
+    """
+    Score one record with the current model, bypassing the prediction cache,
+    so the engine's imports (pandas/sklearn for a pickled pipeline) and model
+    pages are loaded before the first request.
+    """
+    version, model = current_model()
+    if model is not None:
+        predict_columns(model, {k: [v] for k, v in build_feature_row({}).items()})
+
+def model_info():
+    """Which scoring engine and model version this process uses, with its footprint."""
+    version, model = current_model()
+    if isinstance(model, CompactForest):
+        info = model.info()
+    elif model is not None:
+        info = {"engine": "sklearn", "path": MODEL_PATH if version == LEGACY_MODEL_VERSION else MODEL_REGISTRY_PATH}
+    else:
+        info = {"engine": "fallback"}
+    info["version"] = version
+    if MODEL_REGISTRY is not None:
+        info["registry"] = MODEL_REGISTRY.info()
+    if PREDICTION_CACHE is not None:
+        info["prediction_cache"] = PREDICTION_CACHE.stats()
+    info["rss_mb"] = round(rss_mb(), 1)
+    return info
+
+def predict_survivability(file_data, with_version=False):
+    """
+    Predict survivability score (0-100) for a file.
+    Higher score = better chance of long-term survival.
+    Uses ML model if available, otherwise uses rule-based fallback.
+    With ``with_version`` returns (score, model_version).
+    """
+    version, model = current_model()
+    if model is not None:
+        try:
+            # Extract features
+            features = {k: [v] for k, v in build_feature_row(file_data).items()}
+            
+            # Predict using the model (score is clipped to 0-100)
+            score = _predict_scores(model, version, features)[0]
+            
+            return (score, version) if with_version else score
+        except Exception as e:
+            print(f"[WARNING] ML prediction failed: {e}. Using fallback.")
+    
+    # Fallback: Rule-based scoring (inverse of access risk)
+    access_risk = file_data.get('access_risk_score', 50)
+    metadata_score = file_data.get('metadata_score', 0)
+    
+    # Start with inverse of access risk
+    base_score = 100 - access_risk
+    
+    # Bonus for good metadata
+    metadata_bonus = metadata_score * 0.2  # Up to +20 points
+    
+    # Bonus for duplicates (redundancy helps survival)
+    duplicate_bonus = min(file_data.get('duplicate_count', 0) * 5, 15)
+    
+    final_score = base_score + metadata_bonus + duplicate_bonus
+    score = round(max(0, min(100, final_score)), 1)
+    return (score, FALLBACK_MODEL_VERSION) if with_version else score
+
+# ============================================================================
+# Batch Prediction
+# ============================================================================
+
+def fallback_survivability_many(file_docs):
+    """Vectorized rule-based fallback, same formula as predict_survivability."""
+    access_risk = np.array([d.get('access_risk_score', 50) for d in file_docs], dtype=np.float64)
+    metadata_score = np.array([d.get('metadata_score', 0) for d in file_docs], dtype=np.float64)
+    duplicates = np.array([d.get('duplicate_count', 0) for d in file_docs], dtype=np.float64)
+    scores = 100 - access_risk + metadata_score * 0.2 + np.minimum(duplicates * 5, 15)
+    return np.clip(scores, 0, 100)
+
+def predict_survivability_many(file_docs, chunk_size=None, now=None, with_version=False):
+    """
+    Predict survivability scores for many file records at once.
+    Accepts any iterable of records; features are encoded per chunk of
+    ``chunk_size`` rows and scored with a single model.predict call.
+    Returns a list of scores (0-100, one decimal) in input order; with
+    ``with_version`` a list of (score, model_version) pairs, since a chunk
+    that falls back to the rules is not scored by the model.
+    """
+    chunk_size = chunk_size or SCORING_CHUNK_SIZE
+    now = now or datetime.utcnow()
+    version, model = current_model()
+    iterator = iter(file_docs)
+    scores, versions = [], []
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+        if model is not None:
+            try:
+                scores.extend(_predict_scores(model, version, feature_columns_many(chunk, now)))
+                versions.extend([version] * len(chunk))
+                continue
+            except Exception as e:
+                print(f"[WARNING] Batch ML prediction failed: {e}. Using fallback.")
+        # The per-row fallback rounds Python floats, so do the same here
+        scores.extend(round(x, 1) for x in fallback_survivability_many(chunk).tolist())
+        versions.extend([FALLBACK_MODEL_VERSION] * len(chunk))
+    return list(zip(scores, versions)) if with_version else scores
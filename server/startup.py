@@ -0,0 +1,108 @@
+"""
+Startup timing for Domus Memoriae
+
+Records how long each startup phase of the web server takes (imports, model
+load, Mongo connection, warm-up) and, per gunicorn worker, when it was forked
+and when it served its first request. The numbers are printed when the server
+is ready and returned under "startup" by GET /api/metrics, so cold-start and
+scale-out latency can be compared between configurations (see
+bench_startup.py).
+
+Kept free of third-party imports so it can be imported first.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+HEAVY_MODULES = ("numpy", "pandas", "sklearn", "magic", "pypdf", "pymongo")
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process was started by the OS (Linux only)."""
+    try:
+        with open(f"/proc/{os.getpid()}/stat") as f:
+            # Field 22 (starttime) in clock ticks since boot; comm may contain spaces
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+class StartupReport:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Time the interpreter spent before this module was imported
+        self.boot_seconds = process_age()
+        self.phases: Dict[str, float] = {}
+        self._last_mark = self.started
+        self._nested = 0.0
+        self.ready_seconds: Optional[float] = None
+        self.preloaded = False
+        self.pid = os.getpid()
+        self.forked_at: Optional[float] = None
+        self.first_request_seconds: Optional[float] = None
+
+    def mark(self, name: str) -> None:
+        """Record the time since the previous mark (minus nested phases) as ``name``."""
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + (now - self._last_mark - self._nested)
+        self._last_mark = now
+        self._nested = 0.0
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block that runs between two marks; it is reported on its own."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            self._nested += elapsed
+
+    def ready(self) -> None:
+        self.ready_seconds = time.perf_counter() - self.started
+
+    def forked(self) -> None:
+        """Call in a worker right after fork (gunicorn post_fork)."""
+        self.pid = os.getpid()
+        self.forked_at = time.perf_counter()
+        self.first_request_seconds = None
+
+    def request_started(self) -> None:
+        if self.first_request_seconds is None:
+            self.first_request_seconds = time.perf_counter() - (self.forked_at or self.started)
+
+    def info(self) -> Dict[str, Any]:
+        from compact_model import rss_mb
+
+        return {
+            "pid": os.getpid(),
+            "preloaded": self.preloaded,
+            "boot_seconds": round(self.boot_seconds, 3) if self.boot_seconds is not None else None,
+            "phases": {name: round(secs, 3) for name, secs in self.phases.items()},
+            "ready_seconds": round(self.ready_seconds, 3) if self.ready_seconds is not None else None,
+            "forked": self.forked_at is not None and self.pid == os.getpid(),
+            "first_request_seconds": (round(self.first_request_seconds, 3)
+                                      if self.first_request_seconds is not None else None),
+            "modules": {name: name in sys.modules for name in HEAVY_MODULES},
+            "rss_mb": round(rss_mb(), 1),
+        }
+
+    def print_report(self) -> None:
+        info = self.info()
+        phases = ", ".join(f"{name} {secs:.2f}s" for name, secs in info["phases"].items())
+        loaded = ", ".join(name for name, seen in info["modules"].items() if seen)
+        boot = f"{info['boot_seconds']:.2f}s" if info["boot_seconds"] is not None else "?"
+        print(f"[INFO] Startup (pid {info['pid']}): process age at import {boot}; "
+              f"{phases}; ready after {info['ready_seconds']}s, RSS {info['rss_mb']} MB; loaded: {loaded}")
+
+
+startup_report = StartupReport()
@@ -0,0 +1,411 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import fcntl
+import hashlib
+import os
+import struct
+import uuid
+from typing import IO, Any, Optional
+
+from flask import Request
+from werkzeug.formparser import FormDataParser, MultiPartParser
+
+# Large buffers keep the number of syscalls (and Python-level loop iterations)
+# low on 100MB+ uploads. 1 MiB is a good default for local disks and volumes.
+INGEST_BUFFER_SIZE = int(os.environ.get("INGEST_BUFFER_SIZE", 1024 * 1024))
+
+# Leading bytes kept in memory for MIME sniffing (libmagic only needs the header);
+# also the most any detection reads
+MIME_SNIFF_BYTES = int(os.environ.get("MIME_SNIFF_BYTES", 64 * 1024))
+
+
+class IngestStream:
+    """
+    Writable/readable file object used as the upload target for multipart parsing.
+
+    Bytes are written once, straight into a ``.part`` file next to their final
+    location, while the SHA-256, the byte count and the leading header bytes are
+    computed in the same pass. ``commit()`` moves the part file into place with
+    an atomic rename, so no second read of the stored file is ever needed.
+    """
+
+    def __init__(self, directory: str, buffer_size: int = INGEST_BUFFER_SIZE, sniff_bytes: int = MIME_SNIFF_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.part_path = os.path.join(directory, f"{uuid.uuid4().hex}.part")
+        self._fh = open(self.part_path, "w+b", buffering=buffer_size)
+        self._sha256 = hashlib.sha256()
+        self._sniff_bytes = sniff_bytes
+        self._header = bytearray()
+        self.size = 0
+        self.committed_path: Optional[str] = None
+
+    # --- writer side (called by the multipart parser) ---
+    def write(self, data: bytes) -> int:
+        self._fh.write(data)
+        self._sha256.update(data)
+        self.size += len(data)
+        if len(self._header) < self._sniff_bytes:
+            self._header += data[: self._sniff_bytes - len(self._header)]
+        return len(data)
+
+    # --- reader side (FileStorage expects a seekable, readable stream) ---
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._fh.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._fh.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        return self._fh.read(size)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self._fh.readline(size)
+
+    def flush(self) -> None:
+        self._fh.flush()
+
+    @property
+    def closed(self) -> bool:
+        return self._fh.closed
+
+    @property
+    def header(self) -> bytes:
+        return bytes(self._header)
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
+    def commit(self, dest_path: str) -> str:
+        """Atomically move the written bytes to ``dest_path`` (same filesystem)."""
+        self._fh.close()
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        os.replace(self.part_path, dest_path)
+        self.committed_path = dest_path
+        return dest_path
+
+    def discard(self) -> None:
+        """Drop the part file if it was never committed."""
+        if not self._fh.closed:
+            self._fh.close()
+        if self.committed_path is None:
+            try:
+                os.remove(self.part_path)
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        self.discard()
+
+    def __enter__(self) -> "IngestStream":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def ingest_stream(src: IO[bytes], directory: str, buffer_size: int = INGEST_BUFFER_SIZE) -> IngestStream:
+    """Copy ``src`` into a new part file under ``directory`` in a single hashed pass."""
+    target = IngestStream(directory, buffer_size=buffer_size)
+    try:
+        for block in iter(lambda: src.read(buffer_size), b""):
+            target.write(block)
+        target.flush()
+    except Exception:
+        target.discard()
+        raise
+    return target
+
+
+class _IngestFormDataParser(FormDataParser):
+    """FormDataParser that reads the request body with ``INGEST_BUFFER_SIZE`` chunks."""
+
+    def _parse_multipart(self, stream, mimetype, content_length, options):
+        parser = MultiPartParser(
+            stream_factory=self.stream_factory,
+            max_form_memory_size=self.max_form_memory_size,
+            max_form_parts=self.max_form_parts,
+            cls=self.cls,
+            buffer_size=INGEST_BUFFER_SIZE,
+        )
+        boundary = options.get("boundary", "").encode("ascii")
+        if not boundary:
+            raise ValueError("Missing boundary")
+        form, files = parser.parse(stream, boundary, content_length)
+        return stream, form, files
+
+
+class IngestRequest(Request):
+    """
+    Flask request class that streams uploaded files into ``ingest_dir`` instead of
+    Werkzeug's spooled temp files. Uncommitted part files are removed when the
+    request is closed.
+    """
+
+    ingest_dir: str = os.path.join(os.environ.get("UPLOAD_FOLDER", "/tmp/domus_uploads"), ".incoming")
+    form_data_parser_class = _IngestFormDataParser
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return IngestStream(self.ingest_dir)
+
+
+# ---------------------------------------------------------------------------
+# Content-addressed blob store
+# ---------------------------------------------------------------------------
+
+BLOB_KEY_PREFIX = "blobs/"
+
+
+def blob_key(sha256: str) -> str:
+    """stored_key for a content-addressed blob: blobs/<first 2 hex>/<sha256>."""
+    return f"{BLOB_KEY_PREFIX}{sha256[:2]}/{sha256}"
+
+
+def is_blob_key(stored_key: Optional[str]) -> bool:
+    return bool(stored_key) and stored_key.startswith(BLOB_KEY_PREFIX)
+
+
+class BlobStore:
+    """
+    Stores each distinct upload once under ``root/blobs/`` keyed by its SHA-256.
+
+    Reference counts live in Mongo (``Database.acquire_blob`` / ``release_blobs``);
+    this class only owns the bytes on disk. Callers take their reference *before*
+    ``put`` / ``adopt``: an existing blob is only reused while a reference is held,
+    so the blob GC (blob_gc.py) cannot unlink it between the existence check and
+    the file record insert. Legacy per-vault keys
+    (``<vault_id>/<uuid>.<ext>``) still resolve relative to ``root``.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path_for_key(self, stored_key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, stored_key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"stored_key escapes storage root: {stored_key}")
+        return path
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path_for_key(blob_key(sha256)))
+
+    def put(self, ingest: IngestStream) -> tuple[str, bool]:
+        """
+        Store the ingested bytes unless an identical blob already exists.
+        Returns ``(stored_key, created)``; duplicates are dropped without a second write.
+        The caller must already hold a reference to ``ingest.hexdigest()``.
+        """
+        sha256 = ingest.hexdigest()
+        key = blob_key(sha256)
+        path = self.path_for_key(key)
+        if os.path.exists(path):
+            ingest.discard()
+            return key, False
+        ingest.commit(path)
+        return key, True
+
+    def adopt(self, part_path: str, sha256: str) -> tuple[str, bool]:
+        """
+        Like ``put`` for an already-hashed file on disk (e.g. an assembled chunked
+        upload). The blob is a hard link, so ``part_path`` is left in place: the
+        caller removes it once the file record exists, and can retry until then.
+        """
+        key = blob_key(sha256)
+        path = self.path_for_key(key)
+        if os.path.exists(path):
+            return key, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.link(part_path, path)
+        except FileExistsError:
+            return key, False
+        return key, True
+
+
+# ---------------------------------------------------------------------------
+# Chunked (resumable) uploads
+# ---------------------------------------------------------------------------
+
+def chunk_span(index: int, chunk_size: int, total_size: int) -> tuple[int, int]:
+    """(offset, length) of chunk ``index`` in a file of ``total_size`` bytes."""
+    offset = index * chunk_size
+    return offset, max(0, min(chunk_size, total_size - offset))
+
+
+def preallocate_part(part_path: str, total_size: int) -> None:
+    """Create the sparse part file that chunks are written into at their offsets."""
+    os.makedirs(os.path.dirname(part_path), exist_ok=True)
+    with open(part_path, "wb") as f:
+        f.truncate(total_size)
+
+
+def write_chunk(part_path: str, offset: int, data: bytes) -> None:
+    """Write one chunk in place. Safe to run concurrently for disjoint chunks."""
+    fd = os.open(part_path, os.O_WRONLY)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+    finally:
+        os.close(fd)
+
+
+# Chunked uploads keep their partial whole-file hash in this sidecar next to
+# the part file, so every worker process feeds the same hash
+CHUNK_HASH_SUFFIX = ".sha256"
+# Bytes reserved for OpenSSL's SHA256_CTX (112 on every current build)
+_SHA256_CTX_SIZE = 128
+_CURSOR = struct.Struct("<Q")
+
+
+def _load_libcrypto():
+    """
+    OpenSSL's low-level SHA256_* functions, or None when libcrypto can't be
+    loaded. Unlike a hashlib object, a SHA256_CTX is a flat struct, so a
+    partial hash can be saved to disk and resumed by another process.
+    """
+    try:
+        name = ctypes.util.find_library("crypto")
+        if not name:
+            return None
+        lib = ctypes.CDLL(name)
+        lib.SHA256_Init.argtypes = [ctypes.c_char_p]
+        lib.SHA256_Update.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_size_t]
+        lib.SHA256_Final.argtypes = [ctypes.c_char_p, ctypes.c_char_p]
+        # Round-trip a saved state once, so a layout surprise disables resuming
+        sha = _ResumableSha256(lib)
+        sha.update(b"domus")
+        sha = _ResumableSha256(lib, sha.state())
+        sha.update(b"memoriae")
+        if sha.hexdigest() != hashlib.sha256(b"domusmemoriae").hexdigest():
+            return None
+        return lib
+    except (OSError, AttributeError):
+        return None
+
+
+class _ResumableSha256:
+    def __init__(self, lib, state: Optional[bytes] = None) -> None:
+        self._lib = lib
+        self._ctx = ctypes.create_string_buffer(_SHA256_CTX_SIZE)
+        if state is None:
+            lib.SHA256_Init(self._ctx)
+        else:
+            self._ctx.raw = state
+
+    def update(self, data: bytes) -> None:
+        self._lib.SHA256_Update(self._ctx, data, len(data))
+
+    def state(self) -> bytes:
+        return self._ctx.raw
+
+    def hexdigest(self) -> str:
+        # Finalize a copy: the saved state stays usable for a retried completion
+        out = ctypes.create_string_buffer(32)
+        self._lib.SHA256_Final(out, ctypes.create_string_buffer(self.state(), _SHA256_CTX_SIZE))
+        return out.raw.hex()
+
+
+_libcrypto = _load_libcrypto()
+if _libcrypto is None:
+    print("[WARNING] libcrypto unavailable: chunked uploads are hashed in one pass at completion")
+
+
+class ChunkHasher:
+    """
+    Incremental whole-file SHA-256 for chunked uploads that arrive out of order.
+
+    The partial hash lives in a sidecar next to the part file
+    (``<part>.sha256``: the next chunk index and OpenSSL's SHA256_CTX), and the
+    part file is flock()ed while it is advanced, so whichever worker process
+    receives a chunk feeds the same hash. Each PUT hashes the contiguous run of
+    received chunks as soon as it exists: the chunk that was just PUT from
+    memory, later chunks that were already on disk while still in the page
+    cache. ``finish()`` therefore only reads chunks nobody has hashed yet.
+    Without libcrypto there is nothing to resume and ``finish()`` hashes the
+    part file in one pass.
+    """
+
+    def __init__(self, read_size: int = INGEST_BUFFER_SIZE):
+        self._read_size = read_size
+
+    @staticmethod
+    def state_path(part_path: str) -> str:
+        return part_path + CHUNK_HASH_SUFFIX
+
+    def _load(self, part_path: str) -> tuple[int, _ResumableSha256]:
+        try:
+            with open(self.state_path(part_path), "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            raw = b""
+        if len(raw) != _CURSOR.size + _SHA256_CTX_SIZE:
+            return 0, _ResumableSha256(_libcrypto)
+        return _CURSOR.unpack_from(raw)[0], _ResumableSha256(_libcrypto, raw[_CURSOR.size:])
+
+    def _save(self, part_path: str, next_index: int, sha: _ResumableSha256) -> None:
+        # Replaced atomically: a worker killed mid-write leaves the previous state
+        # (and a .part temp file the blob GC removes). Callers hold the flock.
+        path = self.state_path(part_path)
+        tmp_path = f"{path}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(_CURSOR.pack(next_index) + sha.state())
+        os.replace(tmp_path, path)
+
+    def _feed_from_disk(self, sha: Any, f: IO[bytes], offset: int, length: int) -> None:
+        f.seek(offset)
+        while length > 0:
+            block = f.read(min(self._read_size, length))
+            if not block:
+                raise IOError(f"Part file truncated at offset {offset}")
+            sha.update(block)
+            length -= len(block)
+
+    def _advance(self, part_path: str, chunk_size: int, total_size: int, received: set[int],
+                 index: Optional[int], data: Optional[bytes]) -> tuple[int, Optional[_ResumableSha256]]:
+        with open(part_path, "rb") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            next_index, sha = self._load(part_path)
+            start = next_index
+            while next_index in received:
+                if next_index == index and data is not None:
+                    sha.update(data)
+                else:
+                    offset, length = chunk_span(next_index, chunk_size, total_size)
+                    self._feed_from_disk(sha, f, offset, length)
+                next_index += 1
+            if next_index != start:
+                self._save(part_path, next_index, sha)
+            return next_index, sha
+
+    def advance(self, part_path: str, chunk_size: int, total_size: int, received: set[int],
+                index: Optional[int] = None, data: Optional[bytes] = None) -> int:
+        """Hash every contiguous received chunk past the saved state. Returns the next chunk index."""
+        if _libcrypto is None:
+            return 0
+        return self._advance(part_path, chunk_size, total_size, received, index, data)[0]
+
+    def finish(self, part_path: str, chunk_size: int, total_size: int, chunk_count: int) -> str:
+        """Hash whatever has not been hashed yet and return the file's hex digest."""
+        if _libcrypto is None:
+            sha = hashlib.sha256()
+            with open(part_path, "rb") as f:
+                self._feed_from_disk(sha, f, 0, total_size)
+            return sha.hexdigest()
+        return self._advance(part_path, chunk_size, total_size, set(range(chunk_count)), None, None)[1].hexdigest()
+
+    def discard(self, part_path: str) -> None:
+        """Remove the saved state once the upload is completed or aborted."""
+        try:
+            os.remove(self.state_path(part_path))
+        except FileNotFoundError:
+            pass
+
+
+def read_header(path: str, size: int = MIME_SNIFF_BYTES) -> bytes:
+    """Bounded read of a file's leading bytes for MIME sniffing."""
+    with open(path, "rb") as f:
+        return f.read(size)
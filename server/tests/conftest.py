@@ -0,0 +1,83 @@
+"""
+Shared fixtures: a Database backed by mongomock (no MongoDB server needed),
+a member user with one vault, and the Flask app with a logged-in test client.
+"""
+
+import os
+import sys
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def mongo_client(monkeypatch):
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(database, "MongoClient", lambda *args, **kwargs: client)
+    return client
+
+
+@pytest.fixture
+def db(mongo_client):
+    return database.Database()
+
+
+@pytest.fixture
+def member(db):
+    """(user, vault) with the user as the vault's admin."""
+    ok, msg, user = db.create_user(email="ada@example.com", phone="5550100", first_name="Ada",
+                                   last_name="Lovelace", dob="1990-12-10")
+    assert ok, msg
+    ok, msg, vault = db.create_vault(acting_user_id=user["_id"], name="Family")
+    assert ok, msg
+    return user, vault
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """The Flask app module, imported once against its own mongomock client and upload folder."""
+    os.environ["UPLOAD_FOLDER"] = str(tmp_path_factory.mktemp("uploads"))
+    client = mongomock.MongoClient()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(database, "MongoClient", lambda *args, **kwargs: client)
+        import app
+    assert app.db is not None
+    return app
+
+
+@pytest.fixture
+def api(app_module):
+    """(test client logged in as a new vault admin, user, vault) on the app's database."""
+    db = app_module.db
+    suffix = ObjectId()
+    ok, msg, user = db.create_user(email=f"{suffix}@example.com", phone=str(suffix), first_name="Ada",
+                                   last_name="Lovelace", dob="1990-12-10")
+    assert ok, msg
+    ok, msg, vault = db.create_vault(acting_user_id=user["_id"], name="Family")
+    assert ok, msg
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = str(user["_id"])
+    return client, user, vault
+
+
+@pytest.fixture(scope="session")
+def trained_pipeline():
+    """A small forest pipeline fitted on data.csv the way model.py fits the real one."""
+    import pandas as pd
+    from sklearn.pipeline import Pipeline
+
+    import model as training
+    from features import FEATURE_COLUMNS
+
+    df = pd.read_csv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), training.CSV_PATH))
+    X, y = df[FEATURE_COLUMNS], df[training.TARGET]
+    preprocessor = training.create_preprocessing_pipeline(X, FEATURE_COLUMNS)
+    forest = training.train_model(preprocessor.fit_transform(X), y, n_estimators=20, max_depth=8)
+    return Pipeline([("preprocessor", preprocessor), ("model", forest)])
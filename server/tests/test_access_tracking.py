@@ -0,0 +1,60 @@
+"""Write-behind access tracking: coalesced flushes and read-your-writes counts."""
+
+import os
+import runpy
+import uuid
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from tracking import AccessTracker
+
+
+def _file(db, vault, user, **fields):
+    doc = {"_id": ObjectId(), "file_id": str(uuid.uuid4()), "vault_id": vault["_id"], "user_id": user["_id"],
+           "original_filename": "scan.pdf", "stored_key": "blobs/ab/" + "ab" * 32, "ext": "pdf",
+           "mime_claimed": "application/pdf", "size_bytes": 10, "sha256": "ab" * 32,
+           "uploaded_at": datetime(2024, 1, 1), **fields}
+    db.files.insert_one(doc)
+    return doc
+
+
+def test_hits_are_coalesced_into_one_write_per_file(db, member):
+    user, vault = member
+    a, b = _file(db, vault, user), _file(db, vault, user, access_count=2)
+    tracker = AccessTracker(db.files, interval=3600)
+    t0 = datetime(2024, 6, 1)
+    for i in range(3):
+        tracker.record(a["_id"], t0 + timedelta(minutes=i))
+    tracker.record(b["_id"], t0)
+    assert tracker.pending_for(a["_id"]) == (3, t0 + timedelta(minutes=2))
+
+    assert tracker.flush() == 2
+    assert db.files.find_one({"_id": a["_id"]})["access_count"] == 3
+    assert db.files.find_one({"_id": a["_id"]})["last_accessed_at"] == t0 + timedelta(minutes=2)
+    assert db.files.find_one({"_id": b["_id"]})["access_count"] == 3
+    assert tracker.pending_for(a["_id"]) == (0, None)
+    assert tracker.flush() == 0
+
+
+def test_details_survive_a_flush_between_record_and_read(app_module, api, monkeypatch):
+    client, user, vault = api
+    record = _file(app_module.db, vault, user)
+    # The timer thread flushed right after record(): nothing is pending any more
+    monkeypatch.setattr(app_module.access_tracker, "pending_for", lambda oid: (0, None))
+
+    r = client.get(f"/api/files/{record['file_id']}")
+    assert r.status_code == 200, r.get_json()
+    assert r.get_json()["last_accessed_at"] is None
+
+
+def test_gunicorn_worker_exit_flushes_pending_hits(app_module, api):
+    client, user, vault = api
+    record = _file(app_module.db, vault, user)
+    assert client.get(f"/api/files/{record['file_id']}").status_code == 200
+    assert app_module.access_tracker.pending_for(record["_id"])[0] == 1
+
+    conf = runpy.run_path(os.path.join(os.path.dirname(app_module.__file__), "gunicorn.conf.py"))
+    conf["worker_exit"](None, None)
+    assert app_module.access_tracker.pending_for(record["_id"]) == (0, None)
+    assert app_module.db.files.find_one({"_id": record["_id"]})["access_count"] == 1
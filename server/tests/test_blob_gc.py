@@ -0,0 +1,135 @@
+"""Blob garbage collection (blob_gc.py) against live references and concurrent uploads."""
+
+import io
+import os
+import time
+
+from bson import ObjectId
+
+import blob_gc
+from storage import BlobStore, blob_key, ingest_stream
+
+OLD = time.time() - 48 * 3600
+
+
+def _write(root, key, data=b"x" * 100, mtime=OLD):
+    path = os.path.join(root, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _pass(db, root, **kwargs):
+    return blob_gc.run_pass(db, root, max_rate=0, **kwargs)
+
+
+def test_classify():
+    assert blob_gc.classify("blobs/ab/" + "ab" * 32) == ("blob", "ab" * 32)
+    assert blob_gc.classify(".trash/" + "ab" * 32) == ("trash", "ab" * 32)
+    assert blob_gc.classify(".incoming/123.upload") == ("part", "123")
+    assert blob_gc.classify(".incoming/123.upload.sha256") == ("part", "123")
+    assert blob_gc.classify(".incoming/123.upload.sha256.part") == ("temp", "123.upload.sha256.part")
+    assert blob_gc.classify(".incoming/tmp.part") == ("temp", "tmp.part")
+    assert blob_gc.classify("README")[0] is None
+    assert blob_gc.classify("blobs/ab/cd/ef")[0] is None
+
+
+def test_pass_deletes_only_unreferenced_old_files(db, member, tmp_path):
+    root = str(tmp_path)
+    user, vault = member
+    live, orphan, young = "11" * 32, "22" * 32, "33" * 32
+    db.acquire_blob(live, 100)
+    db.acquire_blob(orphan, 100)
+    db.release_blobs([blob_key(orphan)])
+    paths = {
+        "live": _write(root, blob_key(live)),
+        "orphan": _write(root, blob_key(orphan)),
+        "young": _write(root, blob_key(young), mtime=time.time()),
+        "temp": _write(root, ".incoming/abandoned.part"),
+        "dead_session": _write(root, f".incoming/{ObjectId()}.upload"),
+        "legacy_orphan": _write(root, f"{vault['_id']}/old.jpg"),
+        "legacy_live": _write(root, f"{vault['_id']}/kept.jpg"),
+        "other": _write(root, "README"),
+    }
+    ok, msg, session = db.create_upload_session(acting_user_id=user["_id"], vault_id=vault["_id"],
+                                                filename="a.mp4", size_bytes=10, chunk_size=10,
+                                                mime_claimed="video/mp4")
+    paths["open_session"] = _write(root, f".incoming/{session['_id']}.upload")
+    db.files.insert_one({"vault_id": vault["_id"], "stored_key": f"{vault['_id']}/kept.jpg"})
+
+    report = _pass(db, root)
+
+    gone = {"orphan", "temp", "dead_session", "legacy_orphan"}
+    assert {name for name, path in paths.items() if not os.path.exists(path)} == gone
+    assert report["deleted"] == report["orphans"] == len(gone)
+    assert report["kept_in_grace"] == 1
+    assert report["bytes_reclaimed"] == 100 * len(gone)
+    assert report["complete"]
+    assert db.blobs.find_one({"_id": orphan}) is None
+    assert db.get_checkpoint(blob_gc.BLOB_GC_CHECKPOINT)["last_summary"] == report
+
+
+def test_dry_run_deletes_nothing(db, tmp_path):
+    root = str(tmp_path)
+    path = _write(root, blob_key("44" * 32))
+    report = _pass(db, root, dry_run=True)
+    assert report["orphans"] == 1 and report["deleted"] == 0
+    assert os.path.exists(path)
+
+
+def test_pass_needs_the_lease(db, tmp_path):
+    db.claim_checkpoint(blob_gc.BLOB_GC_CHECKPOINT, owner="other", lease=blob_gc.BLOB_GC_LEASE)
+    assert _pass(db, str(tmp_path)) is None
+
+
+def test_collect_restores_a_blob_acquired_after_marking(db, tmp_path):
+    root = str(tmp_path)
+    sha = "55" * 32
+    path = _write(root, blob_key(sha))
+    db.acquire_blob(sha, 100)  # an upload of the same bytes, after the mark phase saw none
+
+    assert blob_gc.collect_blob(db, root, path, sha) is False
+    assert os.path.exists(path)
+    assert db.blobs.find_one({"_id": sha})["refcount"] == 1
+
+
+def test_collect_finishes_an_interrupted_trash_entry(db, tmp_path):
+    root = str(tmp_path)
+    sha = "66" * 32
+    trash = _write(root, f".trash/{sha}")
+    assert blob_gc.collect_blob(db, root, trash, sha) is True
+    assert not os.path.exists(trash)
+
+
+def test_upload_racing_a_collection_keeps_its_bytes(db, tmp_path):
+    """An upload takes its reference before reusing a zero-ref blob the GC is collecting."""
+    root = str(tmp_path)
+    store = BlobStore(root)
+    data = b"wedding video" * 10
+    ingest = ingest_stream(io.BytesIO(data), os.path.join(root, ".incoming"))
+    sha = ingest.hexdigest()
+    path = _write(root, blob_key(sha), data)
+    db.acquire_blob(sha, len(data))
+    db.release_blobs([blob_key(sha)])
+
+    # Reference first, then GC's re-check sees it and puts the blob back
+    db.acquire_blob(sha, len(data))
+    assert blob_gc.collect_blob(db, root, path, sha) is False
+    assert store.put(ingest) == (blob_key(sha), False)
+    assert open(path, "rb").read() == data
+
+
+def test_upload_after_a_collection_writes_its_own_bytes(db, tmp_path):
+    root = str(tmp_path)
+    store = BlobStore(root)
+    data = b"birth certificate"
+    ingest = ingest_stream(io.BytesIO(data), os.path.join(root, ".incoming"))
+    sha = ingest.hexdigest()
+    path = _write(root, blob_key(sha), data)
+
+    assert blob_gc.collect_blob(db, root, path, sha) is True
+    db.acquire_blob(sha, len(data))
+    assert store.put(ingest) == (blob_key(sha), True)
+    assert open(path, "rb").read() == data
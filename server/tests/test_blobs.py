@@ -0,0 +1,64 @@
+"""Content-addressed blob store and its reference counts."""
+
+import io
+import os
+
+import pytest
+
+from storage import BlobStore, blob_key, ingest_stream
+
+
+def _ingest(data, tmp_path):
+    return ingest_stream(io.BytesIO(data), str(tmp_path / ".incoming"))
+
+
+def test_acquire_counts_references(db):
+    assert db.acquire_blob("ab" * 32, 10) == 1
+    assert db.acquire_blob("ab" * 32, 10) == 2
+    assert db.blobs.find_one({"_id": "ab" * 32})["size_bytes"] == 10
+
+
+def test_release_drops_one_reference_per_key(db):
+    sha = "cd" * 32
+    for _ in range(3):
+        db.acquire_blob(sha, 5)
+    db.release_blobs([blob_key(sha), blob_key(sha)])
+    assert db.blobs.find_one({"_id": sha})["refcount"] == 1
+
+
+def test_release_ignores_legacy_and_missing_keys(db):
+    sha = "ef" * 32
+    db.acquire_blob(sha, 5)
+    db.release_blobs([None, "", "0123/legacy.jpg", blob_key(sha)])
+    doc = db.blobs.find_one({"_id": sha})
+    assert doc["refcount"] == 0
+    assert "released_at" in doc
+    assert db.blobs.count_documents({}) == 1
+
+
+def test_put_stores_identical_bytes_once(tmp_path):
+    store = BlobStore(str(tmp_path))
+    first = _ingest(b"family photo", tmp_path)
+    key, created = store.put(first)
+    assert created and key == blob_key(first.hexdigest())
+
+    second = _ingest(b"family photo", tmp_path)
+    assert store.put(second) == (key, False)
+    with open(store.path_for_key(key), "rb") as f:
+        assert f.read() == b"family photo"
+    assert os.listdir(tmp_path / ".incoming") == []
+
+
+def test_adopt_links_and_keeps_the_part_file(tmp_path):
+    store = BlobStore(str(tmp_path))
+    part = tmp_path / "upload.part"
+    part.write_bytes(b"chunked")
+    key, created = store.adopt(str(part), "12" * 32)
+    assert created and part.exists()
+    assert open(store.path_for_key(key), "rb").read() == b"chunked"
+    assert store.adopt(str(part), "12" * 32) == (key, False)
+
+
+def test_path_for_key_rejects_escapes(tmp_path):
+    with pytest.raises(ValueError):
+        BlobStore(str(tmp_path)).path_for_key("../outside")
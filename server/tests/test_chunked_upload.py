@@ -0,0 +1,154 @@
+"""Resumable chunked uploads: out-of-order chunks, retryable completion and aborts."""
+
+import hashlib
+import os
+import random
+
+import pytest
+
+CHUNK = 256 * 1024
+
+
+def _begin(client, vault, payload):
+    r = client.post(f"/api/vaults/{vault['_id']}/uploads",
+                    json={"filename": "clip.mp4", "size_bytes": len(payload), "chunk_size": CHUNK})
+    assert r.status_code == 201, r.get_json()
+    return r.get_json()
+
+
+def _put(client, upload, payload, index, digest=None):
+    chunk = payload[index * CHUNK:(index + 1) * CHUNK]
+    return client.put(f"/api/uploads/{upload['upload_id']}/chunks/{index}", data=chunk,
+                      headers={"X-Chunk-SHA256": digest or hashlib.sha256(chunk).hexdigest()})
+
+
+def _upload_all(client, upload, payload):
+    order = list(range(upload["chunk_count"]))
+    random.Random(7).shuffle(order)
+    for i in order:
+        assert _put(client, upload, payload, i).status_code == 200
+
+
+@pytest.fixture
+def payload():
+    return os.urandom(3 * CHUNK + 1000)
+
+
+def test_out_of_order_chunks_resume_and_complete(app_module, api, payload):
+    client, _, vault = api
+    upload = _begin(client, vault, payload)
+    assert _put(client, upload, payload, 1).status_code == 200
+    assert _put(client, upload, payload, 0, digest="00" * 32).status_code == 422
+    status = client.get(f"/api/uploads/{upload['upload_id']}").get_json()
+    assert status["received"] == [1] and status["offset"] == 0
+    assert client.post(f"/api/uploads/{upload['upload_id']}/complete").status_code == 409
+
+    _upload_all(client, upload, payload)
+    r = client.post(f"/api/uploads/{upload['upload_id']}/complete")
+    assert r.status_code in (201, 202)
+    record = app_module.db.files.find_one({"file_id": r.get_json()["file"]["file_id"]})
+    assert record["sha256"] == hashlib.sha256(payload).hexdigest()
+    with open(app_module.blob_store.path_for_key(record["stored_key"]), "rb") as f:
+        assert f.read() == payload
+    part = app_module.upload_part_path(upload["upload_id"])
+    assert not os.path.exists(part)
+    assert not os.path.exists(app_module.chunk_hasher.state_path(part))
+    assert app_module.db.get_upload_session(upload["upload_id"]) is None
+
+
+def test_failed_completion_can_be_retried(app_module, api, payload, monkeypatch):
+    client, _, vault = api
+    db = app_module.db
+    upload = _begin(client, vault, payload)
+    _upload_all(client, upload, payload)
+    sha = hashlib.sha256(payload).hexdigest()
+
+    def down(*args, **kwargs):
+        raise RuntimeError("primary stepped down")
+
+    with monkeypatch.context() as mp:
+        mp.setattr(db.files, "insert_one", down)
+        assert client.post(f"/api/uploads/{upload['upload_id']}/complete").status_code == 500
+    assert db.get_upload_session(upload["upload_id"])["status"] == "open"
+    assert db.blobs.find_one({"_id": sha})["refcount"] == 0
+    assert os.path.exists(app_module.upload_part_path(upload["upload_id"]))
+
+    assert client.post(f"/api/uploads/{upload['upload_id']}/complete").status_code in (201, 202)
+    assert db.blobs.find_one({"_id": sha})["refcount"] == 1
+    assert db.files.count_documents({"sha256": sha}) == 1
+
+
+def test_abort_while_completing_is_refused(app_module, api, payload):
+    client, _, vault = api
+    db = app_module.db
+    upload = _begin(client, vault, payload)
+    part = app_module.upload_part_path(upload["upload_id"])
+
+    db.set_upload_status(upload["upload_id"], "completing")
+    assert client.delete(f"/api/uploads/{upload['upload_id']}").status_code == 409
+    assert os.path.exists(part)
+
+    assert _put(client, upload, payload, 0).status_code == 409
+    db.set_upload_status(upload["upload_id"], "open")
+    assert _put(client, upload, payload, 0).status_code == 200
+    assert os.path.exists(app_module.chunk_hasher.state_path(part))
+    assert client.delete(f"/api/uploads/{upload['upload_id']}").status_code == 200
+    assert not os.path.exists(app_module.chunk_hasher.state_path(part))
+    assert not os.path.exists(part)
+    assert db.get_upload_session(upload["upload_id"]) is None
+
+
+def test_chunk_hasher_state_is_shared_between_processes(tmp_path):
+    from storage import ChunkHasher, chunk_span, preallocate_part, write_chunk
+
+    data = os.urandom(5 * 1000 + 123)
+    size, count = 1000, 6
+    part = str(tmp_path / "u.upload")
+    preallocate_part(part, len(data))
+    # One hasher per "worker": chunks land on whichever one gets the request
+    workers, received = [ChunkHasher(read_size=256) for _ in range(3)], set()
+    for n, index in enumerate((3, 0, 5, 1, 2, 4)):
+        offset, length = chunk_span(index, size, len(data))
+        chunk = data[offset:offset + length]
+        write_chunk(part, offset, chunk)
+        received.add(index)
+        workers[n % 3].advance(part, size, len(data), received, index=index, data=chunk)
+    expected = hashlib.sha256(data).hexdigest()
+
+    # Everything was hashed on arrival: completion on a fresh process reads no chunk
+    with open(part, "r+b") as f:
+        f.write(b"\0" * len(data))
+    assert ChunkHasher().finish(part, size, len(data), count) == expected
+    # A retried completion gets the same digest
+    assert ChunkHasher().finish(part, size, len(data), count) == expected
+
+    ChunkHasher().discard(part)
+    assert not os.path.exists(ChunkHasher.state_path(part))
+
+
+def test_chunk_hasher_reads_chunks_nobody_hashed(tmp_path):
+    from storage import ChunkHasher, chunk_span, preallocate_part, write_chunk
+
+    data = os.urandom(4 * 1000)
+    part = str(tmp_path / "u.upload")
+    preallocate_part(part, len(data))
+    hasher = ChunkHasher(read_size=256)
+    for index in range(4):
+        offset, length = chunk_span(index, 1000, len(data))
+        write_chunk(part, offset, data[offset:offset + length])
+    hasher.advance(part, 1000, len(data), {0}, index=0, data=data[:1000])
+    assert hasher.finish(part, 1000, len(data), 4) == hashlib.sha256(data).hexdigest()
+
+
+def test_chunk_hasher_without_libcrypto_hashes_at_completion(tmp_path, monkeypatch):
+    import storage
+
+    monkeypatch.setattr(storage, "_libcrypto", None)
+    data = os.urandom(2500)
+    part = str(tmp_path / "u.upload")
+    with open(part, "wb") as f:
+        f.write(data)
+    hasher = storage.ChunkHasher(read_size=256)
+    assert hasher.advance(part, 1000, len(data), {0, 1, 2}) == 0
+    assert not os.path.exists(hasher.state_path(part))
+    assert hasher.finish(part, 1000, len(data), 3) == hashlib.sha256(data).hexdigest()
@@ -0,0 +1,78 @@
+"""The NumPy forest export must predict exactly what the sklearn pipeline does."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+
+import model as training
+from compact_model import CompactForest
+from features import FEATURE_COLUMNS
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def rows():
+    """data.csv feature rows plus rows with missing values and unseen categories."""
+    X = pd.read_csv(os.path.join(SERVER_DIR, training.CSV_PATH))[FEATURE_COLUMNS]
+    odd = pd.DataFrame([
+        {**X.iloc[0].to_dict(), "ext": "never-seen", "file_type": "hologram"},
+        {**X.iloc[1].to_dict(), "size_bytes": np.nan, "metadata_score": np.nan},
+        {**X.iloc[2].to_dict(), "format_risk": None, "file_age_days": 10**6},
+        {**X.iloc[3].to_dict(), "size_bytes": 0, "access_count": -1},
+    ])
+    return pd.concat([X, odd], ignore_index=True)
+
+
+def _sklearn_predict(pipeline, X, monkeypatch):
+    # sklearn sums trees in thread completion order unless n_jobs == 1
+    monkeypatch.setattr(pipeline.named_steps["model"], "n_jobs", 1)
+    return pipeline.predict(X)
+
+
+def _export(pipeline, path, mmap=True):
+    training.export_compact_model(pipeline, str(path))
+    return CompactForest.load(str(path), mmap=mmap)
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_predictions_are_identical(trained_pipeline, rows, tmp_path, monkeypatch, mmap):
+    compact = _export(trained_pipeline, tmp_path, mmap=mmap)
+    assert compact.info()["mmap"] is mmap
+    expected = _sklearn_predict(trained_pipeline, rows, monkeypatch)
+    np.testing.assert_array_equal(compact.predict(rows), expected)
+    # Column dicts (the serving path) score like DataFrames
+    np.testing.assert_array_equal(compact.predict({c: rows[c].tolist() for c in FEATURE_COLUMNS}), expected)
+
+
+def test_transform_matches_the_preprocessor(trained_pipeline, rows, tmp_path):
+    compact = _export(trained_pipeline, tmp_path)
+    expected = trained_pipeline.named_steps["preprocessor"].transform(rows).astype(np.float32)
+    np.testing.assert_array_equal(compact.transform(rows), expected)
+
+
+def test_unbounded_depth_and_pruned_forests(trained_pipeline, rows, tmp_path, monkeypatch):
+    preprocessor = trained_pipeline.named_steps["preprocessor"]
+    df = pd.read_csv(os.path.join(SERVER_DIR, training.CSV_PATH))
+    forest = training.train_model(preprocessor.transform(df[FEATURE_COLUMNS]), df[training.TARGET],
+                                  n_estimators=6, max_depth=None, min_samples_leaf=1)
+    deep = Pipeline([("preprocessor", preprocessor), ("model", forest)])
+    compact = _export(deep, tmp_path / "deep")
+    assert compact.max_depth > 15
+    np.testing.assert_array_equal(compact.predict(rows), _sklearn_predict(deep, rows, monkeypatch))
+
+    pruned = clone(forest)
+    pruned.__dict__.update(forest.__dict__, estimators_=forest.estimators_[:2], n_estimators=2)
+    pruned = Pipeline([("preprocessor", preprocessor), ("model", pruned)])
+    np.testing.assert_array_equal(_export(pruned, tmp_path / "pruned").predict(rows),
+                                  _sklearn_predict(pruned, rows, monkeypatch))
+
+
+def test_unknown_format_is_rejected(trained_pipeline, tmp_path):
+    compact = _export(trained_pipeline, tmp_path)
+    with pytest.raises(ValueError):
+        CompactForest({**compact.meta, "format": 999}, {})
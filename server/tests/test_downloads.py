@@ -0,0 +1,96 @@
+"""File downloads: Range requests, ETag revalidation and proxy offload."""
+
+import hashlib
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from storage import blob_key
+
+
+@pytest.fixture
+def stored(app_module, api):
+    """(client, file record, payload) for a 1,000-byte file in the API user's vault."""
+    client, user, vault = api
+    payload = os.urandom(1000)
+    sha = hashlib.sha256(payload).hexdigest()
+    path = app_module.blob_store.path_for_key(blob_key(sha))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(payload)
+    record = {"_id": ObjectId(), "file_id": str(uuid.uuid4()), "vault_id": vault["_id"], "user_id": user["_id"],
+              "original_filename": "clip.mp4", "stored_key": blob_key(sha), "ext": "mp4",
+              "mime_claimed": "video/mp4", "size_bytes": len(payload), "sha256": sha,
+              "uploaded_at": datetime(2024, 1, 1)}
+    app_module.db.files.insert_one(record)
+    return client, record, payload
+
+
+def _hits(app_module, record):
+    return app_module.access_tracker.pending_for(record["_id"])[0]
+
+
+def test_full_download_has_validators_and_counts_a_view(app_module, stored):
+    client, record, payload = stored
+    r = client.get(f"/api/files/{record['file_id']}/download")
+    assert r.status_code == 200
+    assert r.data == payload
+    assert r.headers["ETag"] == f'"{record["sha256"]}"'
+    assert r.headers["Accept-Ranges"] == "bytes"
+    assert "private" in r.headers["Cache-Control"]
+    assert _hits(app_module, record) == 1
+
+
+def test_range_requests_return_206_and_count_only_the_first(app_module, stored):
+    client, record, payload = stored
+    url = f"/api/files/{record['file_id']}/download"
+
+    r = client.get(url, headers={"Range": "bytes=0-99"})
+    assert r.status_code == 206
+    assert r.data == payload[:100]
+    assert r.headers["Content-Range"] == "bytes 0-99/1000"
+
+    r = client.get(url, headers={"Range": "bytes=900-"})
+    assert r.status_code == 206
+    assert r.data == payload[900:]
+    assert r.headers["Content-Range"] == "bytes 900-999/1000"
+    assert _hits(app_module, record) == 1
+
+
+def test_if_none_match_returns_304_without_counting(app_module, stored):
+    client, record, _ = stored
+    r = client.get(f"/api/files/{record['file_id']}/download",
+                   headers={"If-None-Match": f'"{record["sha256"]}"'})
+    assert r.status_code == 304
+    assert r.data == b""
+    assert _hits(app_module, record) == 0
+
+    r = client.get(f"/api/files/{record['file_id']}/download", headers={"If-None-Match": '"stale"'})
+    assert r.status_code == 200
+
+
+def test_unsatisfiable_range_returns_416(app_module, stored):
+    client, record, _ = stored
+    r = client.get(f"/api/files/{record['file_id']}/download", headers={"Range": "bytes=5000-6000"})
+    assert r.status_code == 416
+    assert r.headers["Content-Range"] == "bytes */1000"
+    assert _hits(app_module, record) == 0
+
+
+def test_x_accel_offload_leaves_the_body_to_the_proxy(app_module, stored, monkeypatch):
+    client, record, _ = stored
+    monkeypatch.setitem(app_module.app.config, "USE_X_SENDFILE", True)
+    monkeypatch.setattr(app_module, "DOWNLOAD_OFFLOAD", "x-accel")
+    url = f"/api/files/{record['file_id']}/download"
+
+    r = client.get(url)
+    assert r.status_code == 200
+    assert r.headers["X-Accel-Redirect"] == "/protected-files/" + record["stored_key"]
+    assert "X-Sendfile" not in r.headers
+
+    r = client.get(url, headers={"If-None-Match": f'"{record["sha256"]}"'})
+    assert r.status_code == 304
+    assert "X-Accel-Redirect" not in r.headers
@@ -0,0 +1,90 @@
+"""
+Header metadata extractors on well-formed, truncated and corrupted files.
+Samples come from bench_extractors' builders, one per registered extension.
+"""
+
+import random
+
+import pytest
+
+from bench_extractors import BUILDERS, TAGS
+from extractors import EXTRACTORS, BudgetExceeded, BudgetReader, extract_header_metadata, extractor_for
+
+PAYLOAD = bytes(range(256)) * 16
+EXTS = sorted(ext for exts in EXTRACTORS.values() for ext in exts)
+
+
+def _run(path, data, ext, budget):
+    """Run the extractor on ``data`` written to ``path``; returns (fields, bytes read)."""
+    path.write_bytes(data)
+    found = {}
+    with open(path, "rb") as f:
+        reader = BudgetReader(f, budget)
+        try:
+            extractor_for(ext)(reader, found)
+        except BudgetExceeded:
+            pass
+    return found, reader.bytes_read
+
+
+def test_every_extractor_has_a_sample():
+    assert set(EXTS) <= set(BUILDERS)
+
+
+@pytest.mark.parametrize("ext", EXTS)
+def test_reads_the_tags(ext, tmp_path):
+    path = tmp_path / f"sample.{ext}"
+    path.write_bytes(BUILDERS[ext](PAYLOAD))
+    found = extract_header_metadata(str(path), ext)
+    assert found["author"] == TAGS["author"]
+    assert found["description"] == TAGS["description"]
+    assert found.get("title", TAGS["title"]) == TAGS["title"]
+    assert found["creation_date"].startswith(TAGS["date"])
+
+
+@pytest.mark.parametrize("ext", EXTS)
+def test_truncated_files_never_raise(ext, tmp_path):
+    data = BUILDERS[ext](PAYLOAD)
+    path = tmp_path / f"cut.{ext}"
+    for cut in list(range(0, min(len(data), 1500), 11)) + [len(data) - 1]:
+        path.write_bytes(data[:cut])
+        found = extract_header_metadata(str(path), ext)
+        assert all(isinstance(v, str) and v for v in found.values())
+
+
+@pytest.mark.parametrize("ext", EXTS)
+def test_corrupted_files_never_raise(ext, tmp_path):
+    data = BUILDERS[ext](PAYLOAD)[:4000]
+    rng = random.Random(ext)
+    path = tmp_path / f"bad.{ext}"
+    for i in range(150):
+        mutated = bytearray(data)
+        for _ in range(rng.randint(1, 12)):
+            at = rng.randrange(len(mutated) - 4)
+            if i % 2:
+                # Length fields: zero, one, huge, negative as signed
+                mutated[at:at + 4] = rng.choice([b"\x00\x00\x00\x00", b"\x00\x00\x00\x01",
+                                                 b"\xff\xff\xff\xff", b"\x7f\xff\xff\xff"])
+            else:
+                mutated[at] = rng.randrange(256)
+        path.write_bytes(bytes(mutated))
+        extract_header_metadata(str(path), ext)
+
+
+@pytest.mark.parametrize("ext", EXTS)
+def test_reads_stay_within_budget(ext, tmp_path):
+    _, bytes_read = _run(tmp_path / f"big.{ext}", BUILDERS[ext](PAYLOAD * 64), ext, budget=4096)
+    assert bytes_read <= 4096
+
+
+def test_large_media_is_skipped_not_read(tmp_path):
+    # 'moov' after a 16 MB 'mdat': the walk seeks past the media data
+    found, bytes_read = _run(tmp_path / "big.mp4", BUILDERS["mp4"](b"\x00" * (16 * 1024 * 1024)), "mp4",
+                             budget=1024 * 1024)
+    assert found["title"] == TAGS["title"]
+    assert bytes_read < 1024 * 1024
+
+
+def test_unknown_extension_and_missing_file(tmp_path):
+    assert extract_header_metadata(str(tmp_path / "x.docx"), "docx") == {}
+    assert extract_header_metadata(str(tmp_path / "missing.jpg"), "jpg") == {}
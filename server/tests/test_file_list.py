@@ -0,0 +1,75 @@
+"""Keyset-paginated vault file lists."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+
+def _files(db, vault, n, same_time=False):
+    base = datetime(2024, 1, 1)
+    docs = [{"_id": ObjectId(), "vault_id": vault["_id"], "original_filename": f"f{i}.jpg", "ext": "jpg",
+             "uploaded_at": base if same_time else base + timedelta(minutes=i)} for i in range(n)]
+    db.files.insert_many(docs)
+    return docs
+
+
+def _pages(client, vault, limit):
+    pages, cursor = [], None
+    while True:
+        url = f"/api/vaults/{vault['_id']}/files?limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+        body = client.get(url).get_json()
+        pages.append([f["_id"] for f in body["files"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip(app_module):
+    doc = {"_id": ObjectId(), "uploaded_at": datetime(2024, 5, 6, 7, 8, 9, 123000)}
+    assert app_module.decode_file_cursor(app_module.encode_file_cursor(doc)) == (doc["uploaded_at"], doc["_id"])
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "Zm9v", "MjAyNC0wMS0wMXxub3QtYW4taWQ"])
+def test_malformed_cursor_is_rejected(app_module, cursor):
+    with pytest.raises(ValueError):
+        app_module.decode_file_cursor(cursor)
+
+
+@pytest.mark.parametrize("same_time", [False, True])
+def test_pages_cover_every_file_once_newest_first(app_module, api, same_time):
+    client, _, vault = api
+    docs = _files(app_module.db, vault, 7, same_time=same_time)
+    pages = _pages(client, vault, limit=3)
+    assert [len(p) for p in pages] == [3, 3, 1]
+    expected = sorted(docs, key=lambda d: (d["uploaded_at"], d["_id"]), reverse=True)
+    assert [i for page in pages for i in page] == [str(d["_id"]) for d in expected]
+
+
+def test_bad_cursor_returns_400(api):
+    client, _, vault = api
+    assert client.get(f"/api/vaults/{vault['_id']}/files?limit=2&cursor=garbage").status_code == 400
+
+
+def test_records_added_without_an_upload_date_are_paginated(app_module, api):
+    client, user, vault = api
+    db = app_module.db
+    for i in range(3):
+        ok, msg, _ = db.add_file(acting_user_id=user["_id"], vault_id=vault["_id"], filename=f"a{i}.txt")
+        assert ok, msg
+    db.files.insert_one({"vault_id": vault["_id"], "filename": "legacy.txt"})
+    db.backfill_uploaded_at()
+    pages = _pages(client, vault, limit=2)
+    assert sum(len(p) for p in pages) == 4
+
+
+def test_default_page_is_bounded_and_has_a_cursor(app_module, api, monkeypatch):
+    client, _, vault = api
+    monkeypatch.setattr(app_module, "FILE_PAGE_SIZE", 3)
+    docs = _files(app_module.db, vault, 4)
+
+    body = client.get(f"/api/vaults/{vault['_id']}/files").get_json()
+    assert [f["_id"] for f in body["files"]] == [str(d["_id"]) for d in docs[::-1][:3]]
+    rest = client.get(f"/api/vaults/{vault['_id']}/files?cursor={body['next_cursor']}").get_json()
+    assert [f["_id"] for f in rest["files"]] == [str(docs[0]["_id"])]
+    assert rest["next_cursor"] is None
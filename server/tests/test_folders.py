@@ -0,0 +1,99 @@
+"""Materialized folder paths: moves, recursive deletes and the backfill migration."""
+
+from bson import ObjectId
+
+from storage import blob_key
+
+
+def _tree(db, member, spec):
+    """Create folders from [(name, parent name or None)]; returns {name: _id}."""
+    user, vault = member
+    ids = {}
+    for name, parent in spec:
+        ok, msg, folder = db.add_folder(acting_user_id=user["_id"], vault_id=vault["_id"], name=name,
+                                        parent_folder_id=ids.get(parent))
+        assert ok, msg
+        ids[name] = folder["_id"]
+    return ids
+
+
+def _paths(db):
+    names = {f["_id"]: f["name"] for f in db.folders.find()}
+    return {f["name"]: [names.get(a) for a in f["ancestors"]] for f in db.folders.find()}
+
+
+CHAIN = [("a", None), ("b", "a"), ("c", "b"), ("d", "c"), ("e", None)]
+
+
+def test_add_folder_stores_the_path(db, member):
+    _tree(db, member, CHAIN)
+    assert _paths(db) == {"a": [], "b": ["a"], "c": ["a", "b"], "d": ["a", "b", "c"], "e": []}
+
+
+def test_move_rewrites_the_subtree(db, member):
+    user, vault = member
+    ids = _tree(db, member, CHAIN)
+    ok, msg, result = db.move_folder(acting_user_id=user["_id"], vault_id=vault["_id"],
+                                     folder_id=ids["b"], new_parent_folder_id=ids["e"])
+    assert ok, msg
+    assert result["descendants_moved"] == 2
+    assert _paths(db) == {"a": [], "b": ["e"], "c": ["e", "b"], "d": ["e", "b", "c"], "e": []}
+    assert db.folders.find_one({"_id": ids["b"]})["parent_folder_id"] == ids["e"]
+
+    ok, msg, _ = db.move_folder(acting_user_id=user["_id"], vault_id=vault["_id"], folder_id=ids["c"])
+    assert ok, msg
+    assert _paths(db)["d"] == ["c"]
+
+
+def test_move_into_own_subtree_is_rejected(db, member):
+    user, vault = member
+    ids = _tree(db, member, CHAIN)
+    for target in ("a", "c", "d"):
+        ok, msg, _ = db.move_folder(acting_user_id=user["_id"], vault_id=vault["_id"],
+                                    folder_id=ids["a"], new_parent_folder_id=ids[target])
+        assert not ok
+    assert _paths(db)["d"] == ["a", "b", "c"]
+
+
+def test_recursive_delete_removes_subtree_files_and_references(db, member):
+    user, vault = member
+    ids = _tree(db, member, CHAIN)
+    sha = "ab" * 32
+    for folder in ("b", "d", "e"):
+        db.acquire_blob(sha, 10)
+        db.files.insert_one({"vault_id": vault["_id"], "folder_id": ids[folder], "stored_key": blob_key(sha),
+                             "size_bytes": 10, "ext": "jpg"})
+
+    ok, msg, result = db.delete_folder(acting_user_id=user["_id"], vault_id=vault["_id"], folder_id=ids["b"])
+    assert ok, msg
+    assert result == {"folders_deleted": 3, "files_deleted": 2}
+    assert sorted(_paths(db)) == ["a", "e"]
+    assert db.blobs.find_one({"_id": sha})["refcount"] == 1
+
+
+def test_list_folder_tree(db, member):
+    user, vault = member
+    ids = _tree(db, member, CHAIN)
+    ok, msg, tree = db.list_folder_tree(acting_user_id=user["_id"], vault_id=vault["_id"], folder_id=ids["b"])
+    assert ok, msg
+    assert [f["name"] for f in tree["folders"]] == ["b", "c", "d"]
+
+
+def test_backfill_reroots_orphans_and_cycles(db, member):
+    _, vault = member
+    ids = _tree(db, member, CHAIN)
+    db.folders.update_many({}, {"$unset": {"ancestors": ""}})
+    db.folders.insert_one({"vault_id": vault["_id"], "name": "orphan", "parent_folder_id": ObjectId()})
+    p1 = db.folders.insert_one({"vault_id": vault["_id"], "name": "cyc1", "parent_folder_id": None}).inserted_id
+    p2 = db.folders.insert_one({"vault_id": vault["_id"], "name": "cyc2", "parent_folder_id": p1}).inserted_id
+    db.folders.update_one({"_id": p1}, {"$set": {"parent_folder_id": p2}})
+
+    report = db.backfill_folder_paths()
+
+    paths = _paths(db)
+    assert paths["d"] == ["a", "b", "c"]
+    assert paths["orphan"] == []
+    assert sorted([paths["cyc1"], paths["cyc2"]], key=len) in ([[], ["cyc1"]], [[], ["cyc2"]])
+    assert report["orphans"] == 2
+    assert db.backfill_folder_paths()["orphans"] == 0
+    assert db.folders.find_one({"_id": ids["a"]})["parent_folder_id"] is None
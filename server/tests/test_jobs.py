@@ -0,0 +1,96 @@
+"""Analysis job queue: leases, retries and batch processing."""
+
+import io
+import os
+from datetime import timedelta
+
+from bson import ObjectId
+
+from database import JOB_DONE, JOB_FAILED, JOB_MAX_ATTEMPTS, JOB_QUEUED, JOB_RUNNING
+from jobs import ANALYSIS_DONE, ANALYSIS_FAILED, JOB_ANALYZE_FILE, process_batch
+from storage import BlobStore, ingest_stream
+
+LEASE = timedelta(minutes=10)
+EXPIRED = timedelta(seconds=-1)
+
+
+def _enqueue(db, n=1):
+    return [db.enqueue_job(JOB_ANALYZE_FILE, file_id=ObjectId(), vault_id=ObjectId()) for _ in range(n)]
+
+
+def test_claim_takes_each_job_once(db):
+    _enqueue(db, 3)
+    first = db.claim_jobs(worker_id="w1", limit=2, lease=LEASE)
+    second = db.claim_jobs(worker_id="w2", limit=2, lease=LEASE)
+    assert len(first) == 2 and len(second) == 1
+    assert {j["_id"] for j in first}.isdisjoint(j["_id"] for j in second)
+    assert all(j["status"] == JOB_RUNNING and j["attempts"] == 1 for j in first + second)
+    assert db.claim_jobs(worker_id="w3", limit=5, lease=LEASE) == []
+
+
+def test_expired_lease_is_claimed_again(db):
+    [job] = _enqueue(db)
+    db.claim_jobs(worker_id="dead", limit=1, lease=EXPIRED)
+    [again] = db.claim_jobs(worker_id="w2", limit=1, lease=LEASE)
+    assert again["_id"] == job["_id"]
+    assert again["worker_id"] == "w2" and again["attempts"] == 2
+
+
+def test_job_that_keeps_crashing_is_failed(db):
+    [job] = _enqueue(db)
+    for _ in range(JOB_MAX_ATTEMPTS):
+        assert db.claim_jobs(worker_id="dead", limit=1, lease=EXPIRED)
+    assert db.claim_jobs(worker_id="w", limit=1, lease=LEASE) == []
+    assert db.fail_exhausted_jobs() == 1
+    assert db.jobs.find_one({"_id": job["_id"]})["status"] == JOB_FAILED
+
+
+def test_job_status_omits_the_header(db):
+    job = db.enqueue_job(JOB_ANALYZE_FILE, file_id=ObjectId(), vault_id=ObjectId(), header=b"%PDF-1.7")
+    assert db.jobs.find_one({"_id": job["_id"]})["header"] == b"%PDF-1.7"
+    assert "header" not in db.get_job(job["_id"])
+
+
+def _stored_record(db, vault, root, data=b"Family letters, 1952-1961.\n" * 20):
+    store = BlobStore(root)
+    ingest = ingest_stream(io.BytesIO(data), os.path.join(root, ".incoming"))
+    sha = ingest.hexdigest()
+    db.acquire_blob(sha, ingest.size)
+    key, _ = store.put(ingest)
+    record = {"_id": ObjectId(), "vault_id": vault["_id"], "stored_key": key, "ext": "txt", "sha256": sha,
+              "mime_claimed": "text/plain", "size_bytes": len(data), "analysis_status": "pending"}
+    db.files.insert_one(record)
+    return store, record
+
+
+def test_process_batch_writes_results(db, member, tmp_path):
+    _, vault = member
+    store, record = _stored_record(db, vault, str(tmp_path))
+    job = db.enqueue_job(JOB_ANALYZE_FILE, file_id=record["_id"], vault_id=vault["_id"], header=b"Family")
+    missing = db.enqueue_job(JOB_ANALYZE_FILE, file_id=ObjectId(), vault_id=vault["_id"])
+
+    jobs = db.claim_jobs(worker_id="w", limit=5, lease=LEASE)
+    assert process_batch(db, store, jobs) == 2
+
+    doc = db.files.find_one({"_id": record["_id"]})
+    assert doc["analysis_status"] == ANALYSIS_DONE
+    assert doc["mime_detected"] == "text/plain"
+    assert 0 <= doc["survivability_score"] <= 100
+    done = db.jobs.find_one({"_id": job["_id"]})
+    assert done["status"] == JOB_DONE and "header" not in done
+    assert db.jobs.find_one({"_id": missing["_id"]})["status"] == JOB_FAILED
+
+
+def test_process_batch_requeues_then_fails(db, member, tmp_path):
+    _, vault = member
+    store, record = _stored_record(db, vault, str(tmp_path))
+    os.remove(store.path_for_key(record["stored_key"]))
+    job = db.enqueue_job(JOB_ANALYZE_FILE, file_id=record["_id"], vault_id=vault["_id"])
+
+    for attempt in range(1, JOB_MAX_ATTEMPTS + 1):
+        jobs = db.claim_jobs(worker_id="w", limit=1, lease=LEASE)
+        assert [j["attempts"] for j in jobs] == [attempt]
+        process_batch(db, store, jobs)
+        status = db.jobs.find_one({"_id": job["_id"]})["status"]
+        assert status == (JOB_FAILED if attempt == JOB_MAX_ATTEMPTS else JOB_QUEUED)
+    assert db.files.find_one({"_id": record["_id"]})["analysis_status"] == ANALYSIS_FAILED
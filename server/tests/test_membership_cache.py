@@ -0,0 +1,74 @@
+"""Cached vault membership: hits, invalidation on role changes, TTL for other workers."""
+
+import cache
+from database import ROLE_ADMIN, ROLE_EDITOR, ROLE_VIEWER
+
+
+def _user(db, n):
+    ok, msg, user = db.create_user(email=f"u{n}@example.com", phone=f"555020{n}", first_name="Grace",
+                                   last_name="Hopper", dob="1906-12-09")
+    assert ok, msg
+    return user
+
+
+def _member(db, vault, admin, n, role=ROLE_VIEWER):
+    user = _user(db, n)
+    ok, msg, _ = db.add_user_to_vault(acting_admin_id=admin["_id"], vault_id=vault["_id"],
+                                      user_id_to_add=user["_id"], role=role)
+    assert ok, msg
+    return user
+
+
+def test_roles_are_served_from_the_cache(db, member):
+    admin, vault = member
+    assert db.get_member_role(vault["_id"], admin["_id"]) == ROLE_ADMIN
+    hits = db.membership_cache.hits
+    assert db.get_member_role(str(vault["_id"]), str(admin["_id"])) == ROLE_ADMIN
+    assert db.membership_cache.hits == hits + 1
+
+
+def test_change_role_invalidates(db, member):
+    admin, vault = member
+    viewer = _member(db, vault, admin, 1)
+    assert db.get_member_role(vault["_id"], viewer["_id"]) == ROLE_VIEWER
+
+    ok, msg, _ = db.change_role(vault_id=vault["_id"], acting_admin_id=admin["_id"],
+                                target_user_id=viewer["_id"], new_role=ROLE_EDITOR)
+    assert ok, msg
+    assert db.get_member_role(vault["_id"], viewer["_id"]) == ROLE_EDITOR
+
+
+def test_handoff_invalidates_both_admins(db, member):
+    admin, vault = member
+    editor = _member(db, vault, admin, 2, ROLE_EDITOR)
+    assert db.get_member_role(vault["_id"], admin["_id"]) == ROLE_ADMIN
+    assert db.get_member_role(vault["_id"], editor["_id"]) == ROLE_EDITOR
+
+    ok, msg, _ = db.handoff_admin(vault_id=vault["_id"], current_admin_id=admin["_id"], new_admin_id=editor["_id"])
+    assert ok, msg
+    assert db.get_member_role(vault["_id"], admin["_id"]) == ROLE_EDITOR
+    assert db.get_member_role(vault["_id"], editor["_id"]) == ROLE_ADMIN
+
+
+def test_non_members_are_not_cached(db, member):
+    _, vault = member
+    outsider = _user(db, 3)
+    assert db.get_member_role(vault["_id"], outsider["_id"]) is None
+    ok, msg, _ = db.join_vault_by_code(acting_user_id=outsider["_id"], join_code=vault["join_code"])
+    assert ok, msg
+    assert db.get_member_role(vault["_id"], outsider["_id"]) == ROLE_VIEWER
+
+
+def test_changes_from_another_worker_show_after_the_ttl(db, member, monkeypatch):
+    admin, vault = member
+    viewer = _member(db, vault, admin, 4)
+    clock = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: clock[0])
+    assert db.get_member_role(vault["_id"], viewer["_id"]) == ROLE_VIEWER
+
+    # Written by another process: this one's cache is not invalidated
+    db.vaults.update_one({"_id": vault["_id"], "members.user_id": viewer["_id"]},
+                         {"$set": {"members.$.role": ROLE_EDITOR}})
+    assert db.get_member_role(vault["_id"], viewer["_id"]) == ROLE_VIEWER
+    clock[0] += db.membership_cache.ttl + 1
+    assert db.get_member_role(vault["_id"], viewer["_id"]) == ROLE_EDITOR
@@ -0,0 +1,48 @@
+"""PDF metadata cache: parse errors are cached by content hash, timeouts are not."""
+
+import pytest
+
+import database
+from pdf_pool import PdfExtractionError
+
+
+@pytest.fixture
+def extract(monkeypatch):
+    calls = []
+    outcomes = []
+
+    def fake(file_path):
+        calls.append(file_path)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(database.pdf_pool, "extract", fake)
+    return calls, outcomes
+
+
+def test_results_are_parsed_once_per_content(db, extract):
+    calls, outcomes = extract
+    outcomes.append({"author": "Ada", "page_count": 3})
+    assert db.get_pdf_metadata("aa" * 32, "/a.pdf") == {"author": "Ada", "page_count": 3}
+    assert db.get_pdf_metadata("aa" * 32, "/copy.pdf") == {"author": "Ada", "page_count": 3}
+    assert calls == ["/a.pdf"]
+
+
+def test_parse_errors_are_cached(db, extract):
+    calls, outcomes = extract
+    outcomes.append(PdfExtractionError("PdfStreamError: Stream has ended unexpectedly"))
+    assert db.get_pdf_metadata("bb" * 32, "/bad.pdf") == {}
+    assert db.get_pdf_metadata("bb" * 32, "/bad.pdf") == {}
+    assert len(calls) == 1
+    assert db.pdf_metadata.find_one({"_id": "bb" * 32})["error"].startswith("PdfStreamError")
+
+
+def test_timeouts_are_retried(db, extract):
+    calls, outcomes = extract
+    outcomes += [PdfExtractionError("timed out after 10s", transient=True), {"title": "Deeds"}]
+    assert db.get_pdf_metadata("cc" * 32, "/slow.pdf") == {}
+    assert db.pdf_metadata.find_one({"_id": "cc" * 32}) is None
+    assert db.get_pdf_metadata("cc" * 32, "/slow.pdf") == {"title": "Deeds"}
+    assert len(calls) == 2
@@ -0,0 +1,139 @@
+"""Workers hot-reload the ACTIVE version and refuse one that fails validation."""
+
+import copy
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import model as training
+import registry
+from compact_model import CompactForest
+from features import FEATURE_COLUMNS
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def canary_rows():
+    X = pd.read_csv(os.path.join(SERVER_DIR, training.CSV_PATH))[FEATURE_COLUMNS]
+    return X.sample(n=20, random_state=0).to_dict("records")
+
+
+@pytest.fixture(scope="module")
+def smaller_pipeline(trained_pipeline):
+    """The same pipeline with half the trees, so it predicts differently."""
+    pipeline = copy.deepcopy(trained_pipeline)
+    forest = pipeline.named_steps["model"]
+    forest.estimators_ = forest.estimators_[:len(forest.estimators_) // 2]
+    forest.n_estimators = len(forest.estimators_)
+    return pipeline
+
+
+def publish(pipeline, registry_dir, canary_rows, tmp_path, **kwargs):
+    arrays_dir = str(tmp_path / f"arrays-{id(pipeline)}")
+    training.export_compact_model(pipeline, arrays_dir)
+    return registry.publish_version(pipeline, metrics={"mae": 1.0}, canary_rows=canary_rows,
+                                    arrays_dir=arrays_dir, registry_dir=registry_dir, **kwargs)
+
+
+def test_serves_the_active_version(trained_pipeline, canary_rows, tmp_path):
+    registry_dir = str(tmp_path / "registry")
+    version = publish(trained_pipeline, registry_dir, canary_rows, tmp_path)
+
+    columns = registry._canary_columns(canary_rows)
+    expected = registry.predict_columns(trained_pipeline, columns)
+    compact = registry.ModelRegistry(registry_dir, engine="auto")
+    served, model = compact.current()
+    assert served == version
+    assert isinstance(model, CompactForest)
+    np.testing.assert_array_equal(registry.predict_columns(model, columns), expected)
+
+    served, model = registry.ModelRegistry(registry_dir, engine="sklearn").current()
+    assert served == version
+    assert not isinstance(model, CompactForest)
+    np.testing.assert_array_equal(registry.predict_columns(model, columns), expected)
+
+
+def test_no_active_version_serves_nothing(tmp_path):
+    models = registry.ModelRegistry(str(tmp_path / "registry"))
+    assert models.current() == (None, None)
+
+
+def test_hot_reloads_when_active_changes(trained_pipeline, smaller_pipeline, canary_rows, tmp_path):
+    registry_dir = str(tmp_path / "registry")
+    first = publish(trained_pipeline, registry_dir, canary_rows, tmp_path)
+    models = registry.ModelRegistry(registry_dir, reload_interval=0)
+    assert models.current()[0] == first
+
+    second = publish(smaller_pipeline, registry_dir, canary_rows, tmp_path)
+    assert second != first
+    version, model = models.current()
+    assert version == second
+    np.testing.assert_array_equal(
+        registry.predict_columns(model, registry._canary_columns(canary_rows)),
+        registry.predict_columns(smaller_pipeline, registry._canary_columns(canary_rows)))
+    assert models.reloads == 2
+
+    registry.activate_version(first, registry_dir)
+    assert models.current()[0] == first
+    assert models.info()["rejected"] == []
+
+
+def test_reload_waits_for_the_interval(trained_pipeline, smaller_pipeline, canary_rows, tmp_path):
+    registry_dir = str(tmp_path / "registry")
+    first = publish(trained_pipeline, registry_dir, canary_rows, tmp_path)
+    models = registry.ModelRegistry(registry_dir, reload_interval=3600)
+    second = publish(smaller_pipeline, registry_dir, canary_rows, tmp_path)
+
+    assert models.current()[0] == first
+    assert models.check(force=True)
+    assert models.current()[0] == second
+
+
+def test_rejects_a_version_with_a_corrupted_artifact(trained_pipeline, smaller_pipeline, canary_rows, tmp_path,
+                                                     capsys):
+    registry_dir = str(tmp_path / "registry")
+    first = publish(trained_pipeline, registry_dir, canary_rows, tmp_path)
+    models = registry.ModelRegistry(registry_dir, reload_interval=0)
+
+    bad = publish(smaller_pipeline, registry_dir, canary_rows, tmp_path, activate=False)
+    arrays_dir = os.path.join(registry_dir, "versions", bad, "model_arrays")
+    victim = os.path.join(arrays_dir, sorted(os.listdir(arrays_dir))[0])
+    with open(victim, "r+b") as f:
+        first_byte = f.read(1)
+        f.seek(0)
+        f.write(bytes([first_byte[0] ^ 0xFF]))
+    registry.activate_version(bad, registry_dir)
+
+    version, model = models.current()
+    assert version == first
+    assert models.info()["rejected"] == [bad]
+    assert models.reloads == 1
+    assert f"[ERROR] Model version {bad} rejected: checksum mismatch" in capsys.readouterr().out
+
+
+def test_rejects_a_version_that_misses_its_canary(trained_pipeline, smaller_pipeline, canary_rows, tmp_path,
+                                                  capsys):
+    registry_dir = str(tmp_path / "registry")
+    first = publish(trained_pipeline, registry_dir, canary_rows, tmp_path)
+    models = registry.ModelRegistry(registry_dir, reload_interval=0)
+
+    bad = publish(smaller_pipeline, registry_dir, canary_rows, tmp_path, activate=False)
+    meta_path = os.path.join(registry_dir, "versions", bad, registry.META_FILE)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["canary_predictions"][0] += 0.5
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    registry.activate_version(bad, registry_dir)
+
+    assert models.current()[0] == first
+    assert models.info()["rejected"] == [bad]
+    assert f"[ERROR] Model version {bad} rejected: canary predictions differ" in capsys.readouterr().out
+
+    # A rejected version is not loaded again on every check
+    assert models.current()[0] == first
+    assert "[ERROR]" not in capsys.readouterr().out
@@ -0,0 +1,101 @@
+"""Re-scoring passes: checkpointed resume, the lease, and minimal write-back."""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import rescore
+import scoring
+
+
+@pytest.fixture(autouse=True)
+def rule_based_scores(monkeypatch):
+    """Score with the deterministic fallback formula."""
+    monkeypatch.setattr(scoring, "MODEL_REGISTRY", None)
+    monkeypatch.setattr(scoring, "ML_MODEL", None)
+    monkeypatch.setattr(scoring, "PREDICTION_CACHE", None)
+
+
+def _files(db, vault, n):
+    """n scored files with stale scores; every second file is a copy of the one before."""
+    docs = []
+    for i in range(n):
+        docs.append({"_id": ObjectId(), "vault_id": vault["_id"], "ext": "pdf",
+                     "sha256": f"{i // 2:064x}", "size_bytes": 100,
+                     "access_risk_score": 20, "metadata_score": 50, "duplicate_count": 0,
+                     "uploaded_at": datetime(2024, 1, 1), "survivability_score": 1.0,
+                     "model_version": "fallback"})
+    db.files.insert_many(docs)
+    db.rebuild_vault_stats(vault["_id"])
+    return docs
+
+
+def _count_batches(monkeypatch, stop_after=None, stop=None):
+    seen = []
+    real = rescore.rescore_batch
+
+    def counting(db, records, now=None):
+        seen.append([r["_id"] for r in records])
+        if stop_after is not None and len(seen) == stop_after:
+            stop.set()
+        return real(db, records, now)
+
+    monkeypatch.setattr(rescore, "rescore_batch", counting)
+    return seen
+
+
+def test_interrupted_pass_resumes_after_the_checkpoint(db, member, monkeypatch):
+    _, vault = member
+    docs = _files(db, vault, 10)
+    stop = threading.Event()
+    seen = _count_batches(monkeypatch, stop_after=2, stop=stop)
+
+    summary = rescore.run_pass(db, owner="a", batch_size=3, max_rate=0, stop=stop)
+    assert summary["complete"] is False and summary["scanned"] == 6
+    checkpoint = db.get_checkpoint(rescore.RESCORE_CHECKPOINT)
+    assert checkpoint["last_id"] == docs[5]["_id"] and checkpoint["owner"] is None
+
+    # Another process picks the pass up where it stopped
+    summary = rescore.run_pass(db, owner="b", batch_size=3, max_rate=0)
+    assert summary["complete"] is True and summary["scanned"] == 10 and summary["changed"] == 10
+    assert [i for batch in seen for i in batch] == [d["_id"] for d in docs]
+    checkpoint = db.get_checkpoint(rescore.RESCORE_CHECKPOINT)
+    assert checkpoint["last_id"] is None and checkpoint["last_summary"]["scanned"] == 10
+
+
+def test_restart_ignores_the_checkpoint(db, member, monkeypatch):
+    _, vault = member
+    _files(db, vault, 4)
+    stop = threading.Event()
+    seen = _count_batches(monkeypatch, stop_after=1, stop=stop)
+    rescore.run_pass(db, owner="a", batch_size=2, max_rate=0, stop=stop)
+
+    summary = rescore.run_pass(db, owner="a", batch_size=2, max_rate=0, restart=True)
+    assert summary["scanned"] == 4
+    assert seen[0] == seen[1]
+
+
+def test_a_held_lease_blocks_a_second_runner(db, member):
+    _, vault = member
+    _files(db, vault, 2)
+    assert db.claim_checkpoint(rescore.RESCORE_CHECKPOINT, owner="other", lease=timedelta(minutes=5))
+    assert rescore.run_pass(db, owner="me", max_rate=0) is None
+    assert db.files.find_one({"survivability_score": 1.0}) is not None
+
+
+def test_only_changed_records_are_written_and_stats_follow(db, member):
+    _, vault = member
+    docs = _files(db, vault, 6)
+    rescore.run_pass(db, owner="a", max_rate=0)
+    stored = {d["_id"]: d for d in db.files.find()}
+    expected = scoring.predict_survivability_many([stored[d["_id"]] for d in docs])
+    assert [stored[d["_id"]]["survivability_score"] for d in docs] == expected
+    assert [stored[d["_id"]]["duplicate_count"] for d in docs] == [0, 1, 0, 1, 0, 1]
+    live = db.vaults.find_one({"_id": vault["_id"]})["stats"]
+    assert live["score_sum"] == pytest.approx(db.rebuild_vault_stats(vault["_id"])[vault["_id"]]["score_sum"])
+
+    # Nothing moved since: a second pass writes nothing
+    summary = rescore.run_pass(db, owner="a", max_rate=0)
+    assert summary["changed"] == 0 and summary["scanned"] == 6
@@ -0,0 +1,88 @@
+"""Survivability scoring: the prediction cache and the batch path."""
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import scoring
+from compact_model import CompactForest
+from features import FEATURE_COLUMNS
+
+
+class RecordingModel:
+    """Scores a row as size_bytes / 1000 and keeps every frame it was given."""
+
+    def __init__(self):
+        self.frames = []
+
+    def predict(self, frame):
+        self.frames.append(frame.copy())
+        return frame["size_bytes"].to_numpy(dtype=float) / 1000
+
+
+def _columns(sizes, ages):
+    n = len(sizes)
+    return {
+        "ext": np.array(["pdf"] * n, dtype=object), "file_type": np.array(["document"] * n, dtype=object),
+        "format_risk": np.array(["low"] * n, dtype=object), "size_bytes": np.array(sizes, dtype=np.int64),
+        "metadata_score": np.full(n, 50.0), "access_risk_score": np.full(n, 10.0),
+        "duplicate_count": np.zeros(n, dtype=np.int64), "access_count": np.zeros(n, dtype=np.int64),
+        "file_age_days": np.array(ages, dtype=np.int64), "mime_mismatch": np.zeros(n, dtype=np.int64),
+    }
+
+
+def test_cache_keys_are_quantized_but_the_model_sees_exact_features():
+    model = RecordingModel()
+    cache = scoring.PredictionCache(maxsize=100, ttl=60, size_bucket=0.05, age_bucket=7)
+    scores = cache.predict(model, "v1", _columns([40_000, 40_100, 90_000], [1, 2, 1]))
+
+    # 40,000 and 40,100 bytes share a bucket: one inference, on exact values
+    assert len(model.frames) == 1
+    assert model.frames[0]["size_bytes"].tolist() == [40_000, 90_000]
+    assert model.frames[0]["file_age_days"].tolist() == [1, 1]
+    assert scores == [40.0, 40.0, 90.0]
+
+    assert cache.predict(model, "v1", _columns([40_080], [3])) == [40.0]
+    assert len(model.frames) == 1
+    # A new model version starts from an empty cache
+    assert cache.predict(model, "v2", _columns([40_080], [3])) == [40.1]
+    assert list(model.frames[-1].columns) == FEATURE_COLUMNS
+
+
+def _docs(now):
+    from bench_scoring import CSV_PATH, file_docs_from_csv
+
+    docs = file_docs_from_csv(os.path.join(os.path.dirname(scoring.__file__), CSV_PATH), now)[:300]
+    # Records as they come out of Mongo: missing fields, odd extensions, string dates
+    docs += [
+        {},
+        {"ext": "JPG", "size_bytes": 2048, "mime_claimed": "image/jpeg", "mime_detected": "image/jpeg"},
+        {"ext": "xyz", "uploaded_at": None, "access_count": 3},
+        {"ext": "pdf", "uploaded_at": (now - timedelta(days=400)).isoformat(), "metadata_score": 75},
+        {"ext": "wma", "size_bytes": None, "duplicate_count": 2, "mime_claimed": "audio/x-ms-wma"},
+    ]
+    return docs
+
+
+@pytest.mark.parametrize("engine", ["sklearn", "compact", "fallback"])
+@pytest.mark.parametrize("cached", [False, True])
+def test_batch_scores_equal_per_row_scores(trained_pipeline, tmp_path, monkeypatch, engine, cached):
+    from model import export_compact_model
+
+    if engine == "compact":
+        export_compact_model(trained_pipeline, str(tmp_path))
+        model = CompactForest.load(str(tmp_path))
+    else:
+        model = trained_pipeline if engine == "sklearn" else None
+    monkeypatch.setattr(scoring, "MODEL_REGISTRY", None)
+    monkeypatch.setattr(scoring, "ML_MODEL", model)
+    monkeypatch.setattr(scoring, "PREDICTION_CACHE",
+                        scoring.PredictionCache(maxsize=10_000, ttl=60) if cached else None)
+
+    docs = _docs(datetime.utcnow())
+    per_row = [scoring.predict_survivability(doc, with_version=True) for doc in docs]
+    # Small chunks so several model.predict calls are made
+    assert scoring.predict_survivability_many(docs, chunk_size=64, with_version=True) == per_row
+    assert {version for _, version in per_row} == {"fallback" if model is None else "legacy"}
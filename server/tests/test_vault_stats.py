@@ -0,0 +1,73 @@
+"""Vault resiliency aggregates: the $inc bookkeeping must match a full rebuild."""
+
+import random
+
+import pytest
+from bson import ObjectId
+
+EXTS = ["jpg", "png", "mp4", "pdf", "docx", "mp3", "xyz", ""]
+
+
+def _add(db, vault, ext, size, folder_id=None):
+    doc = {"_id": ObjectId(), "vault_id": vault["_id"], "folder_id": folder_id, "ext": ext,
+           "size_bytes": size, "stored_key": f"k{ObjectId()}"}
+    db.files.insert_one(doc)
+    db.record_file_added(vault["_id"], ext, size)
+    return doc
+
+
+def _score(db, doc, score):
+    old = db.files.find_one({"_id": doc["_id"]}).get("survivability_score")
+    db.files.update_one({"_id": doc["_id"]}, {"$set": {"survivability_score": score}})
+    db.record_files_scored([(doc["vault_id"], doc["ext"], old, score)])
+
+
+def _assert_same(live, rebuilt):
+    for field in ("file_count", "size_bytes", "score_count"):
+        assert live[field] == rebuilt[field], field
+    assert live["score_sum"] == pytest.approx(rebuilt["score_sum"])
+    for file_type, counts in rebuilt["by_type"].items():
+        for field, value in counts.items():
+            assert live["by_type"][file_type][field] == pytest.approx(value), (file_type, field)
+    # Types whose files were all removed are left at zero by the $inc path
+    for file_type in set(live["by_type"]) - set(rebuilt["by_type"]):
+        assert not any(live["by_type"][file_type].values()), file_type
+
+
+def test_incremental_stats_match_a_rebuild(db, member):
+    user, vault = member
+    rng = random.Random(5)
+    ok, msg, folder = db.add_folder(acting_user_id=user["_id"], vault_id=vault["_id"], name="old")
+    assert ok, msg
+
+    docs = [_add(db, vault, rng.choice(EXTS), rng.randint(0, 10**7), folder["_id"] if i % 4 == 0 else None)
+            for i in range(40)]
+    for doc in rng.sample(docs, 30):
+        _score(db, doc, round(rng.uniform(0, 100), 1))
+    for doc in rng.sample(docs, 10):
+        _score(db, doc, round(rng.uniform(0, 100), 1))  # rescored (or scored late)
+    for doc in [d for d in docs if d["folder_id"] is None][:5]:
+        ok, msg, _ = db.delete_file(acting_user_id=user["_id"], vault_id=vault["_id"], file_id=doc["_id"])
+        assert ok, msg
+    ok, msg, _ = db.delete_folder(acting_user_id=user["_id"], vault_id=vault["_id"], folder_id=folder["_id"])
+    assert ok, msg
+
+    live = db.vaults.find_one({"_id": vault["_id"]})["stats"]
+    rebuilt = db.rebuild_vault_stats(vault["_id"])[vault["_id"]]
+    _assert_same(live, rebuilt)
+    assert rebuilt["file_count"] == db.files.count_documents({"vault_id": vault["_id"]})
+    assert db.calculate_vault_resiliency(vault["_id"]) == db.resiliency_from_stats(live)
+
+
+def test_vault_without_stats_is_rebuilt_on_read(db, member):
+    user, vault = member
+    doc = _add(db, vault, "pdf", 100)
+    _score(db, doc, 80.0)
+    _score(db, _add(db, vault, "jpg", 50), 60.0)
+    db.vaults.update_one({"_id": vault["_id"]}, {"$unset": {"stats": ""}})
+
+    # Legacy vaults are skipped by the $inc paths until rebuilt
+    _add(db, vault, "mp3", 10)
+    assert "stats" not in db.vaults.find_one({"_id": vault["_id"]})
+    assert db.calculate_vault_resiliency(vault["_id"]) == 70.0
+    assert db.vaults.find_one({"_id": vault["_id"]})["stats"]["file_count"] == 3
@@ -0,0 +1,131 @@
+"""
+Write-behind access tracking for Domus Memoriae
+
+File views and downloads used to issue one ``files.update_one`` each. The
+AccessTracker coalesces them in memory instead: per file it keeps the number of
+hits and the latest access time, and a background thread writes everything in
+one unordered ``bulk_write`` every ACCESS_FLUSH_INTERVAL seconds, as soon as
+ACCESS_FLUSH_MAX_PENDING distinct files are waiting, and at interpreter exit.
+
+Durability: counts are per process and not persisted until flushed. Gunicorn
+workers flush in the worker_exit hook (gunicorn.conf.py) when they stop, since
+gunicorn does not reliably run atexit handlers in workers. A worker that is
+killed without running exit hooks (SIGKILL, OOM, timeout, host loss) loses its
+unflushed hits: at most ACCESS_FLUSH_INTERVAL seconds' worth, capped at
+ACCESS_FLUSH_MAX_PENDING files. A failed flush puts its counts back and retries
+them on the next flush.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+ACCESS_FLUSH_INTERVAL = float(os.environ.get("ACCESS_FLUSH_INTERVAL", 5.0))
+ACCESS_FLUSH_MAX_PENDING = int(os.environ.get("ACCESS_FLUSH_MAX_PENDING", 1000))
+
+
+class AccessTracker:
+    def __init__(self, collection, interval: float = ACCESS_FLUSH_INTERVAL,
+                 max_pending: int = ACCESS_FLUSH_MAX_PENDING):
+        self.collection = collection
+        self.interval = interval
+        self.max_pending = max_pending
+        # file _id -> (hits, last access time)
+        self._pending: Dict[ObjectId, Tuple[int, datetime]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self.flushes = 0
+        self.writes = 0
+        self.hits_recorded = 0
+        self.flush_errors = 0
+        atexit.register(self.flush)
+
+    def record(self, file_oid: ObjectId, when: Optional[datetime] = None) -> None:
+        """Count one access of a file. Never touches the database."""
+        when = when or datetime.utcnow()
+        with self._lock:
+            hits, last = self._pending.get(file_oid, (0, when))
+            self._pending[file_oid] = (hits + 1, max(last, when))
+            self.hits_recorded += 1
+            full = len(self._pending) >= self.max_pending
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def pending_for(self, file_oid: ObjectId) -> Tuple[int, Optional[datetime]]:
+        """Unflushed (hits, last access) for one file, to report read-your-writes counts."""
+        with self._lock:
+            return self._pending.get(file_oid, (0, None))
+
+    def flush(self) -> int:
+        """Write all pending counts in one bulk_write. Returns the number of files written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            ops = [
+                UpdateOne({"_id": oid}, {"$inc": {"access_count": hits}, "$max": {"last_accessed_at": last}})
+                for oid, (hits, last) in batch.items()
+            ]
+            try:
+                self.collection.bulk_write(ops, ordered=False)
+            except Exception as e:
+                self.flush_errors += 1
+                print(f"[ERROR] Access tracking flush of {len(ops)} file(s) failed: {e}")
+                self._restore(batch)
+                return 0
+            self.flushes += 1
+            self.writes += len(ops)
+            return len(ops)
+
+    def _restore(self, batch: Dict[ObjectId, Tuple[int, datetime]]) -> None:
+        # Merge back for the next attempt, keeping the buffer bounded
+        with self._lock:
+            for oid, (hits, last) in batch.items():
+                if oid not in self._pending and len(self._pending) >= self.max_pending:
+                    continue
+                cur_hits, cur_last = self._pending.get(oid, (0, last))
+                self._pending[oid] = (cur_hits + hits, max(cur_last, last))
+
+    def _ensure_thread(self) -> None:
+        # Started lazily and re-created after fork (threads don't survive it)
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wake = threading.Event()
+            self._flush_lock = threading.Lock()
+            self._thread = threading.Thread(target=self._run, name="access-tracker", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending_files": pending,
+            "hits_recorded": self.hits_recorded,
+            "flushes": self.flushes,
+            "writes": self.writes,
+            "flush_errors": self.flush_errors,
+            "flush_interval_seconds": self.interval,
+            "max_pending": self.max_pending,
+        }
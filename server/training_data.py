@@ -0,0 +1,151 @@
+"""
+Training data export for Domus Memoriae
+
+Streams scored ``files`` records out of Mongo into chunked, columnar .npz files
+(one array per feature column plus the target) that model.py can train on
+without loading everything at once. Feature rows are built with
+features.feature_columns_many, the same code the server scores with, and every
+chunk is spot-checked against the row-wise build_feature_row used by
+predict_survivability, so training and serving cannot drift apart.
+
+Layout of an export directory:
+    manifest.json       feature columns, target, chunk list, categorical vocabularies
+    chunk-00000.npz     up to --chunk-rows rows
+    ...
+
+Usage:
+    python training_data.py export --out training_chunks
+    python training_data.py export --out training_chunks --chunk-rows 200000 --vault <id>
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from features import (
+    FEATURE_COLUMNS,
+    CATEGORICAL_COLUMNS,
+    FILE_TYPES,
+    FORMAT_RISK_LEVELS,
+    build_feature_row,
+    feature_columns_many,
+)
+
+TRAINING_DATA_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+TARGET = "survivability_score"
+CHUNK_ROWS = 100_000
+MONGO_BATCH_SIZE = 5_000
+
+# Only what build_feature_row reads, plus the target
+EXPORT_PROJECTION = {
+    "_id": 0, "ext": 1, "mime_claimed": 1, "mime_detected": 1, "size_bytes": 1,
+    "metadata_score": 1, "access_risk_score": 1, "duplicate_count": 1,
+    "access_count": 1, "uploaded_at": 1, TARGET: 1,
+}
+
+
+def _check_against_rows(columns, docs, now):
+    """The column builder must agree with the per-row one serving uses."""
+    for i in (0, len(docs) - 1):
+        row = build_feature_row(docs[i], now)
+        for col in FEATURE_COLUMNS:
+            value = columns[col][i]
+            if value != row[col] and not (value != value and row[col] is None):
+                raise RuntimeError(f"Feature drift in column {col!r}: {value!r} vs {row[col]!r}")
+
+
+def _write_chunk(out_dir, index, docs, now):
+    columns = feature_columns_many(docs, now)
+    _check_against_rows(columns, docs, now)
+    arrays = {col: (columns[col].astype(str) if col in CATEGORICAL_COLUMNS else columns[col])
+              for col in FEATURE_COLUMNS}
+    arrays[TARGET] = np.array([d[TARGET] for d in docs], dtype=np.float64)
+    name = f"chunk-{index:05d}.npz"
+    np.savez(os.path.join(out_dir, name), **arrays)
+    return {"file": name, "rows": len(docs)}, set(arrays['ext'].tolist())
+
+
+def export_from_mongo(db, out_dir, *, chunk_rows=CHUNK_ROWS, vault_id=None, now=None):
+    """
+    Stream scored file records into ``out_dir``. Memory is bounded by one chunk.
+    File ages are computed relative to ``now`` (the export time by default).
+    Returns the manifest.
+    """
+    from bson import ObjectId
+
+    now = now or datetime.utcnow()
+    os.makedirs(out_dir, exist_ok=True)
+    query = {TARGET: {"$ne": None}}
+    if vault_id:
+        query["vault_id"] = ObjectId(vault_id)
+
+    chunks, exts, docs = [], set(), []
+    cursor = db.files.find(query, EXPORT_PROJECTION, no_cursor_timeout=True).batch_size(MONGO_BATCH_SIZE)
+    try:
+        for doc in cursor:
+            docs.append(doc)
+            if len(docs) >= chunk_rows:
+                chunk, seen = _write_chunk(out_dir, len(chunks), docs, now)
+                chunks.append(chunk)
+                exts |= seen
+                docs = []
+                print(f"[INFO] Exported {sum(c['rows'] for c in chunks):,} rows")
+        if docs:
+            chunk, seen = _write_chunk(out_dir, len(chunks), docs, now)
+            chunks.append(chunk)
+            exts |= seen
+    finally:
+        cursor.close()
+
+    manifest = {
+        "format": TRAINING_DATA_FORMAT,
+        "feature_columns": FEATURE_COLUMNS,
+        "target": TARGET,
+        "exported_at": now.isoformat(),
+        "rows": sum(c["rows"] for c in chunks),
+        "chunks": chunks,
+        # Fixed vocabularies so every chunk one-hot encodes the same way
+        "vocab": {"ext": sorted(exts), "file_type": FILE_TYPES, "format_risk": FORMAT_RISK_LEVELS},
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"[INFO] Exported {manifest['rows']:,} rows in {len(chunks)} chunk(s) to {out_dir}")
+    return manifest
+
+
+def load_manifest(data_dir):
+    with open(os.path.join(data_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != TRAINING_DATA_FORMAT:
+        raise ValueError(f"Unsupported training data format: {manifest.get('format')}")
+    return manifest
+
+
+def iter_chunks(data_dir, manifest=None):
+    """Yield (index, {column: array}) per chunk, one chunk in memory at a time."""
+    manifest = manifest or load_manifest(data_dir)
+    for index, chunk in enumerate(manifest["chunks"]):
+        with np.load(os.path.join(data_dir, chunk["file"]), allow_pickle=False) as data:
+            yield index, {name: data[name] for name in data.files}
+
+
+def main():
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Export training data from Mongo")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="stream scored files into chunked .npz files")
+    export.add_argument("--out", default="training_chunks")
+    export.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    export.add_argument("--vault", help="only export one vault")
+    args = parser.parse_args()
+
+    export_from_mongo(Database(), args.out, chunk_rows=args.chunk_rows, vault_id=args.vault)
+
+
+if __name__ == "__main__":
+    main()